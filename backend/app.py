@@ -3,9 +3,23 @@ from flask_cors import CORS
 from routes.chat import bp as chat_bp
 from routes.auth import bp as auth_bp
 from routes.map import bp as map_bp
+from services.registry import init_services
+from config import Config
 
-def create_app():
+def start_background_tasks(services):
+    """Model warm-up and Ollama health probes; threads do not survive fork, so a pre-forking
+    server starts these in each worker instead. Only the server entry points start them, so
+    building an app (in tests or scripts) never talks to Ollama on its own"""
+    if Config.OLLAMA_WARMUP:
+        services.start_warm_up()
+    if Config.OLLAMA_HEALTH_INTERVAL > 0:
+        services.ollama_client.pool.start_health_checks()
+
+def create_app(start_background=False):
     app = Flask(__name__)
+    services = init_services(app)
+    if start_background:
+        start_background_tasks(services)
 
     CORS(
         app,
@@ -19,10 +33,15 @@ def create_app():
 
     @app.route("/health")
     def health():
-        return jsonify({"status": "ok"})
+        # Last background probe result per backend; never blocks on Ollama
+        backends = services.ollama_client.pool.health()
+        return jsonify({
+            "status": "ok" if any(b.get("circuit") == "closed" for b in backends) else "degraded",
+            "ollama": backends
+        })
 
     return app
 
 if __name__ == "__main__":
-    app = create_app()
+    app = create_app(start_background=True)
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,59 @@
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Route
+from routes.async_chat import routes as chat_routes
+from routes.async_map import routes as map_routes
+from services.async_database import AsyncDatabaseService
+from services.async_ollama_client import AsyncOllamaClient
+from services.registry import get_services
+from utils.asgi import JSONResponse
+from config import Config
+
+# asyncio serving path for the chat and map APIs: a chat waiting on Ollama holds a coroutine, not
+# a thread, so one worker can keep thousands of streaming or long-polling requests open.
+# Run from backend/:  uvicorn --factory asgi:create_asgi_app --port 5000
+
+def create_asgi_app():
+    services = get_services()
+    ollama_client = AsyncOllamaClient(services.ollama_client)
+    database_service = AsyncDatabaseService()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Only a real server runs the lifespan, so building the app in tests never talks to Ollama
+        if Config.OLLAMA_WARMUP:
+            services.start_warm_up()
+        if Config.OLLAMA_HEALTH_INTERVAL > 0:
+            services.ollama_client.pool.start_health_checks()
+        yield
+        await ollama_client.aclose()
+        await database_service.close()
+
+    async def health(request):
+        # Last background probe result per backend; never blocks on Ollama
+        backends = services.ollama_client.pool.health()
+        return JSONResponse({
+            "status": "ok" if any(b.get("circuit") == "closed" for b in backends) else "degraded",
+            "ollama": backends
+        })
+
+    app = Starlette(
+        routes=[*chat_routes, *map_routes, Route('/health', health)],
+        middleware=[Middleware(
+            CORSMiddleware,
+            allow_origins=["http://127.0.0.1:5500"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"]
+        )],
+        lifespan=lifespan
+    )
+    app.state.ollama_client = ollama_client
+    app.state.database_service = database_service
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("asgi:create_asgi_app", factory=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Concurrent-connection capacity: the threaded Flask server (what app.run uses) vs the ASGI app on uvicorn.
+
+Every client opens /api/chat/stream at the same moment, and the stand-in Ollama server
+(benchmarks/stub_ollama.py, in its own process) holds each generation for --hold seconds
+before the first token, so all of them are waiting on Ollama at once. For each server and
+client count it reports completed and failed streams, wall time, and the server process's
+peak thread count and resident memory (read from /proc, so Linux only).
+
+Run from backend/:  python benchmarks/bench_async_capacity.py [--clients 100 500 1000] [--hold 2]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(kind, port):
+    """Child process: run one server until killed"""
+    if kind == 'wsgi':
+        from werkzeug.serving import make_server
+        from app import create_app
+        make_server('127.0.0.1', port, create_app(start_background=True), threaded=True).serve_forever()
+    else:
+        import uvicorn
+        uvicorn.run('asgi:create_asgi_app', factory=True, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+
+def proc_status(pid):
+    """(threads, rss_mb) of a process"""
+    fields = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            fields[name] = value.strip()
+    return int(fields['Threads']), int(fields['VmRSS'].split()[0]) / 1024
+
+
+def wait_until_up(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def run_clients(base_url, clients, timeout):
+    """Open all streams at once; returns (completed, failed)"""
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as http:
+        async def one(i):
+            body = {'message': f"Jaipur ke bare mein kuch batao, sawaal {i}", 'force_llm': True, 'bypass_cache': True}
+            try:
+                async with http.stream('POST', '/api/chat/stream', json=body) as res:
+                    text = ''.join([line async for line in res.aiter_lines()])
+                return res.status_code == 200 and 'event: done' in text
+            except httpx.HTTPError:
+                return False
+
+        results = await asyncio.gather(*(one(i) for i in range(clients)))
+    completed = sum(results)
+    return completed, clients - completed
+
+
+def measure(kind, clients, ollama_host, hold):
+    port = free_port()
+    env = dict(
+        os.environ,
+        OLLAMA_HOSTS=ollama_host,
+        OLLAMA_MAX_CONCURRENT=str(clients),  # let the stub hold every generation at once
+        OLLAMA_MAX_QUEUE=str(clients),
+        OLLAMA_WARMUP='False',
+        OLLAMA_HEALTH_INTERVAL='0',
+        DB_POOL_TIMEOUT='0.2'
+    )
+    server = subprocess.Popen([sys.executable, __file__, '--serve', kind, '--port', str(port)], cwd=BACKEND, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(f'http://127.0.0.1:{port}/health')
+        base_threads, base_rss = proc_status(server.pid)
+        peak = {'threads': base_threads, 'rss': base_rss}
+        done = threading.Event()
+
+        def sample():
+            while not done.is_set():
+                threads, rss = proc_status(server.pid)
+                peak['threads'] = max(peak['threads'], threads)
+                peak['rss'] = max(peak['rss'], rss)
+                time.sleep(0.05)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        completed, failed = asyncio.run(run_clients(f'http://127.0.0.1:{port}', clients, timeout=hold * 10 + 30))
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+        print(f"{kind:<5} {clients:>7} {completed:>9} {failed:>7} {elapsed:>8.2f}s {peak['threads']:>8} "
+              f"{peak['rss']:>8.1f} MB (idle {base_threads} threads, {base_rss:.1f} MB)")
+    finally:
+        server.kill()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat streams held open: threaded WSGI vs ASGI")
+    parser.add_argument('--clients', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--hold', type=float, default=2.0, help="seconds the stub waits before the first token")
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve, args.port)
+
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, 'benchmarks/stub_ollama.py', '--port', str(stub_port), '--stall', str(args.hold),
+                             '--token-delay', '0.01'], cwd=BACKEND, stdout=subprocess.DEVNULL)
+    try:
+        wait_until_up(f'http://127.0.0.1:{stub_port}/api/tags')
+        print(f"📊 Concurrent /api/chat/stream requests, each held {args.hold:.1f}s by the stub before its first token\n")
+        print(f"{'server':<5} {'clients':>7} {'completed':>9} {'failed':>7} {'wall':>9} {'threads':>8} {'peak RSS':>11}")
+        for clients in args.clients:
+            for kind in ('wsgi', 'asgi'):
+                measure(kind, clients, f'http://127.0.0.1:{stub_port}', args.hold)
+    finally:
+        stub.kill()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
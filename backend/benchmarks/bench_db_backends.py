@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Read latency of the chat hot queries on MySQL vs the embedded SQLite backend.
+
+Both backends get the same synthetic dataset (--cities cities with --rows rows per reference
+table each, plus --users accounts) and run the queries DatabaseService and UserService issue
+for a chat: the city reference lookups, the place-history fetch, the profile lookup and the
+guest-session check. The reference cache is off, so every call is a real round trip. MySQL is
+measured in a scratch database (city_guide_bench, dropped afterwards) when a server is
+reachable with the DB_* settings, and skipped otherwise.
+
+Run from backend/:  python benchmarks/bench_db_backends.py [--iterations 2000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import Config
+from migrate import apply_migrations, split_statements
+from services.database_service import DatabaseService, connection_settings
+from services.sqlite_backend import SCHEMA_FILE
+
+BENCH_DATABASE = 'city_guide_bench'
+
+
+def synthetic_rows(cities=300, rows_per_city=25, users=20000):
+    """{INSERT statement: rows} filling the reference, user and session tables"""
+    names = [f"City {c}" for c in range(cities)]
+    per_city = [(city, n) for city in names for n in range(rows_per_city)]
+    return {
+        "INSERT INTO city_overview (city_name, state_name) VALUES (%s, %s)":
+            [(city, 'State') for city in names],
+        "INSERT INTO places_history (city_name, place_name) VALUES (%s, %s)":
+            [(city, f"Place {n}") for city, n in per_city],
+        "INSERT INTO tourist_places (city_name, place_name, category, importance) VALUES (%s, %s, %s, %s)":
+            [(city, f"Place {n}", ['monument', 'museum', 'park'][n % 3], ['must_visit', 'recommended', 'optional'][n % 3]) for city, n in per_city],
+        "INSERT INTO restaurants_streetfood (city_name, place_name, category, popularity) VALUES (%s, %s, %s, %s)":
+            [(city, f"Dhaba {n}", ['street_food', 'budget_restaurant', 'mid_range', 'fine_dining'][n % 4], ['low', 'medium', 'high', 'very_high'][n % 4]) for city, n in per_city],
+        "INSERT INTO transport_traffic (city_name, transport_type) VALUES (%s, %s)":
+            [(city, f"Mode {n}") for city, n in per_city],
+        "INSERT INTO accommodation (city_name, area_name, category) VALUES (%s, %s, %s)":
+            [(city, f"Area {n}", ['budget', 'mid_range', 'luxury'][n % 3]) for city, n in per_city],
+        "INSERT INTO culture_traditions (city_name, tradition_name, importance) VALUES (%s, %s, %s)":
+            [(city, f"Festival {n}", ['low', 'medium', 'high'][n % 3]) for city, n in per_city],
+        "INSERT INTO users (first_name, last_name, email) VALUES (%s, %s, %s)":
+            [('Asha', f"User{u}", f"user{u}@example.com") for u in range(users)],
+        "INSERT INTO user_auth (user_id, login_type, login_identifier) VALUES (%s, 'email', %s)":
+            [(u + 1, f"user{u}@example.com") for u in range(users)],
+        "INSERT INTO user_preferences (user_id, preferred_city) VALUES (%s, %s)":
+            [(u + 1, names[u % cities]) for u in range(users)],
+        "INSERT INTO guest_sessions (session_token, expires_at) VALUES (%s, %s)":
+            [(f"token-{u}", '2099-01-01 00:00:00') for u in range(users)]
+    }
+
+
+def load(connection, rows):
+    cursor = connection.cursor()
+    for statement, values in rows.items():
+        cursor.executemany(statement, values)
+    connection.commit()
+    cursor.close()
+
+
+def hot_queries(city='City 42'):
+    """(label, query, params) for what one chat's enrichment and session checks run"""
+    captured = []
+
+    class Capture(DatabaseService):
+        def __init__(self):
+            self.reference_cache = None
+
+        def cached_query(self, table, query, params=None):
+            return self.execute_query(query, params)
+
+        def execute_query(self, query, params=None):
+            captured.append((query, params or ()))
+            return []
+
+    db = Capture()
+    db.get_city_overview(city)
+    db.get_places_to_visit(city)
+    db.get_restaurants_by_city(city)
+    db.get_accommodation_info(city)
+    db.get_place_histories(['Place 3', 'Place 7', 'Place 11'], city)
+    labels = ['city_overview', 'tourist_places', 'restaurants', 'accommodation', 'place_histories']
+    queries = [(label, query, params) for label, (query, params) in zip(labels, captured)]
+    queries.append(('user_profile', """
+        SELECT u.*, up.preferred_city, up.food_preferences, up.budget_range, up.travel_style, up.language_preference
+        FROM users u LEFT JOIN user_preferences up ON u.user_id = up.user_id WHERE u.user_id = %s""", (4242,)))
+    queries.append(('guest_session', """
+        SELECT guest_id, session_token, created_at, expires_at FROM guest_sessions
+        WHERE session_token = %s AND expires_at > NOW()""", ('token-4242',)))
+    return queries
+
+
+def measure(db, iterations):
+    """{label: [ms per call]}"""
+    timings = {}
+    for label, query, params in hot_queries():
+        assert db.execute_query(query, params), f"{label} returned no rows"
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            db.execute_query(query, params)
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[label] = samples
+    return timings
+
+
+def setup_sqlite(directory, rows):
+    Config.DB_BACKEND = 'sqlite'
+    Config.SQLITE_PATH = os.path.join(directory, 'bench.sqlite3')
+    db = DatabaseService()
+    with db.pool.connection() as connection:
+        load(connection, rows)
+    return db
+
+
+def setup_mysql(rows):
+    settings = dict(connection_settings())
+    del settings['database']
+    try:
+        connection = mysql.connector.connect(**settings, connection_timeout=2)
+    except Error as e:
+        print(f"⏭️  MySQL skipped: {e}")
+        return None
+    cursor = connection.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+    cursor.execute(f"CREATE DATABASE {BENCH_DATABASE}")
+    cursor.execute(f"USE {BENCH_DATABASE}")
+    with open(SCHEMA_FILE, 'r', encoding='utf-8') as file:
+        for statement in split_statements(file.read()):
+            if statement.upper().startswith('CREATE TABLE'):
+                cursor.execute(statement)
+    cursor.close()
+    apply_migrations(connection)
+    load(connection, rows)
+    connection.close()
+    Config.DB_BACKEND = 'mysql'
+    os.environ['DB_NAME'] = BENCH_DATABASE
+    return DatabaseService()
+
+
+def drop_mysql():
+    settings = dict(connection_settings())
+    del settings['database']
+    connection = mysql.connector.connect(**settings)
+    cursor = connection.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+    cursor.close()
+    connection.close()
+
+
+def report(name, timings):
+    for label, samples in timings.items():
+        samples = sorted(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{name:<7} {label:<16} {statistics.mean(samples):>9.3f} {statistics.median(samples):>9.3f} {p95:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat hot-query read latency: MySQL vs SQLite")
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--cities', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=25, help="rows per city in each reference table")
+    parser.add_argument('--users', type=int, default=20000)
+    args = parser.parse_args()
+    Config.REFERENCE_CACHE_ENABLED = False
+    rows = synthetic_rows(args.cities, args.rows, args.users)
+
+    print(f"📊 {args.iterations} calls per query, {args.cities} cities x {args.rows} rows per table, {args.users} users\n")
+    print(f"{'backend':<7} {'query':<16} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        report('sqlite', measure(setup_sqlite(directory, rows), args.iterations))
+    db = setup_mysql(rows)
+    if db is not None:
+        try:
+            report('mysql', measure(db, args.iterations))
+        finally:
+            drop_mysql()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Prompt prefill cost: the legacy build_prompt layout vs the static-prefix layout.
+
+Replays the same interleaved conversations through both layouts against the stand-in Ollama server
+(benchmarks/stub_ollama.py), which charges prefill only for characters that do not extend
+a recently seen prompt, and reports reused-prefix share, prompt size and prefill time.
+
+Run from backend/:  python benchmarks/bench_prompt_prefix.py [conversations]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.stub_ollama import StubOllama
+from services.location_service import LocationService
+from services.ollama_client import OllamaClient
+from services.prompt_builder import PromptBuilder
+from utils.intent import detect_intent
+
+TURNS = [
+    ("Agra", "Uttar Pradesh", "best food in agra"),
+    ("Agra", "Uttar Pradesh", "history of the taj mahal"),
+    ("Agra", "Uttar Pradesh", "places to visit in agra"),
+    ("Jaipur", "Rajasthan", "what should I eat in jaipur"),
+    ("Jaipur", "Rajasthan", "top places to visit in jaipur"),
+]
+PROFILES = [
+    {'isProfileActive': True, 'name': 'Asha', 'interests': ['food', 'history'], 'responseStyle': 'concise'},
+    {'isProfileActive': True, 'name': 'Ravi', 'interests': ['architecture'], 'responseStyle': 'detailed', 'homeState': 'Bihar'},
+    None,
+]
+
+
+class SampleDatabaseService:
+    """A few Agra rows so knowledge context has realistic size without MySQL"""
+
+    def get_city_overview(self, city_name):
+        return [{'city_name': city_name, 'description': 'Home of the Taj Mahal on the banks of the Yamuna.'}]
+
+    def get_places_to_visit(self, city_name):
+        return [{'place_name': 'Taj Mahal', 'entry_fee': '50 INR'}, {'place_name': 'Agra Fort', 'entry_fee': '40 INR'}]
+
+    def get_place_histories(self, place_names, city_name):
+        return [{'place_name': name, 'history': 'Commissioned in 1632 by Shah Jahan.'} for name in place_names]
+
+    def get_restaurants_by_city(self, city_name):
+        return [{'name': 'Pinch of Spice', 'speciality': 'North Indian'}, {'name': 'Panchhi Petha', 'speciality': 'Petha'}]
+
+
+class LegacyPromptBuilder(PromptBuilder):
+    """build_prompt() as it was before the static-prefix layout"""
+
+    def get_master_prompt(self):
+        return "\n        ".join(["You are GuideMeAI, an interactive AI assistant. "] + super().get_master_prompt().split("\n")[1:]) + "\n        "
+
+    def build_prompt(self, message, intent, user_context=None, location_context=None, mode="text", history=None, profile_data=None):
+        profile_instr = ""
+        if profile_data and profile_data.get('isProfileActive'):
+            profile_instr = "\nUSER PROFILE CONTEXT (Use silently for relevance):"
+            if profile_data.get('name'): profile_instr += f"\n- User Name: {profile_data['name']} (Address them naturally if appropriate)"
+            profile_instr += f"\n- Preferred Language: {profile_data.get('language', 'hinglish')}"
+            if profile_data.get('interests'): profile_instr += f"\n- User Interests: {', '.join(profile_data['interests'])} (Focus on these aspects if relevant to the question)"
+            profile_instr += f"\n- Verbosity: {'Be extremely concise' if profile_data.get('responseStyle', 'concise') == 'concise' else 'Provide descriptive insights'}"
+            if profile_data.get('homeState'): profile_instr += f"\n- Home State: {profile_data['homeState']} (Use to reduce back-and-forth for geographic context)"
+            profile_instr += "\nRULES: Never say 'Because you like...' or 'Based on your profile'. User input always overrides profile."
+        knowledge_str = ""
+        if intent not in ["greeting", "vague_location", "clarification_needed"] and location_context:
+            knowledge_str = "\n" + self.get_database_context(intent, message, location_context.get('city'), location_context.get('state'))
+        loc_context_str = ""
+        if location_context and intent not in ["greeting", "clarification_needed"] and location_context.get('city'):
+            loc_context_str = f"\nCURRENT LOCATION CONTEXT: {location_context['city']}, {location_context['state']}."
+        history_str = ""
+        if history:
+            history_str = "\nCONVERSATION HISTORY (Last 3 turns):\n" + "\n".join([f"{m['role'].upper()}: {m['content']}" for m in history[-3:]])
+        return f"""{self.get_master_prompt()}
+
+        {self.get_intent_instructions(intent)}
+        {profile_instr}
+        {knowledge_str}
+        {loc_context_str}
+        {history_str}
+
+        USER MESSAGE: {message}
+        ASSISTANT:"""
+
+
+def run(label, builder, stub, client, conversations):
+    stub.reset_stats()
+    histories = [[] for _ in range(conversations)]
+    start = time.perf_counter()
+    # Conversations are interleaved turn by turn, as concurrent users would be
+    for city, state, message in TURNS:
+        for n, history in enumerate(histories):
+            prompt = builder.build_prompt(message, detect_intent(message), location_context={'city': city, 'state': state},
+                                          history=history, profile_data=PROFILES[n % len(PROFILES)])
+            reply = client.generate(prompt)["response"]
+            history += [{'role': 'user', 'content': message}, {'role': 'assistant', 'content': reply}]
+    elapsed = time.perf_counter() - start
+
+    stats = stub.stats()
+    reused = stats['cached_chars'] / stats['prompt_chars'] * 100
+    print(f"{label:<14} {stats['prompt_chars'] / stats['requests']:>8.0f} chars/prompt  {reused:>5.1f}% prefix reused"
+          f"  {stats['prefill_ms'] / stats['requests']:>7.1f} ms prefill/turn  {elapsed:>6.2f} s total")
+    return stats['prefill_ms']
+
+def main():
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    stub = StubOllama(models=('llama3',), token_delay=0).start()
+    client = OllamaClient(model="llama3", hosts=[stub.host])
+    location_service = LocationService()
+    db = SampleDatabaseService()
+
+    print(f"📊 Prompt prefill, {conversations} conversations x {len(TURNS)} turns against {stub.host}\n")
+    legacy = run("legacy layout", LegacyPromptBuilder(db_service=db, location_service=location_service), stub, client, conversations)
+    current = run("static prefix", PromptBuilder(db_service=db, location_service=location_service), stub, client, conversations)
+    print(f"\nPrefill time saved: {(1 - current / legacy) * 100:.1f}%")
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Per-request service setup: building services in every chat() call vs the app-scoped registry.
+
+Run from backend/:  python benchmarks/bench_service_registry.py [requests]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.location_service import LocationService
+from services.ollama_client import OllamaClient
+from services.prompt_builder import PromptBuilder
+from services.registry import ServiceRegistry
+from services.user_service import UserService
+from utils.intent import detect_intent
+
+MESSAGE = "hello"
+
+def legacy_request():
+    """What chat() did before the registry: four services per request"""
+    prompt_builder = PromptBuilder()
+    user_service = UserService()
+    ollama_client = OllamaClient()
+    location_service = LocationService()
+    location_service.infer_location(MESSAGE)
+    prompt_builder.build_prompt(MESSAGE, detect_intent(MESSAGE))
+    return user_service, ollama_client
+
+def registry_request(registry):
+    """What chat() does now"""
+    prompt_builder = registry.prompt_builder
+    user_service = registry.user_service
+    ollama_client = registry.ollama_client
+    registry.location_service.infer_location(MESSAGE)
+    prompt_builder.build_prompt(MESSAGE, detect_intent(MESSAGE))
+    return user_service, ollama_client
+
+def measure(label, fn, requests):
+    fn()  # warm imports and first-use construction
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    elapsed = time.perf_counter() - start
+
+    # Allocation is measured in a separate pass so tracing does not skew the timing
+    tracemalloc.start()
+    peaks = 0
+    for _ in range(requests):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks += peak - base
+    tracemalloc.stop()
+
+    print(f"{label:<10} {elapsed / requests * 1000:>9.3f} ms/request   {peaks / requests / 1024:>9.1f} KiB peak allocation/request")
+    return elapsed / requests
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"📊 Service setup per chat request ({requests} requests, greeting path, no MySQL/Ollama I/O)\n")
+
+    loads = {'count': 0}
+    original_load = LocationService._load_data
+    def counting_load(self):
+        loads['count'] += 1
+        return original_load(self)
+    LocationService._load_data = counting_load
+
+    legacy = measure("legacy", legacy_request, requests)
+    legacy_loads = loads['count']
+
+    loads['count'] = 0
+    registry = ServiceRegistry()
+    current = measure("registry", lambda: registry_request(registry), requests)
+    registry_loads = loads['count']
+
+    print(f"\nindia_knowledge.json parses: legacy {legacy_loads} ({legacy_loads / (2 * requests + 1):.0f}/request), registry {registry_loads} total")
+    print(f"Speed-up: {legacy / current:.1f}x")
+
+if __name__ == "__main__":
+    main()
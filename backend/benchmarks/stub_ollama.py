@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Ollama HTTP API, for benchmarks and integration tests.
+
+Models the costs that matter to the backend: prompt prefill is charged per character that
+does not extend a recently seen prompt (a prefix KV cache), and output tokens are emitted
+with a fixed delay. Serves /api/generate (streaming and not), /api/tags and /api/ps.
+
+Run from backend/:  python benchmarks/stub_ollama.py [--port 11434] [--prefill-ms-per-char 0.05]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = ["Namaste! ", "Agra ", "mein ", "Taj ", "Mahal ", "zaroor ", "dekhiye."]
+
+
+class _Server(ThreadingHTTPServer):
+    # Capacity benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+
+def common_prefix_length(a, b):
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class StubOllama:
+    """Threaded fake Ollama server; start() it, point OllamaClient at .url, stop() when done"""
+
+    def __init__(self, host='127.0.0.1', port=0, models=('llama3', 'llama2'), prefill_ms_per_char=0.05,
+                 token_delay=0.02, reply=None, cache_slots=4, stall=0.0):
+        self.models = list(models)
+        self.prefill_ms_per_char = prefill_ms_per_char
+        self.token_delay = token_delay
+        self.reply = list(reply or DEFAULT_REPLY)
+        self.cache_slots = cache_slots
+        self.healthy = True
+        self.stall = stall  # extra seconds before the first token, like a model swap or GC pause
+        self._lock = threading.Lock()
+        self._prompt_cache = {}  # model -> recent prompts, most recent last
+        self._stats = {'requests': 0, 'prompt_chars': 0, 'cached_chars': 0, 'prefill_ms': 0.0, 'in_flight': 0, 'max_in_flight': 0,
+                       'disconnects': 0}
+        self.server = _Server((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def host(self):
+        return f"http://{self.server.server_address[0]}:{self.port}"
+
+    @property
+    def url(self):
+        return f"{self.host}/api/generate"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0 if name != 'prefill_ms' else 0.0
+
+    def prefill(self, model, prompt, context):
+        """Charge prefill for the part of the prompt the cache cannot serve; returns (chars, ms)"""
+        with self._lock:
+            recent = self._prompt_cache.setdefault(model, [])
+            cached = 0 if context else max((common_prefix_length(prompt, p) for p in recent), default=0)
+            recent.append(prompt)
+            del recent[:-self.cache_slots]
+            uncached = len(prompt) - cached
+            prefill_ms = uncached * self.prefill_ms_per_char
+            self._stats['requests'] += 1
+            self._stats['prompt_chars'] += len(prompt)
+            self._stats['cached_chars'] += cached
+            self._stats['prefill_ms'] += prefill_ms
+        time.sleep(prefill_ms / 1000 + self.stall)
+        return uncached, prefill_ms
+
+    def _enter(self):
+        with self._lock:
+            self._stats['in_flight'] += 1
+            self._stats['max_in_flight'] = max(self._stats['max_in_flight'], self._stats['in_flight'])
+
+    def _leave(self):
+        with self._lock:
+            self._stats['in_flight'] -= 1
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, body):
+                raw = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def send_chunk(self, body):
+                """One NDJSON line as an HTTP chunk, flushed right away (Ollama streams the same way)"""
+                raw = (json.dumps(body) + "\n").encode('utf-8')
+                self.wfile.write(f"{len(raw):x}\r\n".encode('ascii') + raw + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if not stub.healthy:
+                    return self.send_json(503, {'error': 'unavailable'})
+                if self.path == '/api/tags':
+                    return self.send_json(200, {'models': [{'name': f"{m}:latest", 'model': f"{m}:latest"} for m in stub.models]})
+                if self.path == '/api/ps':
+                    return self.send_json(200, {'models': [{'name': f"{m}:latest", 'model': f"{m}:latest", 'size_vram': 0} for m in stub.models]})
+                self.send_json(404, {'error': 'not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                req = json.loads(self.rfile.read(length) or b'{}')
+                if self.path != '/api/generate':
+                    return self.send_json(404, {'error': 'not found'})
+                if not stub.healthy:
+                    return self.send_json(503, {'error': 'unavailable'})
+                model = req.get('model', '').split(':')[0]
+                if model not in stub.models:
+                    return self.send_json(404, {'error': f"model '{req.get('model')}' not found"})
+
+                stub._enter()
+                try:
+                    prompt = req.get('prompt', '')
+                    context = req.get('context') or []
+                    uncached, prefill_ms = stub.prefill(model, prompt, context)
+                    done = {
+                        'model': req.get('model'),
+                        'response': '',
+                        'done': True,
+                        'context': context + list(range(len(prompt) // 4 + len(stub.reply))),
+                        'prompt_eval_count': uncached // 4,
+                        'prompt_eval_duration': int(prefill_ms * 1e6),
+                        'eval_count': len(stub.reply)
+                    }
+                    if req.get('stream'):
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'application/x-ndjson')
+                        self.send_header('Transfer-Encoding', 'chunked')
+                        self.send_header('Connection', 'close')
+                        self.end_headers()
+                        for word in stub.reply:
+                            time.sleep(stub.token_delay)
+                            self.send_chunk({'response': word, 'done': False})
+                        self.send_chunk(done)
+                        self.wfile.write(b"0\r\n\r\n")
+                        self.close_connection = True
+                    else:
+                        time.sleep(stub.token_delay * len(stub.reply))
+                        done['response'] = "".join(stub.reply)
+                        self.send_json(200, done)
+                except (BrokenPipeError, ConnectionResetError):
+                    with stub._lock:
+                        stub._stats['disconnects'] += 1
+                    self.close_connection = True
+                finally:
+                    stub._leave()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--prefill-ms-per-char', type=float, default=0.05)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--stall', type=float, default=0.0, help="extra seconds before every first token")
+    args = parser.parse_args()
+
+    stub = StubOllama(host=args.host, port=args.port, prefill_ms_per_char=args.prefill_ms_per_char, token_delay=args.token_delay)
+    stub.stall = args.stall
+    print(f"🧪 Stub Ollama listening on {stub.host}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
+
+if __name__ == "__main__":
+    main()
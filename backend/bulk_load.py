@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Streaming bulk loader for the city reference tables.
+
+Reads CSV or JSONL (one JSON object per line) files, or the cities of india_knowledge.json,
+validates every row against the table's columns in database_setup.sql, and writes them in
+batches of multi-row upserts keyed on each table's natural key (city_name plus the place,
+food, area... name). Loading a file twice updates rows instead of duplicating them.
+
+Each batch commits together with the number of source rows consumed, so an interrupted load
+picks up after the last committed batch when run again; a file that changed since restarts
+from the top. Rejected rows go to <file>.rejects.jsonl. With --defer-indexes the table's secondary
+indexes are dropped for the load and rebuilt once at the end; queries on the table scan until
+then, so only use it on a database that is not serving traffic.
+
+The natural keys come from migration 002, which fails on a table that already holds the same key
+twice. --dedupe keeps the oldest row of each key, saves the others to <table>.duplicates.jsonl in
+the current directory, deletes them and then applies the migrations.
+
+Run from the repository root:
+    python backend/bulk_load.py pois.csv --table tourist_places --map name=place_name --set city_name=Agra
+    python backend/bulk_load.py places_history.jsonl restaurants_streetfood.csv
+    python backend/bulk_load.py --knowledge
+    python backend/bulk_load.py --dedupe
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import mysql.connector
+from mysql.connector import Error
+
+from config import Config
+from migrate import ALREADY_APPLIED, apply_migrations, discover, split_statements
+from services.database_service import DATABASE_ERRORS, connection_settings
+from services.reference_cache import mark_reference_data_changed
+from services.sqlite_backend import SCHEMA_FILE, connect as connect_sqlite, ensure_schema
+
+KNOWLEDGE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'india_knowledge.json')
+
+# The unique key each table is upserted on (migrations/002_reference_natural_keys.sql)
+NATURAL_KEYS = {
+    'city_overview': ('city_name',),
+    'places_history': ('city_name', 'place_name'),
+    'markets_streets': ('city_name', 'market_name'),
+    'local_foods': ('city_name', 'food_name'),
+    'restaurants_streetfood': ('city_name', 'place_name'),
+    'tourist_places': ('city_name', 'place_name'),
+    'transport_traffic': ('city_name', 'transport_type'),
+    'accommodation': ('city_name', 'area_name'),
+    'culture_traditions': ('city_name', 'tradition_name')
+}
+# Filled in by the database
+GENERATED_COLUMNS = {'id', 'created_at', 'updated_at'}
+TEXT_MAX_BYTES = 65535
+
+Column = namedtuple('Column', 'name kind length choices required')
+# records(skip) yields the source's rows after the first `skip`, as dicts (or an exception for an unreadable row)
+Source = namedtuple('Source', 'name table fingerprint records rejects_path')
+
+COLUMN_DEFINITION = re.compile(r'^(\w+)\s+(\w+)(?:\s*\(([^)]*)\))?(.*)$')
+CREATE_INDEX = re.compile(r'^\s*CREATE\s+INDEX\s+(\w+)\s+ON\s+(\w+)\b', re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def table_columns(schema_file=SCHEMA_FILE):
+    """{table: {column: Column}} for the loadable tables, from their CREATE TABLE statements"""
+    with open(schema_file, 'r', encoding='utf-8') as file:
+        statements = split_statements(file.read())
+    tables = {}
+    for statement in statements:
+        match = re.match(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*)\)\s*$', statement, re.IGNORECASE | re.DOTALL)
+        if not match or match.group(1) not in NATURAL_KEYS:
+            continue
+        columns = {}
+        for line in match.group(2).splitlines():
+            definition = COLUMN_DEFINITION.match(line.strip().rstrip(','))
+            if not definition or definition.group(1) in GENERATED_COLUMNS:
+                continue
+            name, kind, argument, rest = definition.groups()
+            kind = kind.upper()
+            choices = tuple(re.findall(r"'([^']*)'", argument)) if kind == 'ENUM' else None
+            length = int(argument) if kind == 'VARCHAR' else None
+            required = 'NOT NULL' in rest.upper() and 'DEFAULT' not in rest.upper()
+            columns[name] = Column(name, kind, length, choices, required)
+        tables[match.group(1)] = columns
+    return tables
+
+
+def validate(row, columns):
+    """(values, None) with the row's known columns converted for the database, or (None, reason)"""
+    values = {}
+    for name, raw in row.items():
+        column = columns.get(name)
+        if column is None:
+            continue
+        value = raw.strip() if isinstance(raw, str) else raw
+        if value == '' or value is None:
+            values[name] = None
+            continue
+        if column.kind == 'VARCHAR':
+            value = str(value)
+            if len(value) > column.length:
+                return None, f"{name} is longer than {column.length} characters"
+        elif column.kind == 'TEXT':
+            value = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+            if len(value.encode('utf-8')) > TEXT_MAX_BYTES:
+                return None, f"{name} is longer than {TEXT_MAX_BYTES} bytes"
+        elif column.kind == 'ENUM':
+            # Third-party dumps write "Must Visit" for must_visit
+            value = str(value).strip().lower().replace(' ', '_').replace('-', '_')
+            if value not in column.choices:
+                return None, f"{name} must be one of {', '.join(column.choices)}, not {raw!r}"
+        elif column.kind == 'INT':
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return None, f"{name} is not an integer: {raw!r}"
+        elif column.kind == 'DECIMAL':
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None, f"{name} is not a number: {raw!r}"
+        values[name] = value
+    missing = [column.name for column in columns.values() if column.required and values.get(column.name) is None]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    return values, None
+
+
+def upsert_statement(table, columns):
+    """Multi-row INSERT for `columns` that updates those columns of an existing row with the same natural key"""
+    # Reassigning the key columns would rewrite the unique index entry for nothing
+    updated = [column for column in columns if column not in NATURAL_KEYS[table]] or columns[:1]
+    updates = ', '.join(f"{column} = VALUES({column})" for column in updated)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {updates}")
+
+
+def secondary_indexes(table):
+    """[(index name, CREATE statement)] of the table's non-unique indexes, from the migrations"""
+    indexes = {}
+    for _, _, path in discover():
+        with open(path, 'r', encoding='utf-8') as file:
+            for statement in split_statements(file.read()):
+                match = CREATE_INDEX.match(statement)
+                if match and match.group(2) == table:
+                    indexes[match.group(1)] = statement
+                elif re.match(r'^\s*DROP\s+INDEX\s+(\w+)', statement, re.IGNORECASE):
+                    indexes.pop(statement.split()[2], None)
+    return list(indexes.items())
+
+
+def run_tolerating_applied(connection, statements):
+    """Run DDL whose change may already be in place (index dropped or created by an earlier run)"""
+    cursor = connection.cursor()
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        except Error as e:
+            if e.errno not in ALREADY_APPLIED:
+                cursor.close()
+                raise
+    connection.commit()
+    cursor.close()
+
+
+def drop_indexes(connection, table):
+    run_tolerating_applied(connection, [f"DROP INDEX {name} ON {table}" for name, _ in secondary_indexes(table)])
+
+
+def rebuild_indexes(connection, table):
+    run_tolerating_applied(connection, [statement for _, statement in secondary_indexes(table)])
+
+
+def find_duplicates(connection, table):
+    """Rows of the table whose natural key an older row (lower id) already has"""
+    key = ', '.join(NATURAL_KEYS[table])
+    present = ' AND '.join(f"{column} IS NOT NULL" for column in NATURAL_KEYS[table])
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(f"""
+    SELECT * FROM {table}
+    WHERE {present} AND id NOT IN (SELECT MIN(id) FROM {table} WHERE {present} GROUP BY {key})
+    ORDER BY id
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def remove_duplicates(connection, backup_dir='.'):
+    """Delete the rows find_duplicates() reports, after appending them to <table>.duplicates.jsonl
+    in backup_dir; returns {table: rows deleted} for the tables that had any"""
+    removed = {}
+    for table in NATURAL_KEYS:
+        rows = find_duplicates(connection, table)
+        if not rows:
+            continue
+        backup_path = os.path.join(backup_dir, f"{table}.duplicates.jsonl")
+        with open(backup_path, 'a', encoding='utf-8') as backup:
+            backup.writelines(json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in rows)
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(f"DELETE FROM {table} WHERE id = %s", [(row['id'],) for row in rows])
+            connection.commit()
+        except DATABASE_ERRORS:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        removed[table] = len(rows)
+        print(f"🧹 {table}: deleted {len(rows)} duplicate row(s), saved to {backup_path}")
+    if removed:
+        mark_reference_data_changed()
+    return removed
+
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def file_records(path, mapping=None, constants=None):
+    """records(skip) for a .csv or .jsonl file, renaming columns per `mapping` and filling in `constants`"""
+    mapping = mapping or {}
+    constants = constants or {}
+
+    def shape(row):
+        row = {mapping.get(key, key): value for key, value in row.items()}
+        row.update(constants)
+        return row
+
+    def csv_records(skip):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as file:
+            for n, row in enumerate(csv.DictReader(file)):
+                if n >= skip:
+                    yield shape(row)
+
+    def jsonl_records(skip):
+        with open(path, 'r', encoding='utf-8') as file:
+            n = 0
+            for line in file:
+                if not line.strip():
+                    continue
+                n += 1
+                if n <= skip:
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError("not a JSON object")
+                    yield shape(row)
+                except ValueError as e:
+                    yield e
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return csv_records
+    if extension in ('.jsonl', '.ndjson'):
+        return jsonl_records
+    raise ValueError(f"{path}: expected a .csv, .jsonl or .ndjson file")
+
+
+def file_source(path, table=None, mapping=None, constants=None):
+    """A CSV/JSONL file loaded into `table` (default: the file's name, e.g. places_history.csv)"""
+    table = table or os.path.splitext(os.path.basename(path))[0]
+    if table not in NATURAL_KEYS:
+        raise ValueError(f"{path}: unknown table {table}; use --table with one of {', '.join(NATURAL_KEYS)}")
+    path = os.path.abspath(path)
+    return Source(path, table, file_fingerprint(path), file_records(path, mapping, constants), f"{path}.rejects.jsonl")
+
+
+def knowledge_source(path=KNOWLEDGE_FILE):
+    """Every city of india_knowledge.json as a city_overview row"""
+    def records(skip):
+        with open(path, 'r', encoding='utf-8') as file:
+            knowledge = json.load(file)
+        cities = {}
+        for state_name, state in knowledge.get('states', {}).items():
+            for city_name in state.get('cities', []):
+                cities.setdefault(city_name, state_name)
+        for city_name, state_name in knowledge.get('city_to_state', {}).items():
+            cities.setdefault(city_name, state_name)
+        for n, (city_name, state_name) in enumerate(cities.items()):
+            if n >= skip:
+                yield {'city_name': city_name, 'state_name': state_name}
+
+    path = os.path.abspath(path)
+    return Source(path, 'city_overview', file_fingerprint(path), records, None)
+
+
+def rows_done(connection, source, restart=False):
+    """Source rows an earlier run committed, or 0 if the file changed since (or --restart)"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT fingerprint, rows_done FROM bulk_load_progress WHERE source = %s", (source.name,))
+    row = cursor.fetchone()
+    cursor.close()
+    if restart or not row or row[0] != source.fingerprint:
+        return 0
+    return row[1]
+
+
+def write_batch(connection, source, batch, consumed):
+    """Upsert the batch and record progress in one transaction"""
+    groups = {}
+    for values in batch:
+        groups.setdefault(tuple(values), []).append(tuple(values.values()))
+    cursor = connection.cursor()
+    try:
+        for columns, rows in groups.items():
+            cursor.executemany(upsert_statement(source.table, columns), rows)
+        cursor.execute("""
+        INSERT INTO bulk_load_progress (source, table_name, fingerprint, rows_done) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE table_name = VALUES(table_name), fingerprint = VALUES(fingerprint),
+            rows_done = VALUES(rows_done), updated_at = NOW()
+        """, (source.name, source.table, source.fingerprint, consumed))
+        connection.commit()
+    except DATABASE_ERRORS:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def load_source(connection, source, batch_size=None, restart=False):
+    """Stream one source into its table; returns {'rows', 'loaded', 'rejected', 'resumed', 'seconds'}"""
+    batch_size = batch_size or Config.BULK_LOAD_BATCH_SIZE
+    columns = table_columns()[source.table]
+    resumed = rows_done(connection, source, restart)
+    consumed, loaded, rejected = resumed, 0, 0
+    batch, batch_rejects = [], []
+    rejects = None
+    start = last_report = time.perf_counter()
+
+    def flush():
+        """Commit the batch, then log its rejected rows: a resumed run starts after the commit, so
+        rejects read past it are logged again then and must not be logged now"""
+        nonlocal rejects
+        write_batch(connection, source, batch, consumed)
+        if batch_rejects and source.rejects_path:
+            if rejects is None:
+                rejects = open(source.rejects_path, 'a' if resumed else 'w', encoding='utf-8')
+            rejects.writelines(batch_rejects)
+            rejects.flush()
+
+    try:
+        for n, row in enumerate(source.records(resumed), start=resumed + 1):
+            values, error = (None, f"unreadable: {row}") if isinstance(row, Exception) else validate(row, columns)
+            if error:
+                rejected += 1
+                batch_rejects.append(json.dumps({'row': n, 'error': error, 'data': None if isinstance(row, Exception) else row},
+                                                ensure_ascii=False, default=str) + '\n')
+            else:
+                batch.append(values)
+            consumed = n
+            if len(batch) >= batch_size:
+                flush()
+                loaded += len(batch)
+                batch, batch_rejects = [], []
+                if time.perf_counter() - last_report >= 5:
+                    last_report = time.perf_counter()
+                    print(f"   … {consumed} rows, {(consumed - resumed) / (last_report - start):.0f} rows/s")
+        if consumed > resumed:
+            flush()
+            loaded += len(batch)
+    finally:
+        if rejects is not None:
+            rejects.close()
+    return {'rows': consumed - resumed, 'loaded': loaded, 'rejected': rejected, 'resumed': resumed,
+            'seconds': time.perf_counter() - start}
+
+
+def bulk_load(connection, sources, batch_size=None, defer_indexes=False, restart=False):
+    """Load every source. With defer_indexes the tables' secondary indexes are dropped first;
+    they are rebuilt at the end either way, even if a load fails"""
+    tables = sorted({source.table for source in sources})
+    if defer_indexes:
+        for table in tables:
+            drop_indexes(connection, table)
+    results = []
+    try:
+        for source in sources:
+            result = load_source(connection, source, batch_size, restart)
+            results.append(result)
+            if result['resumed'] and not result['rows']:
+                print(f"✓ {os.path.basename(source.name)} → {source.table}: already loaded ({result['resumed']} rows)")
+                continue
+            rate = result['rows'] / result['seconds'] if result['seconds'] else 0
+            resumed = f", resumed after row {result['resumed']}" if result['resumed'] else ''
+            print(f"✓ {os.path.basename(source.name)} → {source.table}: {result['loaded']} upserted, "
+                  f"{result['rejected']} rejected in {result['seconds']:.2f}s ({rate:.0f} rows/s{resumed})")
+            if result['rejected'] and source.rejects_path:
+                print(f"   rejected rows: {source.rejects_path}")
+    finally:
+        # Also restores indexes a killed earlier --defer-indexes run left dropped; a no-op otherwise
+        for table in tables:
+            rebuild_indexes(connection, table)
+        mark_reference_data_changed()
+    return results
+
+
+def connect(migrate=True):
+    """Connection to the configured database; with migrate, the schema is brought up to date first"""
+    if Config.DB_BACKEND == 'sqlite':
+        if migrate:
+            ensure_schema()
+        connection = connect_sqlite()
+        # Rows arrive in file order, not key order; a 64 MB page cache (default 2 MB) keeps the
+        # unique index in memory instead of re-reading its pages for every batch
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA cache_size = -65536")
+        cursor.close()
+        return connection
+    connection = mysql.connector.connect(**connection_settings())
+    if migrate:
+        apply_migrations(connection)
+    return connection
+
+
+def key_values(pairs, option):
+    result = {}
+    for pair in pairs or []:
+        key, separator, value = pair.partition('=')
+        if not separator:
+            raise SystemExit(f"{option} expects name=value, got {pair!r}")
+        result[key] = value
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load CSV/JSONL files into the city reference tables")
+    parser.add_argument('files', nargs='*', help=".csv or .jsonl files; the table defaults to the file name")
+    parser.add_argument('--table', choices=sorted(NATURAL_KEYS), help="table for all the files")
+    parser.add_argument('--map', action='append', metavar='SOURCE=COLUMN', help="rename a source field")
+    parser.add_argument('--set', action='append', metavar='COLUMN=VALUE', help="fill a column on every row")
+    parser.add_argument('--knowledge', action='store_true', help="load every city in india_knowledge.json")
+    parser.add_argument('--batch-size', type=int, default=Config.BULK_LOAD_BATCH_SIZE)
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="drop secondary indexes during the load and rebuild them at the end (offline loads only)")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="delete rows that repeat a natural key (backed up to <table>.duplicates.jsonl), then migrate")
+    parser.add_argument('--restart', action='store_true', help="ignore the progress of earlier runs")
+    args = parser.parse_args()
+
+    mapping, constants = key_values(args.map, '--map'), key_values(args.set, '--set')
+    sources = [knowledge_source()] if args.knowledge else []
+    try:
+        sources += [file_source(path, args.table, mapping, constants) for path in args.files]
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+    if not sources and not args.dedupe:
+        parser.error("give files to load, --knowledge or --dedupe")
+
+    if args.dedupe:
+        try:
+            connection = connect(migrate=False)
+        except DATABASE_ERRORS as e:
+            print(f"❌ Could not connect to the database: {e}")
+            return
+        try:
+            removed = remove_duplicates(connection)
+        finally:
+            connection.close()
+        print(f"✓ {sum(removed.values())} duplicate row(s) deleted" if removed else "✓ No duplicate rows")
+
+    try:
+        connection = connect()
+    except DATABASE_ERRORS as e:
+        print(f"❌ Could not connect to the database: {e}")
+        return
+    try:
+        if not sources:
+            return
+        results = bulk_load(connection, sources, args.batch_size, defer_indexes=args.defer_indexes, restart=args.restart)
+    finally:
+        connection.close()
+    rows = sum(result['rows'] for result in results)
+    seconds = sum(result['seconds'] for result in results)
+    print(f"🎉 {rows} rows from {len(results)} source(s) in {seconds:.2f}s ({rows / seconds if seconds else 0:.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
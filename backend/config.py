@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,4 +8,172 @@ class Config:
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
     DEFAULT_MODEL = os.getenv('DEFAULT_MODEL', 'llama2')
-    PORT = int(os.getenv('PORT', 5000))
\ No newline at end of file
+    PORT = int(os.getenv('PORT', 5000))
+
+    # Share one Ollama generation between concurrent identical prompts
+    OLLAMA_COALESCE = os.getenv('OLLAMA_COALESCE', 'True').lower() == 'true'
+
+    # Admission control in front of Ollama (match OLLAMA_MAX_CONCURRENT to the host's OLLAMA_NUM_PARALLEL)
+    OLLAMA_MAX_CONCURRENT = int(os.getenv('OLLAMA_MAX_CONCURRENT', 2))
+    OLLAMA_MAX_QUEUE = int(os.getenv('OLLAMA_MAX_QUEUE', 16))
+    OLLAMA_QUEUE_TIMEOUT = float(os.getenv('OLLAMA_QUEUE_TIMEOUT', 30))
+    OLLAMA_WARMUP = os.getenv('OLLAMA_WARMUP', 'True').lower() == 'true'
+
+    # Circuit breaker and background health probe for Ollama (interval 0 disables the probe)
+    OLLAMA_BREAKER_FAILURE_RATE = float(os.getenv('OLLAMA_BREAKER_FAILURE_RATE', 0.5))
+    OLLAMA_BREAKER_MIN_CALLS = int(os.getenv('OLLAMA_BREAKER_MIN_CALLS', 5))
+    OLLAMA_BREAKER_WINDOW = int(os.getenv('OLLAMA_BREAKER_WINDOW', 20))
+    OLLAMA_BREAKER_OPEN_SECONDS = float(os.getenv('OLLAMA_BREAKER_OPEN_SECONDS', 15))
+    OLLAMA_HEALTH_INTERVAL = float(os.getenv('OLLAMA_HEALTH_INTERVAL', 10))
+
+    # Ollama servers to spread generations over, comma-separated (OLLAMA_MAX_CONCURRENT applies per server)
+    OLLAMA_HOSTS = [h.strip() for h in os.getenv('OLLAMA_HOSTS', OLLAMA_HOST).split(',') if h.strip()]
+
+    # Hedged requests: when the first token is later than the pct-th percentile, duplicate the
+    # generation on a second backend and keep the faster one (needs two or more OLLAMA_HOSTS)
+    OLLAMA_HEDGE_ENABLED = os.getenv('OLLAMA_HEDGE_ENABLED', 'False').lower() == 'true'
+    OLLAMA_HEDGE_PERCENTILE = float(os.getenv('OLLAMA_HEDGE_PERCENTILE', 95))
+    OLLAMA_HEDGE_MIN_DELAY_MS = float(os.getenv('OLLAMA_HEDGE_MIN_DELAY_MS', 250))
+    OLLAMA_HEDGE_DEFAULT_DELAY_MS = float(os.getenv('OLLAMA_HEDGE_DEFAULT_DELAY_MS', 2000))
+    OLLAMA_HEDGE_MAX_RATE = float(os.getenv('OLLAMA_HEDGE_MAX_RATE', 0.1))
+
+    # Storage behind DatabaseService and UserService: 'mysql', or 'sqlite' for an embedded
+    # WAL-mode file (created with the schema on first use) that needs no database server
+    DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'city_guide.sqlite3'))
+    SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+    # Connection pool shared by DatabaseService and UserService
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+    # Upper bound on one SELECT (MySQL MAX_EXECUTION_TIME); a request deadline can tighten it
+    DB_QUERY_TIMEOUT = float(os.getenv('DB_QUERY_TIMEOUT', 5))
+    DB_MIN_QUERY_SECONDS = float(os.getenv('DB_MIN_QUERY_SECONDS', 0.05))
+    # Rows per multi-row upsert (and per commit) in bulk_load.py
+    BULK_LOAD_BATCH_SIZE = int(os.getenv('BULK_LOAD_BATCH_SIZE', 2000))
+
+    # In-process read-through cache of the near-static city reference tables (TTLs in seconds per
+    # table, entries per table). init_database.py touches the stamp file after reloading data,
+    # and every server process drops its cached rows once it sees the new mtime
+    REFERENCE_CACHE_ENABLED = os.getenv('REFERENCE_CACHE_ENABLED', 'True').lower() == 'true'
+    REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv('REFERENCE_CACHE_MAX_ENTRIES', 512))
+    REFERENCE_CACHE_DEFAULT_TTL = int(os.getenv('REFERENCE_CACHE_DEFAULT_TTL', 3600))
+    REFERENCE_CACHE_TTLS = {
+        'city_overview': 24 * 3600,
+        'culture_traditions': 24 * 3600,
+        'places_history': 24 * 3600,
+        'tourist_places': 6 * 3600,
+        'accommodation': 6 * 3600,
+        'restaurants_streetfood': 3600,
+        'transport_traffic': 900,
+        **json.loads(os.getenv('REFERENCE_CACHE_TTLS', '{}'))
+    }
+    REFERENCE_CACHE_STAMP = os.getenv(
+        'REFERENCE_CACHE_STAMP', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', '.reference_data_version')
+    )
+    REFERENCE_CACHE_STAMP_CHECK_INTERVAL = float(os.getenv('REFERENCE_CACHE_STAMP_CHECK_INTERVAL', 2))
+
+
+    # /api/chat response cache (TTLs in seconds per intent, 0 = never cache)
+    CHAT_CACHE_ENABLED = os.getenv('CHAT_CACHE_ENABLED', 'True').lower() == 'true'
+    CHAT_CACHE_MAX_ENTRIES = int(os.getenv('CHAT_CACHE_MAX_ENTRIES', 1000))
+    CHAT_CACHE_DEFAULT_TTL = int(os.getenv('CHAT_CACHE_DEFAULT_TTL', 3600))
+    CHAT_CACHE_TTLS = {
+        'greeting': 24 * 3600,
+        'vague_location': 24 * 3600,
+        'clarification_needed': 24 * 3600,
+        'history': 7 * 24 * 3600,
+        'travel_places': 24 * 3600,
+        'food_culture': 24 * 3600,
+        'seasonal_festival': 6 * 3600,
+        'comparison': 24 * 3600,
+        'general_exploration': 3600,
+        **json.loads(os.getenv('CHAT_CACHE_TTLS', '{}'))
+    }
+
+
+    # Answer greetings, clarifications and short Agra lookups from templates instead of the LLM
+    CHAT_TEMPLATE_TIER_ENABLED = os.getenv('CHAT_TEMPLATE_TIER_ENABLED', 'True').lower() == 'true'
+    CHAT_TEMPLATE_MAX_WORDS = int(os.getenv('CHAT_TEMPLATE_MAX_WORDS', 12))
+
+
+    # Ollama generation profiles (the models must be pulled; a missing one falls back to OllamaClient's model)
+    OLLAMA_SMALL_MODEL = os.getenv('OLLAMA_SMALL_MODEL', 'llama3.2')
+    OLLAMA_LARGE_MODEL = os.getenv('OLLAMA_LARGE_MODEL', 'llama3')
+    OLLAMA_NUM_CTX_BUCKETS = [int(n) for n in os.getenv('OLLAMA_NUM_CTX_BUCKETS', '2048,4096,8192').split(',')]
+    GENERATION_PROFILES = {
+        'quick': {'model': OLLAMA_SMALL_MODEL, 'num_predict': {'concise': 60, 'detailed': 120}, 'keep_alive': '30m'},
+        'standard': {'model': OLLAMA_LARGE_MODEL, 'num_predict': {'concise': 256, 'detailed': 512}, 'keep_alive': '15m'},
+        'deep': {'model': OLLAMA_LARGE_MODEL, 'num_predict': {'concise': 384, 'detailed': 768}, 'keep_alive': '15m'},
+        **json.loads(os.getenv('GENERATION_PROFILES', '{}'))
+    }
+    INTENT_PROFILES = {
+        'greeting': 'quick',
+        'vague_location': 'quick',
+        'clarification_needed': 'quick',
+        'comparison': 'deep',
+        'history': 'deep',
+        **json.loads(os.getenv('INTENT_PROFILES', '{}'))
+    }
+
+
+    # Token budget for the knowledge section of a prompt, per intent
+    KNOWLEDGE_TOKEN_BUDGET = int(os.getenv('KNOWLEDGE_TOKEN_BUDGET', 400))
+    KNOWLEDGE_TOKEN_BUDGETS = {
+        'history': 500,
+        'travel_places': 450,
+        'food_culture': 450,
+        'seasonal_festival': 250,
+        'comparison': 350,
+        'general_exploration': 300,
+        **json.loads(os.getenv('KNOWLEDGE_TOKEN_BUDGETS', '{}'))
+    }
+
+
+    # Reuse Ollama's returned `context` across turns of the same conversation
+    CONVERSATION_CONTEXT_ENABLED = os.getenv('CONVERSATION_CONTEXT_ENABLED', 'True').lower() == 'true'
+    CONVERSATION_MAX = int(os.getenv('CONVERSATION_MAX', 500))
+    CONVERSATION_MAX_TOTAL_TOKENS = int(os.getenv('CONVERSATION_MAX_TOTAL_TOKENS', 2000000))
+    CONVERSATION_MAX_CONTEXT_TOKENS = int(os.getenv('CONVERSATION_MAX_CONTEXT_TOKENS', 6144))
+    CONVERSATION_IDLE_TTL = int(os.getenv('CONVERSATION_IDLE_TTL', 1800))
+
+    # Abort generations nobody will read: a newer message in the same conversation supersedes the
+    # older request, and clients are checked for disconnects this often (0 disables the check)
+    CHAT_SUPERSEDE_ENABLED = os.getenv('CHAT_SUPERSEDE_ENABLED', 'True').lower() == 'true'
+    CHAT_DISCONNECT_POLL_INTERVAL = float(os.getenv('CHAT_DISCONNECT_POLL_INTERVAL', 0.5))
+
+    # Per-request time budget by mode, in seconds. Enrichment (knowledge context)
+    # only runs while more than the mode's generation reserve is left; with less than
+    # CHAT_MIN_GENERATION_SECONDS to go the LLM is skipped and a template answers instead
+    CHAT_DEADLINES = {
+        'text': 60,
+        'voice': 15,
+        **json.loads(os.getenv('CHAT_DEADLINES', '{}'))
+    }
+    CHAT_GENERATION_RESERVES = {
+        'text': 20,
+        'voice': 8,
+        **json.loads(os.getenv('CHAT_GENERATION_RESERVES', '{}'))
+    }
+    CHAT_DEADLINE_DEFAULT = float(os.getenv('CHAT_DEADLINE_DEFAULT', 60))
+    CHAT_ENRICHMENT_MIN_SECONDS = float(os.getenv('CHAT_ENRICHMENT_MIN_SECONDS', 0.25))
+    CHAT_MIN_GENERATION_SECONDS = float(os.getenv('CHAT_MIN_GENERATION_SECONDS', 2))
+
+    # Run independent pre-LLM stages (the knowledge context's DB queries, recommendations) in
+    # parallel on a pool of this many threads shared by all requests
+    CHAT_FANOUT_ENABLED = os.getenv('CHAT_FANOUT_ENABLED', 'True').lower() == 'true'
+    CHAT_FANOUT_WORKERS = int(os.getenv('CHAT_FANOUT_WORKERS', 16))
+
+    # /api/chat/batch: most items one request may carry, and how many unique questions it
+    # answers at once (generations also queue behind interactive chats at batch priority)
+    CHAT_BATCH_MAX_ITEMS = int(os.getenv('CHAT_BATCH_MAX_ITEMS', 500))
+    CHAT_BATCH_CONCURRENCY = int(os.getenv('CHAT_BATCH_CONCURRENCY', 4))
+
+    # Pre-forking production server (python serve.py): the master preloads the app and its
+    # read-only data, then forks this many gunicorn workers with this many threads each.
+    # OLLAMA_MAX_CONCURRENT is split between the workers, since each has its own scheduler
+    WSGI_BIND = os.getenv('WSGI_BIND', '0.0.0.0:5000')
+    WSGI_WORKERS = int(os.getenv('WSGI_WORKERS', 2))
+    WSGI_THREADS = int(os.getenv('WSGI_THREADS', 16))
+    WSGI_TIMEOUT = int(os.getenv('WSGI_TIMEOUT', 180))
+    WSGI_GRACEFUL_TIMEOUT = int(os.getenv('WSGI_GRACEFUL_TIMEOUT', 30))
@@ -0,0 +1,42 @@
+import pytest
+from app import create_app
+from benchmarks.stub_ollama import StubOllama
+from config import Config
+from services.registry import ServiceRegistry
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "stub_ollama(**options): StubOllama options for the stub_ollama fixture")
+
+
+@pytest.fixture
+def stub_ollama(request):
+    """A StubOllama server; a module or test sets its options with @pytest.mark.stub_ollama(...)"""
+    marker = request.node.get_closest_marker('stub_ollama')
+    server = StubOllama(**(marker.kwargs if marker else {})).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def stub_services(stub_ollama, monkeypatch):
+    """Fresh services whose Ollama client talks to stub_ollama, without warm-up or health checks"""
+    monkeypatch.setattr(Config, 'OLLAMA_HOSTS', [stub_ollama.host])
+    monkeypatch.setattr(Config, 'OLLAMA_WARMUP', False)
+    monkeypatch.setattr(Config, 'OLLAMA_HEALTH_INTERVAL', 0)
+    monkeypatch.setattr('services.registry._default_registry', ServiceRegistry())
+    return stub_ollama
+
+
+@pytest.fixture
+def stub_app(stub_services):
+    """Flask app answering from stub_ollama"""
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def app(stub_app):
+    """The app for pytest-flask's client fixture"""
+    return stub_app
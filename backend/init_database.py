@@ -8,11 +8,21 @@ import mysql.connector
 from mysql.connector import Error
 import os
 from dotenv import load_dotenv
+from config import Config
+from bulk_load import bulk_load, knowledge_source
+from migrate import apply_migrations
+from services.database_service import DATABASE_ERRORS, is_duplicate_entry
+from services.reference_cache import mark_reference_data_changed
+from services.sqlite_backend import connect as connect_sqlite, ensure_schema
 
 load_dotenv()
 
 def create_database_connection():
     """Create database connection"""
+    if Config.DB_BACKEND == 'sqlite':
+        # The embedded file needs no server; its tables are created before the setup script runs
+        ensure_schema()
+        return connect_sqlite()
     try:
         connection = mysql.connector.connect(
             host=os.getenv('DB_HOST', 'localhost'),
@@ -40,7 +50,10 @@ def execute_sql_file(connection, filename):
                     cursor.execute(command)
                     connection.commit()
                     print(f"✓ Executed: {command[:50]}...")
-                except Error as e:
+                except DATABASE_ERRORS as e:
+                    if is_duplicate_entry(e):
+                        print(f"↷ Already loaded: {command[:50]}...")
+                        continue
                     print(f"✗ Error executing command: {e}")
         
         cursor.close()
@@ -99,7 +112,10 @@ def insert_sample_data(connection):
                 cursor.execute(sql_command)
                 connection.commit()
                 print("✓ Inserted sample data batch")
-            except Error as e:
+            except DATABASE_ERRORS as e:
+                if is_duplicate_entry(e):
+                    print("↷ Sample data batch already loaded")
+                    continue
                 print(f"✗ Error inserting data: {e}")
         
         cursor.close()
@@ -118,7 +134,7 @@ def main():
         print("❌ Failed to connect to MySQL. Please check your database configuration.")
         return
     
-    print("✓ Connected to MySQL")
+    print(f"✓ Connected to {'SQLite' if Config.DB_BACKEND == 'sqlite' else 'MySQL'}")
     
     # Execute schema setup
     print("\n📋 Setting up database schema...")
@@ -128,8 +144,19 @@ def main():
     print("\n📊 Inserting comprehensive sample data...")
     insert_sample_data(connection)
     
+    # Indexes and later schema changes (the setup script selected the database)
+    print("\n🗂️  Applying schema migrations...")
+    apply_migrations(connection)
+
+    # Every other city gets its overview row (state) from the knowledge base
+    print("\n🏙️  Loading the cities of india_knowledge.json...")
+    bulk_load(connection, [knowledge_source()])
+    
     # Close connection
     connection.close()
+
+    # Running servers cache the reference tables; the new stamp makes them reload
+    mark_reference_data_changed()
     print("\n🎉 Database initialization completed successfully!")
     print("\n📝 Next steps:")
     print("1. Update your .env file with correct database credentials")
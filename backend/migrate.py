@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations.
+
+Each file in backend/migrations/ named NNN_description.sql is applied once, in version order,
+and recorded in the schema_migrations table. Running it again only applies what is new, and a
+migration that stopped halfway can be re-run: statements whose change is already in place
+(an index or column that exists, a drop of one that does not) are skipped.
+
+Run from the repository root:  python backend/migrate.py
+"""
+
+import hashlib
+import os
+import re
+import mysql.connector
+from mysql.connector import Error
+from services.database_service import DATABASE_ERRORS, connection_settings, is_duplicate_entry
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+# MySQL errors that mean the statement's change is already there
+ALREADY_APPLIED = {
+    1050: 'table already exists',
+    1060: 'column already exists',
+    1061: 'index already exists',
+    1091: 'nothing to drop'
+}
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] of the migration files, in version order"""
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Two migrations share version {version}: {migrations[version][1]} and {filename}")
+        migrations[version] = (version, filename, os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+def split_statements(sql):
+    """Statements of a migration file, without comment lines"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+def applied_migrations(cursor):
+    """{version: checksum} of the migrations already recorded"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+def apply_migrations(connection, directory=MIGRATIONS_DIR):
+    """Apply pending migrations on a connection with the database selected; returns the versions applied"""
+    cursor = connection.cursor()
+    applied = applied_migrations(cursor)
+    newly_applied = []
+    for version, name, path in discover(directory):
+        with open(path, 'r', encoding='utf-8') as file:
+            sql = file.read()
+        checksum = hashlib.sha256(sql.encode('utf-8')).hexdigest()
+        if version in applied:
+            if applied[version] != checksum:
+                print(f"⚠️  Migration {name} changed after it was applied; add a new migration instead")
+            continue
+
+        for statement in split_statements(sql):
+            try:
+                cursor.execute(statement)
+            except DATABASE_ERRORS as e:
+                errno = getattr(e, 'errno', None)
+                if errno not in ALREADY_APPLIED:
+                    cursor.close()
+                    if is_duplicate_entry(e):
+                        print(f"❌ {name} adds a unique key but the table has duplicate rows ({e}); "
+                              "review and remove them with python backend/bulk_load.py --dedupe")
+                    raise
+                print(f"↷ Skipped ({ALREADY_APPLIED[errno]}): {statement[:60]}...")
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+            (version, name, checksum)
+        )
+        connection.commit()
+        newly_applied.append(version)
+        print(f"✓ Applied migration {name}")
+    cursor.close()
+    return newly_applied
+
+def main():
+    settings = connection_settings()
+    try:
+        connection = mysql.connector.connect(**settings)
+    except Error as e:
+        print(f"❌ Could not connect to MySQL: {e}")
+        return
+    try:
+        applied = apply_migrations(connection)
+        print(f"🎉 {len(applied)} migration(s) applied to {settings['database']}" if applied else "✓ Schema is up to date")
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+-- Indexes for the lookups every chat and login makes.
+-- City reference tables are always filtered by city_name; where the query also sorts,
+-- the index carries the ORDER BY columns so MySQL reads rows in order instead of a filesort.
+-- Needs MySQL 8.0+ for the DESC key parts.
+
+CREATE INDEX idx_city_overview_city ON city_overview (city_name);
+
+CREATE INDEX idx_places_history_city_place ON places_history (city_name, place_name);
+
+CREATE INDEX idx_markets_streets_city_market ON markets_streets (city_name, market_name);
+
+CREATE INDEX idx_local_foods_city_food ON local_foods (city_name, food_name);
+
+-- get_restaurants_by_city: WHERE city_name ORDER BY category, popularity DESC
+CREATE INDEX idx_restaurants_city_category_popularity ON restaurants_streetfood (city_name, category, popularity DESC);
+
+-- get_places_to_visit: WHERE city_name ORDER BY importance DESC, category
+CREATE INDEX idx_tourist_places_city_importance_category ON tourist_places (city_name, importance DESC, category);
+
+CREATE INDEX idx_transport_traffic_city ON transport_traffic (city_name);
+
+-- get_accommodation_info: WHERE city_name ORDER BY category, area_name
+CREATE INDEX idx_accommodation_city_category_area ON accommodation (city_name, category, area_name);
+
+-- get_cultural_info: WHERE city_name ORDER BY importance DESC
+CREATE INDEX idx_culture_traditions_city_importance ON culture_traditions (city_name, importance DESC);
+
+-- authenticate_user: WHERE login_identifier AND login_type, joined to users on user_id
+CREATE INDEX idx_user_auth_identifier_type ON user_auth (login_identifier, login_type, user_id);
+
+-- Expired guest sessions are found (and purged) by expiry time
+CREATE INDEX idx_guest_sessions_expires_at ON guest_sessions (expires_at);
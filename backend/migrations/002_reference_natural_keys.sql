@@ -0,0 +1,38 @@
+-- Natural keys for the city reference tables, so bulk loads can upsert instead of duplicating rows,
+-- and the progress table that lets an interrupted bulk load resume.
+-- Re-running the old setup scripts could insert the same row twice. Such a table fails its unique
+-- index here (duplicate entry) and nothing is deleted; review and remove the extra rows with
+-- `python backend/bulk_load.py --dedupe`, then run the migrations again.
+
+-- Where 001 already indexed exactly the key columns, the unique index replaces it
+-- (created first, so a table with duplicates keeps its old index)
+CREATE UNIQUE INDEX uq_city_overview_city ON city_overview (city_name);
+DROP INDEX idx_city_overview_city ON city_overview;
+
+CREATE UNIQUE INDEX uq_places_history_city_place ON places_history (city_name, place_name);
+DROP INDEX idx_places_history_city_place ON places_history;
+
+CREATE UNIQUE INDEX uq_markets_streets_city_market ON markets_streets (city_name, market_name);
+DROP INDEX idx_markets_streets_city_market ON markets_streets;
+
+CREATE UNIQUE INDEX uq_local_foods_city_food ON local_foods (city_name, food_name);
+DROP INDEX idx_local_foods_city_food ON local_foods;
+
+CREATE UNIQUE INDEX uq_restaurants_city_place ON restaurants_streetfood (city_name, place_name);
+
+CREATE UNIQUE INDEX uq_tourist_places_city_place ON tourist_places (city_name, place_name);
+
+CREATE UNIQUE INDEX uq_transport_traffic_city_type ON transport_traffic (city_name, transport_type);
+
+CREATE UNIQUE INDEX uq_accommodation_city_area ON accommodation (city_name, area_name);
+
+CREATE UNIQUE INDEX uq_culture_traditions_city_tradition ON culture_traditions (city_name, tradition_name);
+
+-- Rows of each bulk-load source committed so far; written in the same transaction as the rows
+CREATE TABLE IF NOT EXISTS bulk_load_progress (
+    source VARCHAR(255) PRIMARY KEY,
+    table_name VARCHAR(100) NOT NULL,
+    fingerprint VARCHAR(100) NOT NULL,
+    rows_done INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
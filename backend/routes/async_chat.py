@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from routes.chat import (
+    DEGRADABLE_ERRORS, StreamReply, chat_error_payload, fallback_chunk, finish_chat, metrics_snapshot,
+    plan_chat, remember_context, request_deadline
+)
+from services.registry import get_services
+from utils.asgi import JSONResponse, run_in_deadline
+from config import Config
+
+# The same /api/chat endpoints as routes/chat.py, for the ASGI app (asgi.py). Template, cache and
+# prompt work still runs the blocking pipeline on a worker thread; the wait for Ollama does not.
+
+def chat_error_response(e):
+    body, status = chat_error_payload(e)
+    headers = {'Retry-After': str(body['retry_after'])} if 'retry_after' in body else None
+    return JSONResponse(body, status_code=status, headers=headers)
+
+def track_generation(chat_ctx, deadline, disconnected=None):
+    """Like routes.chat.track_generation(); disconnected is a threading.Event set when the client hangs up"""
+    key = chat_ctx['conversation_id'] if Config.CHAT_SUPERSEDE_ENABLED else None
+    probe = disconnected.is_set if disconnected is not None else None
+    return key, get_services().active_requests.begin(key, probe, deadline)
+
+async def watch_disconnect(request, disconnected):
+    # Once the body has been read, the next ASGI message is the disconnect
+    while True:
+        message = await request.receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+async def generate_answer(request, plan, deadline):
+    """Run the LLM tier of a plan_chat() plan; returns (tier, response_text, queue_ms)"""
+    chat_ctx = plan['chat_ctx']
+    generation = plan['generation']
+    disconnected = threading.Event()
+    watcher = asyncio.ensure_future(watch_disconnect(request, disconnected))
+    tracked = track_generation(chat_ctx, deadline, disconnected)
+    generation['cancel'] = tracked[1]
+    outcome = {'tier': 'llm'}
+    print(f"🤖 Calling Ollama...")
+    try:
+        reply = await request.app.state.ollama_client.generate(plan['prompt'], plan['context'], generation)
+    except DEGRADABLE_ERRORS as e:
+        chunk = await run_in_deadline(deadline, fallback_chunk, e, False, chat_ctx, plan['cache_key'], outcome)
+        get_services().conversation_store.drop(chat_ctx['conversation_id'])
+        return outcome['tier'], chunk['response'], 0
+    finally:
+        watcher.cancel()
+        get_services().active_requests.end(*tracked)
+
+    response_text = reply['response']
+    remember_context(chat_ctx, reply.get('context'), plan['model'], plan['prompt_state'])
+    print(f"✅ Received response ({len(response_text)} chars)")
+    if plan['cache_key']:
+        get_services().response_cache.set(plan['cache_key'], response_text, chat_ctx['intent'])
+    return 'llm', response_text, reply.get('queue_wait_ms', 0)
+
+async def chat(request):
+    start_time = time.time()
+    try:
+        data = await request.json()
+        deadline = request_deadline(data)
+        plan = await run_in_deadline(deadline, plan_chat, data)
+        tier, response_text, queue_ms = plan['tier'], plan['response_text'], 0
+        if tier == 'llm':
+            tier, response_text, queue_ms = await generate_answer(request, plan, deadline)
+        latency_ms = (time.time() - start_time) * 1000
+        return JSONResponse(finish_chat(plan['chat_ctx'], tier, response_text, plan['generation'], latency_ms, queue_ms, deadline))
+    except Exception as e:
+        return chat_error_response(e)
+
+async def chat_stream(request):
+    """Stream tokens as Server-Sent Events, ending with a 'done' trailer event"""
+    start_time = time.time()
+    try:
+        data = await request.json()
+        deadline = request_deadline(data)
+        plan = await run_in_deadline(deadline, plan_chat, data)
+    except Exception as e:
+        return chat_error_response(e)
+    return StreamingResponse(
+        stream_events(request, plan, deadline, start_time),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+async def stream_events(request, plan, deadline, start_time):
+    # Starlette cancels this generator when the client disconnects, which closes the Ollama stream
+    chat_ctx = plan['chat_ctx']
+    generation = plan['generation']
+    reply = StreamReply(chat_ctx, plan['model'], plan['tier'], plan['cache_key'], generation,
+                        plan['prompt_state'], deadline, start_time)
+    tracked = None
+    try:
+        if plan['response_text'] is not None:
+            chunks = [{'response': plan['response_text'], 'done': True}]
+        else:
+            tracked = track_generation(chat_ctx, deadline)
+            generation['cancel'] = tracked[1]
+            chunks = []
+            sent = False
+            try:
+                async for chunk in request.app.state.ollama_client.stream_generate(plan['prompt'], plan['context'], generation):
+                    sent = sent or bool(chunk.get('response'))
+                    frame = reply.feed(chunk)
+                    if frame:
+                        yield frame
+            except DEGRADABLE_ERRORS as e:
+                chunks = [await run_in_deadline(deadline, fallback_chunk, e, sent, chat_ctx, plan['cache_key'], reply.outcome)]
+        for chunk in chunks:
+            frame = reply.feed(chunk)
+            if frame:
+                yield frame
+        frame = reply.tail()
+        if frame:
+            yield frame
+    except Exception as e:
+        yield reply.error(e)
+        return
+    finally:
+        if tracked:
+            get_services().active_requests.end(*tracked)
+    yield reply.finish()
+
+async def chat_metrics(request):
+    """Expose in-process chat latency counters, cache, coalescing and database pool usage"""
+    snapshot = metrics_snapshot()
+    snapshot['async_db_pool'] = request.app.state.database_service.stats()
+    return JSONResponse(snapshot)
+
+routes = [
+    Route('/api/chat/', chat, methods=['POST']),
+    Route('/api/chat/stream', chat_stream, methods=['POST']),
+    Route('/api/chat/metrics', chat_metrics, methods=['GET'])
+]
@@ -0,0 +1,26 @@
+import asyncio
+from starlette.routing import Route
+from utils.asgi import JSONResponse
+
+CITIES_QUERY = "SELECT city_name as name, latitude, longitude, 'city' as type, historical_background as description FROM city_overview WHERE latitude IS NOT NULL"
+PLACES_QUERY = "SELECT place_name as name, latitude, longitude, 'historical_place' as type, historical_importance as description FROM places_history WHERE latitude IS NOT NULL"
+
+async def get_locations(request):
+    """Fetch all cities and historical places with coordinates for the map."""
+    try:
+        db = request.app.state.database_service
+
+        # The two queries are independent, so they share the round trip
+        cities, places = await asyncio.gather(db.execute_query(CITIES_QUERY), db.execute_query(PLACES_QUERY))
+
+        # Combine results
+        locations = (cities or []) + (places or [])
+
+        return JSONResponse(locations)
+    except Exception as e:
+        print(f"Error fetching map locations: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+routes = [
+    Route('/api/map/locations', get_locations, methods=['GET'])
+]
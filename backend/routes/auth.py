@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from services.user_service import UserService
+from services.registry import get_services
 from services.user_prompts import UserPrompts
 import re
 from datetime import datetime
@@ -43,7 +43,7 @@ def create_guest_session():
     try:
         # Try database first, fall back to simple mode
         try:
-            user_service = UserService()
+            user_service = get_services().user_service
             user_prompts = UserPrompts()
             
             # Test database connection
@@ -157,7 +157,7 @@ def signup():
         
         # Try database operations, fall back to simple mode if database unavailable
         try:
-            user_service = UserService()
+            user_service = get_services().user_service
             user_prompts = UserPrompts()
             
             # Test database connection first
@@ -239,7 +239,7 @@ def login():
         
     try:
         data = request.get_json()
-        user_service = UserService()
+        user_service = get_services().user_service
         user_prompts = UserPrompts()
         
         login_identifier = data.get('login_identifier', '').strip()
@@ -295,7 +295,7 @@ def get_profile():
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
         
-        user_service = UserService()
+        user_service = get_services().user_service
         user_prompts = UserPrompts()
         
         profile_data = user_service.get_user_profile(user_id)
@@ -325,7 +325,7 @@ def update_profile():
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
         
-        user_service = UserService()
+        user_service = get_services().user_service
         user_prompts = UserPrompts()
         
         # Remove user_id from update data
@@ -438,7 +438,7 @@ def validate_session():
         if not session_token:
             return jsonify({'error': 'Session token is required'}), 400
         
-        user_service = UserService()
+        user_service = get_services().user_service
         session_data = user_service.validate_guest_session(session_token)
         
         if session_data:
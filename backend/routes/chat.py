@@ -1,131 +1,815 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from functools import wraps
 import re
 import json
-from services.prompt_builder import PromptBuilder
-from services.user_service import UserService
-from services.ollama_client import OllamaClient
-from services.location_service import LocationService
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from services.metrics import metrics
+from services.registry import get_services
+from services.db_pool import pool_stats
+from services.reference_cache import reference_cache
+from services.cancellation import GenerationCancelled, disconnect_probe
+from services.circuit_breaker import CircuitOpenError
+from services.deadline import Deadline, current_deadline, deadline_scope
+from services.generation_scheduler import OverloadedError, PRIORITY_BATCH
 from utils.intent import detect_intent
+from location_data import CITY_GREETINGS
+from config import Config
 
 bp = Blueprint('chat', __name__, url_prefix='/api/chat')
 
-@bp.route('/', methods=['POST'])
-def chat():
+def prepare_chat(data):
+    """Resolve location and intent for a chat request (cheap, no I/O)"""
+    message = data.get('message', '')
+    user_id = data.get('user_id')
+    location_context = data.get('location_context', {}) # Get existing context
+
+    print(f"\n💬 Chat Request: '{message}'")
+
+    # 1. Infer location from current message
+    inferred = get_services().location_service.infer_location(message)
+    if inferred:
+        # Update context if new location detected
+        location_context.update(inferred)
+
+    # 2. Detect intent
+    intent = detect_intent(message)
+    print(f"🎯 Intent: {intent}")
+
+    return {
+        'message': message,
+        'user_id': user_id,
+        'conversation_id': data.get('conversation_id'),
+        'intent': intent,
+        'location_context': location_context,
+        'profile': data.get('profile', {}),
+        'mode': data.get('mode', 'text'),
+        'history': data.get('history', [])
+    }
+
+def build_chat_prompt(chat_ctx):
+    """Build the LLM prompt with location, knowledge and profile context.
+
+    Personalized recommendations are not fetched: the prompt has no section for them, and the
+    request's profile already carries the user's preferences.
+    """
+    location_context = chat_ctx['location_context']
+    return get_services().prompt_builder.build_prompt(
+        chat_ctx['message'],
+        chat_ctx['intent'],
+        location_context=location_context,
+        mode=chat_ctx['mode'],
+        history=chat_ctx['history'],
+        profile_data=chat_ctx['profile']
+    )
+
+def prepare_generation(chat_ctx, model):
+    """Return (prompt, context, prompt_state).
+
+    Follow-up turns of a conversation whose Ollama context is still stored send only the new
+    message plus that context; everything else gets the full prompt.
+    """
+    services = get_services()
+    stored = None
+    if chat_ctx['conversation_id'] and Config.CONVERSATION_CONTEXT_ENABLED:
+        stored = services.conversation_store.get(chat_ctx['conversation_id'], model)
+
+    if stored:
+        prompt, prompt_state = services.prompt_builder.build_followup_prompt(
+            chat_ctx['message'],
+            chat_ctx['intent'],
+            chat_ctx['location_context'],
+            stored['state']
+        )
+        metrics.incr('chat.context.reused')
+        print(f"♻️  Reusing conversation context ({len(stored['context'])} tokens)")
+        return prompt, stored['context'], prompt_state
+
+    metrics.incr('chat.context.rebuilt')
+    prompt = build_chat_prompt(chat_ctx)
+    return prompt, None, services.prompt_builder.prompt_state(chat_ctx['intent'], chat_ctx['location_context'])
+
+def generation_model(chat_ctx):
+    """Model of the generation profile for this intent (decides cache and conversation keys)"""
+    _, profile = get_services().generation_profiles.for_intent(chat_ctx['intent'])
+    return profile['model']
+
+def generation_settings(chat_ctx, prompt, context):
+    """Per-request Ollama settings: profile model, num_predict by responseStyle, num_ctx sized to the prompt"""
+    profile = chat_ctx['profile'] or {}
+    style = profile.get('responseStyle') if profile.get('isProfileActive') else None
+    generation = get_services().generation_profiles.settings(chat_ctx['intent'], prompt, context, style)
+    # Keep a conversation on the backend that already holds its KV cache
+    generation['affinity_key'] = chat_ctx['conversation_id']
+    print(f"🎛️  Profile '{generation['profile']}': {generation['model']}, {generation['options']}")
+    return generation
+
+def track_generation(chat_ctx):
+    """Return (key, token): the token is cancelled when a newer message arrives in the same
+    conversation, the client disconnects or the request deadline passes; hand both back to
+    release_generation()"""
+    key = chat_ctx['conversation_id'] if Config.CHAT_SUPERSEDE_ENABLED else None
+    return key, get_services().active_requests.begin(key, disconnect_probe(request.environ), current_deadline())
+
+def release_generation(tracked):
+    get_services().active_requests.end(*tracked)
+
+def remember_context(chat_ctx, context, model, prompt_state):
+    """Store the context Ollama returned so the next turn can skip re-prefilling"""
+    if chat_ctx['conversation_id'] and Config.CONVERSATION_CONTEXT_ENABLED:
+        get_services().conversation_store.put(chat_ctx['conversation_id'], context, model, prompt_state)
+
+def lookup_cached_response(data, chat_ctx, model):
+    """Return (cache_key, cached_text); cache_key is None when the cache is bypassed.
+
+    Conversations whose Ollama context is still stored skip the cache: that context holds more
+    than the last few turns the key covers, and a cached answer would throw it away.
+    """
+    if not Config.CHAT_CACHE_ENABLED or data.get('bypass_cache'):
+        metrics.incr('chat.cache.bypassed')
+        return None, None
+    services = get_services()
+    if (chat_ctx['conversation_id'] and Config.CONVERSATION_CONTEXT_ENABLED
+            and services.conversation_store.holds(chat_ctx['conversation_id'], model)):
+        metrics.incr('chat.cache.bypassed_context')
+        return None, None
+
+    cache = services.response_cache
+    cache_key = cache.make_key(
+        chat_ctx['message'],
+        chat_ctx['intent'],
+        chat_ctx['location_context'],
+        chat_ctx['profile'],
+        model,
+        chat_ctx['user_id'],
+        chat_ctx['history']
+    )
+    return cache_key, cache.get(cache_key)
+
+# Questions that need reasoning rather than a lookup always go to the LLM (matched as whole words)
+OPEN_ENDED_MARKERS = [
+    'why', 'how', 'plan', 'planning', 'itinerary', 'should', 'compare', 'vs', 'difference', 'explain',
+    'suggest for', 'kaise', 'kyun', 'kyu', 'days', 'budget', 'cheap', 'with kids', 'family'
+]
+OPEN_ENDED_PATTERN = re.compile(r'\b(?:' + '|'.join(re.escape(marker) for marker in OPEN_ENDED_MARKERS) + r')\b')
+
+NO_PLACE_RESPONSE = "Koi specific place ka naam batayiye, main uski history detail mein bataunga!"
+NO_FOOD_RESPONSE = "Koi specific food ka naam batayiye, main uski history bataunga!"
+SLOW_RESPONSE = "{city} ke baare mein abhi poora jawab taiyaar nahi ho paya. Thodi der mein dobara poochiye!"
+FALLBACK_QUERY_TYPES = {'city_overview', 'restaurant_suggestions', 'places_to_visit', 'traffic_transport', 'accommodation'}
+
+def is_open_ended(message):
+    """True for messages a template cannot do justice to"""
+    words = message.lower().split()
+    if len(words) > Config.CHAT_TEMPLATE_MAX_WORDS:
+        return True
+    # 'how' must not match "show", nor 'days' "holidays"
+    return OPEN_ENDED_PATTERN.search(' '.join(words)) is not None
+
+def template_query_type(chat_ctx):
+    """Map an intent to a build_database_response query type, or None if no template covers it"""
+    msg = chat_ctx['message'].lower()
+    intent = chat_ctx['intent']
+    if intent == 'travel_places':
+        return 'places_to_visit'
+    if intent == 'history':
+        return 'place_history'
+    if intent == 'food_culture':
+        if any(word in msg for word in ['culture', 'tradition', 'local life']):
+            return 'culture_traditions'
+        if any(word in msg for word in ['petha', 'bedai', 'jalebi']):
+            return 'food_history'
+        return 'restaurant_suggestions'
+    if intent == 'general_exploration':
+        if any(word in msg for word in ['stay', 'hotel', 'accommodation']):
+            return 'accommodation'
+        if any(word in msg for word in ['traffic', 'transport', 'auto', 'rickshaw']):
+            return 'traffic_transport'
+    return None
+
+def build_greeting_response(chat_ctx):
+    profile = chat_ctx['profile'] or {}
+    name = profile.get('name') if profile.get('isProfileActive') else None
+    city = chat_ctx['location_context'].get('city')
+    greeting = CITY_GREETINGS.get(city, "Namaste")
+    return f"{greeting}{' ' + name if name else ''}! 🙏 Aaj aap kya explore karna ya jaanna chahenge?"
+
+def build_clarification_response(chat_ctx):
+    city = chat_ctx['location_context'].get('city')
+    if chat_ctx['intent'] == 'vague_location' and city:
+        return f"{city} ke baare mein kya jaanna chahenge - history, khana, ghoomne ki jagah, ya kuch aur?"
+    return "Thoda aur batayiye - aap kis city ya topic ke baare mein jaanna chahte hain?"
+
+def answer_from_template(chat_ctx):
+    """Return a template response for deterministic intents, or None to escalate to the LLM"""
+    if not Config.CHAT_TEMPLATE_TIER_ENABLED:
+        return None
+
+    intent = chat_ctx['intent']
+    if intent == 'greeting':
+        return build_greeting_response(chat_ctx)
+    if intent in ['vague_location', 'clarification_needed']:
+        return build_clarification_response(chat_ctx)
+
+    # The database templates only hold Agra data
+    if (chat_ctx['location_context'].get('city') or '').lower() != 'agra' or is_open_ended(chat_ctx['message']):
+        return None
+    query_type = template_query_type(chat_ctx)
+    if query_type is None:
+        return None
+
+    services = get_services()
+    user_context = None
+    if chat_ctx['user_id']:
+        user_context = services.user_service.get_personalized_recommendations(chat_ctx['user_id'], 'Agra')
+    response_text = build_database_response(chat_ctx['message'], query_type, services.database_service, user_context)
+
+    # Templates fall back to canned text when the database has nothing; the LLM does better there
+    if response_text in [NO_PLACE_RESPONSE, NO_FOOD_RESPONSE, get_fallback_response(query_type, user_context)]:
+        metrics.incr('chat.tier.template_miss')
+        return None
+    return response_text
+
+def route_chat(data, chat_ctx, model):
+    """Pick the cheapest tier that can answer: template, cache, then LLM.
+
+    Returns (tier, cache_key, response_text); response_text is None for the 'llm' tier.
+    """
+    if not data.get('force_llm'):
+        response_text = answer_from_template(chat_ctx)
+        if response_text is not None:
+            print(f"📋 Answered from template ({chat_ctx['intent']})")
+            return 'template', None, response_text
+
+    cache_key, response_text = lookup_cached_response(data, chat_ctx, model)
+    if response_text is not None:
+        print(f"⚡ Serving cached response ({len(response_text)} chars)")
+        return 'cache', cache_key, response_text
+    return 'llm', cache_key, None
+
+def degraded_answer(chat_ctx, cache_key):
+    """Best answer without the LLM when a generation is shed or the breaker is open:
+    a stale cached response or a template"""
+    if cache_key:
+        response_text = get_services().response_cache.get_stale(cache_key)
+        if response_text:
+            return response_text
+    if chat_ctx['intent'] == 'greeting':
+        return build_greeting_response(chat_ctx)
+    if chat_ctx['intent'] in ['vague_location', 'clarification_needed']:
+        return build_clarification_response(chat_ctx)
+    query_type = template_query_type(chat_ctx)
+    if query_type and (chat_ctx['location_context'].get('city') or '').lower() == 'agra':
+        return build_database_response(chat_ctx['message'], query_type, get_services().database_service)
+    return None
+
+def deadline_answer(chat_ctx, cache_key):
+    """Answer for a request whose time budget ran out before the LLM could reply:
+    degraded_answer(), else the canned Agra templates, else a 'try again shortly' note"""
+    metrics.incr('chat.deadline.fallback')
+    response_text = degraded_answer(chat_ctx, cache_key)
+    if response_text is not None:
+        return response_text
+    city = chat_ctx['location_context'].get('city') or 'Agra'
+    if city.lower() == 'agra':
+        query_type = template_query_type(chat_ctx)
+        return get_fallback_response(query_type if query_type in FALLBACK_QUERY_TYPES else 'city_overview')
+    return SLOW_RESPONSE.format(city=city)
+
+# Generation failures a stream can recover from with fallback_chunk()
+DEGRADABLE_ERRORS = (OverloadedError, CircuitOpenError, GenerationCancelled)
+
+def fallback_chunk(e, sent, chat_ctx, cache_key, outcome):
+    """Final chunk for a stream whose generation failed with e, or re-raise e if nothing can stand in.
+
+    A shed or refused generation is replaced by a degraded answer. When the deadline cuts a stream
+    short, what was already sent stands and the stream just ends.
+    """
+    if isinstance(e, (OverloadedError, CircuitOpenError)):
+        response_text = degraded_answer(chat_ctx, cache_key)
+        if response_text is None:
+            raise e
+        print("🪫 Generation shed, serving degraded answer")
+        outcome['tier'] = 'degraded'
+        return {'response': response_text, 'done': True}
+    if not isinstance(e, GenerationCancelled) or e.reason != 'deadline':
+        raise e
+    if sent:
+        print("⏳ Deadline reached mid-stream, ending the answer early")
+        outcome['tier'] = 'truncated'
+        return {'response': '', 'done': True}
+    print("⏳ Deadline reached before the first token, serving a template")
+    outcome['tier'] = 'degraded'
+    return {'response': deadline_answer(chat_ctx, cache_key), 'done': True}
+
+def stream_or_degrade(chunks, chat_ctx, cache_key, outcome):
+    """Pass stream chunks through; if the generation fails in a way fallback_chunk() handles, end with its chunk"""
+    sent = False
     try:
-        data = request.get_json()
-        message = data.get('message', '')
-        user_id = data.get('user_id')
-        location_context = data.get('location_context', {}) # Get existing context
-        
-        print(f"\n💬 Chat Request: '{message}'")
-        
-        # Initialize services
-        prompt_builder = PromptBuilder()
-        user_service = UserService()
-        ollama_client = OllamaClient()
-        location_service = LocationService()
-        
-        mode = data.get('mode', 'text')
-        history = data.get('history', [])
-        
-        # 1. Infer location from current message
-        inferred = location_service.infer_location(message)
-        if inferred:
-            # Update context if new location detected
-            location_context.update(inferred)
-        
-        # 2. Get user context (personalization)
+        for chunk in chunks:
+            sent = sent or bool(chunk.get('response'))
+            yield chunk
+    except DEGRADABLE_ERRORS as e:
+        yield fallback_chunk(e, sent, chat_ctx, cache_key, outcome)
 
-        user_context = None
-        if user_id:
-            city = location_context.get('city', 'Agra')
-            user_context = user_service.get_personalized_recommendations(user_id, city)
-        
-        # 3. Detect intent
-        intent = detect_intent(message)
-        print(f"🎯 Intent: {intent}")
-        
-        # 4. Build prompt with location and profile context
-        profile_data = data.get('profile', {})
-        prompt = prompt_builder.build_prompt(message, intent, user_context, location_context, mode, history, profile_data)
+def plan_chat(data):
+    """Everything before the LLM call: location, intent, the template/cache tiers and the prompt.
 
-        
-        # 5. Generate response
-        print(f"🤖 Calling Ollama...")
-        response_text = ollama_client.generate_response(prompt)
-        print(f"✅ Received response ({len(response_text)} chars)")
-        
-        # Extract map data if present (Ollama sometimes adds extra whitespace or newlines)
-        map_data = None
-        map_match = re.search(r'\[MAP_DATA:\s*(.*?)\]', response_text, re.DOTALL)
-        if map_match:
-            try:
-                map_json_str = map_match.group(1).strip()
-                map_data = json.loads(map_json_str)
-                # Remove the data block from the text response
-                response_text = re.sub(r'\[MAP_DATA:\s*.*?\]', '', response_text, flags=re.DOTALL).strip()
-                print("📍 Map data successfully extracted")
-            except Exception as e:
-                print(f"⚠️ Map data error: {e}")
-                # Optional: try to clean up malformed JSON if common
-
-        return jsonify({
-            'response': response_text,
-            'intent': intent,
-            'agent_type': intent,
-            'status': 'success',
-            'location_context': location_context, # Return updated context to frontend
-            'language': "Hinglish",
-            'data_source': 'india_guide_engine',
-            'map_data': map_data
-        })
-        
-    except ConnectionError as e:
+    Returns a dict with chat_ctx, model, tier, cache_key and response_text (None for the 'llm'
+    tier, which also gets prompt, context, prompt_state and generation). A request whose deadline
+    leaves no time to generate comes back as tier 'degraded' with a template answer.
+    """
+    chat_ctx = prepare_chat(data)
+    model = generation_model(chat_ctx)
+    deadline = current_deadline()
+    plan = {'chat_ctx': chat_ctx, 'model': model, 'generation': None, 'prompt_state': None}
+    tier, cache_key, response_text = route_chat(data, chat_ctx, model)
+    if tier == 'llm':
+        plan['prompt'], plan['context'], plan['prompt_state'] = prepare_generation(chat_ctx, model)
+        plan['generation'] = generation_settings(chat_ctx, plan['prompt'], plan['context'])
+        if deadline is not None and not deadline.allows('generation', Config.CHAT_MIN_GENERATION_SECONDS, spare=False):
+            print("⏳ Out of time for the LLM, serving a template")
+            tier, response_text = 'degraded', deadline_answer(chat_ctx, cache_key)
+    if tier != 'llm':
+        # The stored context does not contain this turn, so the next one starts from history
+        get_services().conversation_store.drop(chat_ctx['conversation_id'])
+    plan.update(tier=tier, cache_key=cache_key, response_text=response_text)
+    return plan
+
+def extract_map_data(response_text):
+    """Split the [MAP_DATA: ...] block out of an LLM response, returning (text, map_data)"""
+    # Ollama sometimes adds extra whitespace or newlines around the block
+    map_data = None
+    map_match = re.search(r'\[MAP_DATA:\s*(.*?)\]', response_text, re.DOTALL)
+    if map_match:
+        try:
+            map_json_str = map_match.group(1).strip()
+            map_data = json.loads(map_json_str)
+            # Remove the data block from the text response
+            response_text = re.sub(r'\[MAP_DATA:\s*.*?\]', '', response_text, flags=re.DOTALL).strip()
+            print("📍 Map data successfully extracted")
+        except Exception as e:
+            print(f"⚠️ Map data error: {e}")
+            # Optional: try to clean up malformed JSON if common
+    return response_text, map_data
+
+def build_chat_payload(chat_ctx, response_text):
+    """Build the JSON body returned to the frontend for a finished response"""
+    response_text, map_data = extract_map_data(response_text)
+    return {
+        'response': response_text,
+        'intent': chat_ctx['intent'],
+        'agent_type': chat_ctx['intent'],
+        'status': 'success',
+        'location_context': chat_ctx['location_context'], # Return updated context to frontend
+        'language': "Hinglish",
+        'data_source': 'india_guide_engine',
+        'map_data': map_data
+    }
+
+def chat_error_payload(e):
+    """Map an exception from the chat pipeline to an error body and HTTP status"""
+    if isinstance(e, GenerationCancelled):
+        print(f"✂️  Generation cancelled ({e.reason})")
+        body = {
+            'error': 'Request cancelled',
+            'message': 'Is sawaal ka jawab roka gaya, naya message aa gaya tha.',
+            'reason': e.reason
+        }
+        # 499 (client closed request) when nobody is listening; 409 when a newer message replaced it
+        return body, 409 if e.reason == 'superseded' else 499
+
+    if isinstance(e, OverloadedError):
+        print(f"🚦 Generation shed ({e.reason}): {e}")
+        return {
+            'error': 'Server busy',
+            'message': 'Abhi bahut saari requests chal rahi hain. Thodi der baad try karein.',
+            'details': str(e),
+            'retry_after': e.retry_after
+        }, 503
+
+    if isinstance(e, ConnectionError):
         # Ollama is not running
         print(f"❌ Ollama Connection Error: {e}")
-        return jsonify({
+        body = {
             'error': 'Ollama is not running',
             'message': 'Ollama service nahi chal rahi hai. Please start: ollama serve',
             'details': str(e),
             'fix': 'Run "ollama serve" in a terminal and try again'
-        }), 503
-        
-    except TimeoutError as e:
+        }
+        if isinstance(e, CircuitOpenError):
+            body['retry_after'] = e.retry_after
+        return body, 503
+
+    if isinstance(e, TimeoutError):
         # Ollama timeout
         print(f"⏱️ Ollama Timeout: {e}")
-        return jsonify({
+        return {
             'error': 'Request timeout',
             'message': 'Ollama response mein bahut time lag raha hai. Thoda wait karein.',
             'details': str(e)
-        }), 504
-        
-    except ValueError as e:
+        }, 504
+
+    if isinstance(e, ValueError):
         # Model not found or invalid response
         error_str = str(e)
         print(f"❌ Value Error: {e}")
         if 'not found' in error_str.lower():
-            return jsonify({
+            return {
                 'error': 'Model not found',
                 'message': 'llama3 model installed nahi hai.',
                 'details': str(e),
                 'fix': 'Run "ollama pull llama3" to install the model'
-            }), 404
-        else:
-            return jsonify({
-                'error': 'Invalid response',
-                'message': 'Ollama se invalid response aaya.',
-                'details': str(e)
-            }), 500
-            
-    except Exception as e:
-        print(f"❌ Chat Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'error': 'Internal server error',
-            'message': 'Backend mein error aa gayi. Console check karein.',
+            }, 404
+        return {
+            'error': 'Invalid response',
+            'message': 'Ollama se invalid response aaya.',
             'details': str(e)
-        }), 500
+        }, 500
+
+    print(f"❌ Chat Error: {e}")
+    import traceback
+    traceback.print_exc()
+    return {
+        'error': 'Internal server error',
+        'message': 'Backend mein error aa gayi. Console check karein.',
+        'details': str(e)
+    }, 500
+
+class MapDataFilter:
+    """Hold back streamed tokens that belong to a trailing [MAP_DATA: ...] block"""
+    MARKER = '[MAP_DATA'
+
+    def __init__(self):
+        self.pending = ''
+        self.suppressed = False
+
+    def feed(self, token):
+        """Return the part of token that is safe to show the user right now"""
+        if self.suppressed:
+            return ''
+        text = self.pending + token
+        idx = text.find(self.MARKER)
+        if idx != -1:
+            self.suppressed = True
+            self.pending = ''
+            return text[:idx]
+
+        # Keep back a tail that could still grow into the marker
+        keep = 0
+        for n in range(min(len(self.MARKER) - 1, len(text)), 0, -1):
+            if self.MARKER.startswith(text[-n:]):
+                keep = n
+                break
+        self.pending = text[len(text) - keep:] if keep else ''
+        return text[:len(text) - keep]
+
+    def flush(self):
+        """Return whatever was held back once the stream has ended"""
+        out = '' if self.suppressed else self.pending
+        self.pending = ''
+        return out
+
+def chat_error_response(e):
+    """chat_error_payload() as a Flask response, with Retry-After when the request was shed"""
+    body, status = chat_error_payload(e)
+    response = jsonify(body)
+    if 'retry_after' in body:
+        response.headers['Retry-After'] = str(body['retry_after'])
+    return response, status
+
+def sse_event(event, payload):
+    """Format one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+class StreamReply:
+    """SSE frames of one /stream response, built from the generation's chunks as they arrive"""
+
+    def __init__(self, chat_ctx, model, tier, cache_key, generation, prompt_state, deadline, start_time):
+        self.chat_ctx = chat_ctx
+        self.model = model
+        self.tier = tier
+        self.cache_key = cache_key
+        self.generation = generation
+        self.prompt_state = prompt_state
+        self.deadline = deadline
+        self.start_time = start_time
+        self.outcome = {'tier': tier}  # stream_or_degrade() may downgrade it
+        self.parts = []
+        self.map_filter = MapDataFilter()
+        self.ttft_ms = None
+        self.queue_ms = 0
+        self.reply_context = None
+
+    def feed(self, chunk):
+        """Return the 'token' frame for one chunk, or None when there is nothing to show yet"""
+        if chunk.get('done'):
+            self.reply_context = chunk.get('context')
+            self.queue_ms = chunk.get('queue_wait_ms', 0)
+        token = chunk.get('response', '')
+        if not token:
+            return None
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.time() - self.start_time) * 1000
+            metrics.observe('chat.stream.ttft_ms', self.ttft_ms)
+            if self.generation:
+                metrics.observe(f"chat.profile.{self.generation['profile']}.ttft_ms", self.ttft_ms)
+            print(f"⚡ First token after {self.ttft_ms:.0f} ms")
+        self.parts.append(token)
+        visible = self.map_filter.feed(token)
+        return sse_event('token', {'token': visible}) if visible else None
+
+    def tail(self):
+        """'token' frame for text held back by the map filter, or None"""
+        tail = self.map_filter.flush()
+        return sse_event('token', {'token': tail}) if tail else None
+
+    def error(self, e):
+        if not isinstance(e, GenerationCancelled):
+            metrics.incr('chat.stream.errors')
+        body, status = chat_error_payload(e)
+        body['status_code'] = status
+        return sse_event('error', body)
+
+    def finish(self):
+        """Keep the context and cache an LLM answer, record metrics and return the 'done' frame"""
+        chat_ctx = self.chat_ctx
+        tier = self.outcome['tier']
+        response_text = ''.join(self.parts)
+        if tier == 'llm':
+            remember_context(chat_ctx, self.reply_context, self.model, self.prompt_state)
+            if self.cache_key:
+                get_services().response_cache.set(self.cache_key, response_text, chat_ctx['intent'])
+        elif self.tier == 'llm':
+            get_services().conversation_store.drop(chat_ctx['conversation_id'])
+
+        total_ms = (time.time() - self.start_time) * 1000
+        metrics.incr(f"chat.tier.{tier}")
+        metrics.observe('chat.stream.total_ms', total_ms)
+        metrics.observe(f"chat.tier.{tier}.latency_ms", total_ms)
+        if tier == 'llm':
+            metrics.observe(f"chat.profile.{self.generation['profile']}.latency_ms", total_ms)
+        timings = {'queue_ms': self.queue_ms, 'ttft_ms': self.ttft_ms or total_ms, 'total_ms': total_ms}
+        return sse_event('done', answer_payload(chat_ctx, tier, response_text, self.generation, timings, self.deadline))
+
+def request_deadline(data):
+    """Time budget for a chat request, by mode: voice answers have to come back sooner"""
+    mode = data.get('mode') or 'text'
+    seconds = Config.CHAT_DEADLINES.get(mode, Config.CHAT_DEADLINE_DEFAULT)
+    return Deadline(seconds, reserve=Config.CHAT_GENERATION_RESERVES.get(mode, 0))
+
+def with_deadline(view):
+    """Run a chat view inside its request's Deadline, so DB queries and enrichment can see it"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        data = request.get_json(silent=True) or {}
+        with deadline_scope(request_deadline(data)):
+            return view(*args, **kwargs)
+    return wrapper
+
+def deadline_metrics(deadline):
+    return {'deadline_ms': round(deadline.seconds * 1000), 'skipped': list(deadline.skipped)}
+
+def answer_payload(chat_ctx, tier, response_text, generation, timings, deadline=None):
+    """build_chat_payload() plus how the answer was produced: its tier, profile and timings (ms)"""
+    payload = build_chat_payload(chat_ctx, response_text)
+    payload['tier'] = tier
+    payload['cached'] = tier == 'cache'
+    payload['profile'] = generation['profile'] if generation else None
+    payload['metrics'] = {name: round(ms, 1) for name, ms in timings.items()}
+    if deadline is not None:
+        payload['metrics'].update(deadline_metrics(deadline))
+    return payload
+
+def finish_chat(chat_ctx, tier, response_text, generation, latency_ms, queue_ms, deadline):
+    """Record metrics for a finished /api/chat request and return its JSON body"""
+    metrics.incr(f'chat.tier.{tier}')
+    metrics.observe('chat.latency_ms', latency_ms)
+    metrics.observe(f'chat.tier.{tier}.latency_ms', latency_ms)
+    if tier == 'llm':
+        metrics.observe(f"chat.profile.{generation['profile']}.latency_ms", latency_ms)
+    timings = {'queue_ms': queue_ms, 'generation_ms': latency_ms - queue_ms, 'total_ms': latency_ms}
+    return answer_payload(chat_ctx, tier, response_text, generation, timings, deadline)
+
+def generate_answer(plan):
+    """Run the LLM tier of a plan_chat() plan; returns (tier, response_text, queue_ms)"""
+    chat_ctx = plan['chat_ctx']
+    tracked = track_generation(chat_ctx)
+    plan['generation']['cancel'] = tracked[1]
+    outcome = {'tier': 'llm'}
+    print(f"🤖 Calling Ollama...")
+    try:
+        reply = get_services().ollama_client.generate(plan['prompt'], plan['context'], plan['generation'])
+    except DEGRADABLE_ERRORS as e:
+        chunk = fallback_chunk(e, False, chat_ctx, plan['cache_key'], outcome)
+        # The stored context does not contain this turn, so the next one starts from history
+        get_services().conversation_store.drop(chat_ctx['conversation_id'])
+        return outcome['tier'], chunk['response'], 0
+    finally:
+        release_generation(tracked)
+
+    response_text = reply['response']
+    remember_context(chat_ctx, reply.get('context'), plan['model'], plan['prompt_state'])
+    print(f"✅ Received response ({len(response_text)} chars)")
+    if plan['cache_key']:
+        get_services().response_cache.set(plan['cache_key'], response_text, chat_ctx['intent'])
+    return 'llm', response_text, reply.get('queue_wait_ms', 0)
+
+@bp.route('/', methods=['POST'])
+@with_deadline
+def chat():
+    try:
+        start_time = time.time()
+        plan = plan_chat(request.get_json())
+        # Answered from a template or the cache when possible, otherwise generated
+        tier, response_text, queue_ms = plan['tier'], plan['response_text'], 0
+        if tier == 'llm':
+            tier, response_text, queue_ms = generate_answer(plan)
+        latency_ms = (time.time() - start_time) * 1000
+        return jsonify(finish_chat(plan['chat_ctx'], tier, response_text, plan['generation'], latency_ms, queue_ms, current_deadline()))
+
+    except Exception as e:
+        return chat_error_response(e)
+
+@bp.route('/stream', methods=['POST'])
+@with_deadline
+def chat_stream():
+    """Stream tokens as Server-Sent Events, ending with a 'done' trailer event"""
+    start_time = time.time()
+    try:
+        plan = plan_chat(request.get_json())
+    except Exception as e:
+        return chat_error_response(e)
+    deadline = current_deadline()
+
+    def generate():
+        # The response body is produced after the view returns, so re-enter the request's deadline
+        with deadline_scope(deadline):
+            yield from stream_events()
+
+    def stream_events():
+        chat_ctx = plan['chat_ctx']
+        generation = plan['generation']
+        reply = StreamReply(chat_ctx, plan['model'], plan['tier'], plan['cache_key'], generation,
+                            plan['prompt_state'], deadline, start_time)
+        tracked = None
+        if plan['response_text'] is not None:
+            chunks = [{'response': plan['response_text'], 'done': True}]
+        else:
+            tracked = track_generation(chat_ctx)
+            generation['cancel'] = tracked[1]
+            chunks = get_services().ollama_client.stream_generate(plan['prompt'], plan['context'], generation)
+            chunks = stream_or_degrade(chunks, chat_ctx, plan['cache_key'], reply.outcome)
+        try:
+            for chunk in chunks:
+                frame = reply.feed(chunk)
+                if frame:
+                    yield frame
+            frame = reply.tail()
+            if frame:
+                yield frame
+        except Exception as e:
+            yield reply.error(e)
+            return
+        finally:
+            if tracked:
+                release_generation(tracked)
+        yield reply.finish()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Item fields that decide the answer; batch items equal on all of them are answered once
+BATCH_KEY_FIELDS = ('message', 'location_context', 'profile', 'user_id', 'mode', 'force_llm', 'bypass_cache')
+
+def batch_key(item):
+    """Dedup key of a batch item (the message with its whitespace collapsed, plus the other answer inputs)"""
+    fields = {name: item.get(name) for name in BATCH_KEY_FIELDS}
+    fields['message'] = ' '.join(str(fields['message'] or '').split())
+    return json.dumps(fields, sort_keys=True, default=str)
+
+def answer_batch_item(item, probe):
+    """Plan and answer one unique batch question; returns the same body /api/chat would.
+
+    Items do not belong to a conversation and have no deadline; their generations queue at
+    batch priority, so interactive chats are admitted first.
+    """
+    start_time = time.time()
+    data = dict(item, conversation_id=None, location_context=dict(item.get('location_context') or {}))
+    plan = plan_chat(data)
+    chat_ctx, generation, response_text, queue_ms = plan['chat_ctx'], plan['generation'], plan['response_text'], 0
+    if plan['tier'] == 'llm':
+        tracked = (None, get_services().active_requests.begin(probe=probe))
+        generation.update(priority=PRIORITY_BATCH, cancel=tracked[1])
+        try:
+            reply = get_services().ollama_client.generate(plan['prompt'], plan['context'], generation)
+        finally:
+            release_generation(tracked)
+        response_text = reply['response']
+        queue_ms = reply.get('queue_wait_ms', 0)
+        if plan['cache_key']:
+            get_services().response_cache.set(plan['cache_key'], response_text, chat_ctx['intent'])
+
+    latency_ms = (time.time() - start_time) * 1000
+    metrics.incr(f"chat.batch.tier.{plan['tier']}")
+    metrics.observe('chat.batch.latency_ms', latency_ms)
+    timings = {'queue_ms': queue_ms, 'generation_ms': latency_ms - queue_ms, 'total_ms': latency_ms}
+    return answer_payload(chat_ctx, plan['tier'], response_text, generation, timings)
+
+@bp.route('/batch', methods=['POST'])
+def chat_batch():
+    """Answer many questions in one request, streamed back as NDJSON in completion order.
+
+    Body: {"items": [{"id", "message", "location_context", "profile", "user_id", ...}, ...],
+    "defaults": {fields every item inherits}, "concurrency": n}. Items with the same inputs share
+    one plan and one generation. Every item gets a line {"index", "id", "status": "ok", "result"}
+    or {"index", "id", "status": "error", "code", "error"}; a last {"done": true, ...} line sums up.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > Config.CHAT_BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {Config.CHAT_BATCH_MAX_ITEMS} items per batch'}), 400
+    defaults = data.get('defaults') or {}
+    concurrency = Config.CHAT_BATCH_CONCURRENCY
+    if isinstance(data.get('concurrency'), int) and data['concurrency'] > 0:
+        concurrency = min(data['concurrency'], concurrency)
+    probe = disconnect_probe(request.environ)
+
+    def line(payload):
+        return json.dumps(payload, default=str) + '\n'
+
+    def generate():
+        start_time = time.time()
+        groups = {}  # dedup key -> indexes of the items it answers
+        invalid = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not isinstance(item.get('message'), str) or not item['message'].strip():
+                invalid.append(index)
+                continue
+            groups.setdefault(batch_key({**defaults, **item}), []).append(index)
+        metrics.incr('chat.batch.items', len(items))
+        metrics.incr('chat.batch.deduplicated', len(items) - len(invalid) - len(groups))
+        errors = 0
+
+        for index in invalid:
+            errors += 1
+            item_id = items[index].get('id') if isinstance(items[index], dict) else None
+            yield line({'index': index, 'id': item_id, 'status': 'error', 'code': 400,
+                        'error': {'error': 'message is required'}})
+
+        executor = ThreadPoolExecutor(max_workers=min(concurrency, max(len(groups), 1)), thread_name_prefix='chat-batch')
+        try:
+            # Each question runs in a copy of this context, so it sees the app and its services
+            futures = {
+                executor.submit(contextvars.copy_context().run, answer_batch_item, {**defaults, **items[indexes[0]]}, probe): indexes
+                for indexes in groups.values()
+            }
+            for future in as_completed(futures):
+                try:
+                    outcome = {'status': 'ok', 'result': future.result()}
+                except Exception as e:
+                    body, code = chat_error_payload(e)
+                    outcome = {'status': 'error', 'code': code, 'error': body}
+                    errors += len(futures[future])
+                for index in futures[future]:
+                    yield line({'index': index, 'id': items[index].get('id'), **outcome})
+        finally:
+            # Stop unstarted questions when the client goes away mid-batch
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield line({'done': True, 'items': len(items), 'unique': len(groups), 'errors': errors,
+                    'total_ms': round((time.time() - start_time) * 1000, 1)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/metrics', methods=['GET'])
+def chat_metrics():
+    """Expose in-process chat latency counters, cache, coalescing and database pool usage"""
+    return jsonify(metrics_snapshot())
+
+def metrics_snapshot():
+    snapshot = metrics.snapshot()
+    snapshot['db_pools'] = pool_stats()
+    snapshot['reference_cache'] = reference_cache.stats()
+    snapshot['response_cache'] = get_services().response_cache.stats()
+    snapshot['coalescing'] = get_services().ollama_client.single_flight.stats()
+    snapshot['conversation_contexts'] = get_services().conversation_store.stats()
+    snapshot['generation_queue'] = get_services().ollama_client.scheduler.stats()
+    snapshot['ollama_backends'] = get_services().ollama_client.pool.stats()
+    snapshot['cancellations'] = get_services().active_requests.stats()
+    hedging = get_services().ollama_client.hedging
+    snapshot['hedging'] = hedging.stats() if hedging else None
+    return snapshot
 
 def build_database_response(message, query_type, db_service, user_context=None):
     """Build response using database information, appropriate templates, and user preferences"""
@@ -225,7 +909,7 @@ Local Tip: {place_info.get('best_visit_time', 'Early morning visit karo, kam cro
             
             return response
     
-    return "Koi specific place ka naam batayiye, main uski history detail mein bataunga!"
+    return NO_PLACE_RESPONSE
 
 def build_food_history_response(message, db_service, city_name, user_context=None):
     """Build food history response"""
@@ -265,7 +949,7 @@ Local Habit: {food_info.get('local_habits', 'Locals love it!')}"""
             
             return response
     
-    return "Koi specific food ka naam batayiye, main uski history bataunga!"
+    return NO_FOOD_RESPONSE
 
 def build_restaurant_suggestions_response(db_service, city_name, user_context=None):
     """Build restaurant suggestions response with personalization"""
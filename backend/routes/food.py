@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from services.ollama_client import OllamaClient
+from services.registry import get_services
 from services.context_loader import ContextLoader
 
 bp = Blueprint('food', __name__, url_prefix='/api/food')
@@ -13,7 +13,7 @@ def get_food_recommendations():
         context_loader = ContextLoader()
         food_context = context_loader.load_context('food')
         
-        client = OllamaClient()
+        client = get_services().ollama_client
         response = client.generate_response(query, 'food', food_context)
         
         return jsonify({'recommendations': response})
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from services.ollama_client import OllamaClient
+from services.registry import get_services
 from services.context_loader import ContextLoader
 
 bp = Blueprint('hotels', __name__, url_prefix='/api/hotels')
@@ -13,7 +13,7 @@ def search_hotels():
         context_loader = ContextLoader()
         hotels_context = context_loader.load_context('hotels')
         
-        client = OllamaClient()
+        client = get_services().ollama_client
         response = client.generate_response(query, 'hotels', hotels_context)
         
         return jsonify({'hotels': response})
@@ -1,13 +1,14 @@
 from flask import Blueprint, jsonify
-from services.database_service import DatabaseService
+from services.registry import get_services
 
 bp = Blueprint('map', __name__, url_prefix='/api/map')
-db = DatabaseService()
 
 @bp.route('/locations', methods=['GET'])
 def get_locations():
     """Fetch all cities and historical places with coordinates for the map."""
     try:
+        db = get_services().database_service
+
         # Fetch cities
         cities_query = "SELECT city_name as name, latitude, longitude, 'city' as type, historical_background as description FROM city_overview WHERE latitude IS NOT NULL"
         cities = db.execute_query(cities_query)
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from services.ollama_client import OllamaClient
+from services.registry import get_services
 from services.context_loader import ContextLoader
 
 bp = Blueprint('places', __name__, url_prefix='/api/places')
@@ -13,7 +13,7 @@ def discover_places():
         context_loader = ContextLoader()
         places_context = context_loader.load_context('places')
         
-        client = OllamaClient()
+        client = get_services().ollama_client
         response = client.generate_response(query, 'places', places_context)
         
         return jsonify({'places': response})
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from services.ollama_client import OllamaClient
+from services.registry import get_services
 from services.context_loader import ContextLoader
 
 bp = Blueprint('traffic', __name__, url_prefix='/api/traffic')
@@ -13,7 +13,7 @@ def get_traffic_info():
         context_loader = ContextLoader()
         traffic_context = context_loader.load_context('traffic')
         
-        client = OllamaClient()
+        client = get_services().ollama_client
         response = client.generate_response(query, 'traffic', traffic_context)
         
         return jsonify({'traffic_info': response})
@@ -10,7 +10,7 @@ from app import create_app
 
 def start_integrated_server():
     # 1. Initialize the backend app
-    backend_app = create_app()
+    backend_app = create_app(start_background=True)
     
     # 2. Setup the main app that serves both
     app = Flask(__name__, static_folder='frontend')
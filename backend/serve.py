@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Production launcher: create_app() under gunicorn's pre-forking server.
+
+The master builds the app and loads everything that stays read-only for the life of the
+process (india_knowledge.json, context/*.md, the city reference tables, the long-lived
+services) before it forks, then moves those objects into the GC's permanent generation with
+gc.freeze(). Collections in the workers never touch them, so their pages stay shared
+copy-on-write instead of being copied into every worker the first time the collector writes
+to an object header.
+
+Each worker logs its pid, boot time and memory (RSS, and how much of it is still shared with
+the master) once it is ready to serve.
+
+Run from backend/:  python serve.py   (bind, workers and threads come from Config.WSGI_*)
+"""
+
+import gc
+import math
+import os
+import time
+
+from gunicorn.app.base import BaseApplication
+
+from config import Config
+
+SMAPS_ROLLUP = '/proc/self/smaps_rollup'
+
+
+def memory_mb(smaps_rollup=SMAPS_ROLLUP):
+    """RSS, PSS and shared/private resident memory of this process in MB (Linux only)"""
+    fields = {}
+    try:
+        with open(smaps_rollup) as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[name] = int(value.split()[0])
+    except OSError:
+        return {}
+    return {
+        'rss': fields.get('Rss', 0) / 1024,
+        'pss': fields.get('Pss', 0) / 1024,
+        'shared': (fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024,
+        'private': (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024
+    }
+
+
+def preload(services):
+    """Load the read-only data every worker needs, so it is in memory before the fork"""
+    from services.context_loader import ContextLoader
+    services.location_service
+    services.prompt_builder
+    services.user_service
+    services.generation_profiles
+    return {
+        'cities': len(services.location_service.city_to_state),
+        'reference_cities': services.database_service.preload_reference_data(),
+        'context_files': len(ContextLoader().preload())
+    }
+
+
+def worker_concurrency(total, workers):
+    """Each worker's share of a process-wide generation limit; every worker gets at least one"""
+    return max(1, math.ceil(total / workers))
+
+
+class PreforkServer(BaseApplication):
+    def __init__(self, workers=None, threads=None, bind=None):
+        self.workers = workers or Config.WSGI_WORKERS
+        self.threads = threads or Config.WSGI_THREADS
+        self.bind = bind or Config.WSGI_BIND
+        super().__init__()
+
+    def load_config(self):
+        settings = {
+            'bind': self.bind,
+            'workers': self.workers,
+            'threads': self.threads,
+            'worker_class': 'gthread',
+            'timeout': Config.WSGI_TIMEOUT,
+            'graceful_timeout': Config.WSGI_GRACEFUL_TIMEOUT,
+            'preload_app': True,
+            'post_fork': self.post_fork,
+            'post_worker_init': self.post_worker_init
+        }
+        for key, value in settings.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import create_app, start_background_tasks
+        from services.db_pool import close_all_pools
+        from services.registry import get_services
+
+        started = time.perf_counter()
+        # Every worker has its own GenerationScheduler, so together they admit what one process would
+        Config.OLLAMA_MAX_CONCURRENT = worker_concurrency(Config.OLLAMA_MAX_CONCURRENT, self.workers)
+        # No collections while loading: the objects are about to be frozen anyway
+        gc.disable()
+        app = create_app(start_background=False)
+        with app.app_context():
+            services = get_services()
+            loaded = preload(services)
+        # A socket opened in the master would be shared by every worker
+        close_all_pools()
+        gc.freeze()
+        self._start_background_tasks = lambda: start_background_tasks(services)
+        self._boot_started = time.perf_counter()
+        print(f"🚀 Preloaded {loaded['cities']} cities, {loaded['context_files']} context files and reference "
+              f"data for {loaded['reference_cities']} cities in "
+              f"{(self._boot_started - started) * 1000:.0f} ms; {gc.get_freeze_count()} objects frozen, "
+              f"master {memory_mb().get('rss', 0):.1f} MB RSS", flush=True)
+        return app
+
+    def post_fork(self, server, worker):
+        self._forked_at = time.perf_counter()
+        gc.enable()
+        # Warm-up and health-probe threads were never started in the master, so each worker starts its own
+        self._start_background_tasks()
+
+    def post_worker_init(self, worker):
+        memory = memory_mb()
+        print(f"👷 Worker {os.getpid()} ready in {(time.perf_counter() - self._forked_at) * 1000:.0f} ms "
+              f"({(time.perf_counter() - self._boot_started) * 1000:.0f} ms after preload): "
+              f"RSS {memory.get('rss', 0):.1f} MB, PSS {memory.get('pss', 0):.1f} MB, "
+              f"shared {memory.get('shared', 0):.1f} MB, private {memory.get('private', 0):.1f} MB", flush=True)
+
+
+if __name__ == "__main__":
+    PreforkServer().run()
@@ -0,0 +1,89 @@
+import asyncio
+import aiomysql
+from config import Config
+from services.database_service import DatabaseService, connection_settings, limit_execution_time
+from services.deadline import current_deadline
+from services.metrics import metrics
+
+
+class AsyncDatabaseService:
+    """DatabaseService.execute_query() over aiomysql, for the ASGI routes.
+
+    Waiting on MySQL yields to the event loop instead of holding a thread. The pool is created on
+    first use and belongs to the event loop that created it.
+    """
+
+    def __init__(self, settings=None, size=None, acquire_timeout=None):
+        self.settings = settings or connection_settings()
+        self.size = size or Config.DB_POOL_SIZE
+        self.acquire_timeout = acquire_timeout or Config.DB_POOL_TIMEOUT
+        self._pool = None
+        self._pool_loop = None
+        self._lock = None
+        self._sync = None
+
+    async def _get_pool(self):
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            self._pool, self._pool_loop, self._lock = None, loop, asyncio.Lock()
+        if self._pool is not None:
+            return self._pool
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(
+                    host=self.settings['host'],
+                    port=self.settings['port'],
+                    db=self.settings['database'],
+                    user=self.settings['user'],
+                    password=self.settings['password'],
+                    minsize=0,
+                    maxsize=self.size,
+                    autocommit=True,
+                    pool_recycle=Config.DB_POOL_HEALTH_CHECK_INTERVAL
+                )
+        return self._pool
+
+    async def execute_query(self, query, params=None):
+        """Execute SELECT query and return results, or None on failure.
+
+        Honours the request deadline the same way DatabaseService.execute_query() does. With the
+        embedded SQLite backend there is no server to wait on, so the query runs in a thread.
+        """
+        if Config.DB_BACKEND == 'sqlite':
+            if self._sync is None:
+                self._sync = DatabaseService()
+            return await asyncio.to_thread(self._sync.execute_query, query, params)
+        timeout = Config.DB_QUERY_TIMEOUT
+        acquire_timeout = self.acquire_timeout
+        deadline = current_deadline()
+        if deadline is not None:
+            spare = deadline.spare()
+            if spare < Config.DB_MIN_QUERY_SECONDS:
+                metrics.incr('deadline.skipped.db_query')
+                return None
+            timeout = min(timeout, spare)
+            acquire_timeout = min(acquire_timeout, spare)
+        query = limit_execution_time(query, timeout)
+        try:
+            pool = await self._get_pool()
+            conn = await asyncio.wait_for(pool.acquire(), acquire_timeout)
+            try:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(query, params or ())
+                    return list(await cursor.fetchall())
+            finally:
+                pool.release(conn)
+        except (aiomysql.Error, OSError, asyncio.TimeoutError) as e:
+            print(f"Query execution error: {e}")
+            return None
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    def stats(self):
+        if self._pool is None:
+            return {'size': self.size, 'open': 0, 'idle': 0}
+        return {'size': self.size, 'open': self._pool.size, 'idle': self._pool.freesize}
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import threading
+import time
+import httpx
+from services.cancellation import GenerationCancelled
+from services.generation_scheduler import PRIORITY_INTERACTIVE
+from services.metrics import metrics
+from services.ollama_client import OllamaClient
+
+
+class AsyncOllamaClient:
+    """asyncio counterpart of OllamaClient for the ASGI app: a waiting generation holds a coroutine
+    instead of a thread.
+
+    It shares the wrapped OllamaClient's backend pool (routing, affinity, circuit breakers) and
+    scheduler, so the WSGI and ASGI routes of one process queue for the same Ollama slots.
+    Single-flight coalescing and hedging are not done on this path.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or OllamaClient()
+        self.pool = self.client.pool
+        self.scheduler = self.client.scheduler
+        self._http = {}  # event loop -> its httpx.AsyncClient
+
+    @property
+    def model(self):
+        return self.client.model
+
+    def _get_http(self):
+        """The httpx.AsyncClient of the running event loop (a client only works on the loop that created it)"""
+        loop = asyncio.get_running_loop()
+        http = self._http.get(loop)
+        if http is None:
+            # A closed loop's client cannot be awaited any more; its sockets close when it is collected
+            for closed in [other for other in self._http if other.is_closed()]:
+                del self._http[closed]
+            http = self._http[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.client.timeout, connect=10.0),
+                # The scheduler bounds concurrent generations, so the connection pool need not
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=32)
+            )
+        return http
+
+    async def aclose(self):
+        """Close the running loop's client, and those of other loops that are still running"""
+        loop = asyncio.get_running_loop()
+        for other, http in list(self._http.items()):
+            if other is loop:
+                await http.aclose()
+            elif other.is_running():
+                asyncio.run_coroutine_threadsafe(http.aclose(), other)
+        self._http.clear()
+
+    async def generate(self, prompt, context=None, generation=None):
+        """Return Ollama's full reply, like OllamaClient.generate()"""
+        parts = []
+        response_data = {}
+        async for chunk in self.stream_generate(prompt, context, generation):
+            parts.append(chunk.get("response", ""))
+            if chunk.get("done"):
+                response_data = dict(chunk)
+        response_data["response"] = "".join(parts)
+        return response_data
+
+    async def stream_generate(self, prompt, context=None, generation=None):
+        """Yield Ollama's NDJSON chunks; the final one also carries 'queue_wait_ms'.
+
+        generation takes the same keys as OllamaClient's; its 'cancel' CancelToken may be
+        cancelled from any thread.
+        """
+        generation = generation or {}
+        payload = self.client._payload(prompt, context, stream=True, generation=generation)
+        cancel = generation.get("cancel")
+        self.pool.reject_if_all_open()
+        async with self.scheduler.slot_async(generation.get("priority", PRIORITY_INTERACTIVE), cancel=cancel) as wait_ms:
+            metrics.observe('ollama.queue_wait_ms', wait_ms)
+            backend = self.pool.checkout(generation.get("affinity_key"), wait=False)
+            if backend is None:
+                # Every backend is at its limit; wait for one off the event loop
+                backend = await self._checkout_in_thread(generation.get("affinity_key"))
+            started = time.monotonic()
+            try:
+                async for chunk in self._stream_on(backend, payload, cancel):
+                    if chunk.get("done"):
+                        chunk["queue_wait_ms"] = round(wait_ms, 1)
+                    yield chunk
+            finally:
+                self.pool.checkin(backend, started)
+
+    async def _checkout_in_thread(self, affinity_key):
+        """pool.checkout() on a worker thread. Cancelling the task does not stop the thread, so a
+        backend it checks out for a cancelled task is handed straight back"""
+        lock = threading.Lock()
+        abandoned = False
+        checked_out = None
+
+        def checkout():
+            nonlocal checked_out
+            backend = self.pool.checkout(affinity_key)
+            with lock:
+                if abandoned:
+                    self.pool.checkin(backend)
+                    return None
+                checked_out = backend
+            return backend
+
+        try:
+            return await asyncio.to_thread(checkout)
+        except asyncio.CancelledError:
+            with lock:
+                abandoned = True
+                backend = checked_out
+            # The thread finished just before the cancellation reached this task
+            if backend is not None:
+                self.pool.checkin(backend)
+            raise
+
+    async def _post(self, http, url, payload):
+        """Open a streamed POST, retrying once on the default model if a profile's model is not pulled"""
+        res = await http.send(http.build_request("POST", url, json=payload), stream=True)
+        if res.status_code == 404 and payload["model"] != self.model:
+            print(f"⚠️  Model '{payload['model']}' not found, falling back to '{self.model}'")
+            await res.aclose()
+            res = await http.send(http.build_request("POST", url, json=dict(payload, model=self.model)), stream=True)
+        return res
+
+    async def _stream_on(self, backend, payload, cancel=None):
+        """Stream one generation from one backend. A cancelled token or a cancelled task closes the
+        connection, which makes Ollama stop generating."""
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        backend.breaker.before_call()
+        loop = asyncio.get_running_loop()
+        cancelled = asyncio.Event()
+        unregister = cancel.on_cancel(lambda: loop.call_soon_threadsafe(cancelled.set)) if cancel is not None else None
+        watcher = asyncio.ensure_future(cancelled.wait()) if cancel is not None else None
+        res = None
+        received = 0
+        try:
+            print(f"🤖 Streaming request to Ollama {backend.name} (model: {payload['model']})...")
+            start_time = time.time()
+            res = await self._unless_cancelled(self._post(self._get_http(), backend.url, payload), watcher, cancel)
+            if res.status_code >= 400:
+                await res.aread()
+            res.raise_for_status()
+            backend.breaker.record_success()
+
+            lines = res.aiter_lines()
+            while True:
+                try:
+                    line = await self._unless_cancelled(lines.__anext__(), watcher, cancel)
+                except StopAsyncIteration:
+                    break
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise ValueError(f"Ollama error: {chunk['error']}")
+                if received == 0:
+                    print(f"⏱️  Ollama first token in {time.time() - start_time:.2f} seconds")
+                    metrics.observe('ollama.ttft_ms', (time.time() - start_time) * 1000)
+                received += 1
+                yield chunk
+                if chunk.get("done"):
+                    break
+
+            print(f"⏱️  Ollama stream finished in {time.time() - start_time:.2f} seconds")
+            metrics.observe('ollama.generation_ms', (time.time() - start_time) * 1000)
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # The consumer stopped reading (its task was cancelled or it closed us): the client went away
+            if res is None:
+                backend.breaker.abandon_call()
+            self.client._count_cancelled('disconnected', payload, received)
+            raise
+        except GenerationCancelled as e:
+            if res is None:
+                backend.breaker.abandon_call()
+            self.client._count_cancelled(e.reason, payload, received)
+            raise
+        except ValueError:
+            raise
+        except Exception as e:
+            self._record_outcome(backend, e)
+            self._handle_error(e, backend, payload['model'])
+        finally:
+            if unregister:
+                unregister()
+            if watcher is not None:
+                watcher.cancel()
+            if res is not None:
+                await res.aclose()
+
+    @staticmethod
+    async def _unless_cancelled(awaitable, watcher, cancel):
+        """Await awaitable, giving up with GenerationCancelled if watcher (waiting for cancel) finishes first"""
+        if watcher is None:
+            return await awaitable
+        task = asyncio.ensure_future(awaitable)
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not task.done():
+            task.cancel()
+            raise GenerationCancelled(cancel.reason)
+        return task.result()
+
+    def _record_outcome(self, backend, e):
+        """Connection failures, timeouts and 5xx count against the breaker, like OllamaClient's"""
+        if isinstance(e, (httpx.TransportError, httpx.TimeoutException)):
+            backend.breaker.record_failure()
+        elif isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500:
+            backend.breaker.record_failure()
+        else:
+            backend.breaker.record_success()
+
+    def _handle_error(self, e, backend, model=None):
+        """Raise the same exceptions OllamaClient does, so chat_error_payload() maps them alike"""
+        if isinstance(e, httpx.TimeoutException):
+            print(f"⏱️ Ollama request to {backend.name} timed out after {self.client.timeout} seconds")
+            raise TimeoutError(f"Ollama took too long to respond (>{self.client.timeout}s)")
+        if isinstance(e, httpx.TransportError):
+            print(f"❌ Cannot connect to Ollama at {backend.url}: {e}")
+            raise ConnectionError("Ollama is not running. Please start Ollama with 'ollama serve'")
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+            model = model or self.model
+            pull = ' && '.join(f"ollama pull {name}" for name in dict.fromkeys([model, self.model]))
+            print(f"❌ Model '{model}' not found! Pull it with: {pull}")
+            raise ValueError(f"Model '{model}' not found. Run: {pull}")
+        print(f"❌ Unexpected error calling Ollama: {e}")
+        raise e
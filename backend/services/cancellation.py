@@ -0,0 +1,167 @@
+import select
+import socket
+import threading
+from services.metrics import metrics
+
+
+class GenerationCancelled(Exception):
+    """The caller went away (client disconnect or a newer message) before the generation finished"""
+
+    def __init__(self, reason='cancelled'):
+        super().__init__(f"Generation cancelled ({reason})")
+        self.reason = reason
+
+
+class CancelToken:
+    """Cancellation flag for one request, with callbacks that abort whatever it is waiting on"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason='cancelled'):
+        """Cancel once; later calls are ignored"""
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️  Cancel callback failed: {e}")
+        return True
+
+    def on_cancel(self, fn):
+        """Run fn() when the token is cancelled (right away if it already is); returns an unregister function"""
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(fn)
+                return lambda: self._discard(fn)
+        fn()
+        return lambda: None
+
+    def _discard(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    def raise_if_cancelled(self):
+        if self.reason is not None:
+            raise GenerationCancelled(self.reason)
+
+
+def disconnect_probe(environ):
+    """Callable that reports whether the HTTP client behind a WSGI request has hung up, or None
+    when the server does not expose the socket (werkzeug and gunicorn do)"""
+    sock = environ.get('werkzeug.socket') or environ.get('gunicorn.socket')
+    if sock is None:
+        return None
+
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            # A closed peer makes the socket readable with nothing left to read
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+
+    return disconnected
+
+
+class ActiveRequests:
+    """Chat requests waiting on Ollama, by conversation.
+
+    A newer message in the same conversation cancels the older request, and a background thread
+    cancels requests whose client has disconnected or whose deadline has passed.
+    """
+
+    def __init__(self, poll_interval=0.5):
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._by_key = {}
+        self._watched = {}  # token -> (disconnect probe or None, Deadline or None)
+        self._watcher = None
+        self._changed = False
+        self._stats = {'started': 0, 'superseded': 0, 'disconnected': 0, 'deadline': 0}
+
+    def begin(self, key=None, probe=None, deadline=None):
+        """Register a request and return its CancelToken; pass both to end() when it finishes"""
+        token = CancelToken()
+        if self.poll_interval <= 0:
+            probe = None
+        with self._cond:
+            self._stats['started'] += 1
+            previous = self._by_key.get(key) if key else None
+            if key:
+                self._by_key[key] = token
+            if probe is not None or deadline is not None:
+                self._watched[token] = (probe, deadline)
+                self._changed = True
+                self._ensure_watcher()
+                self._cond.notify_all()
+        if previous is not None and previous.cancel('superseded'):
+            self._count('superseded')
+            print(f"✂️  Newer message in conversation {key}, cancelling the previous one")
+        return token
+
+    def end(self, key, token):
+        with self._cond:
+            if key and self._by_key.get(key) is token:
+                del self._by_key[key]
+            self._watched.pop(token, None)
+
+    def _count(self, reason):
+        with self._cond:
+            self._stats[reason] += 1
+        metrics.incr(f'chat.cancelled.{reason}')
+
+    def _ensure_watcher(self):
+        # Caller holds the lock
+        if self._watcher is None or not self._watcher.is_alive():
+            self._watcher = threading.Thread(target=self._watch, name='request-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            with self._cond:
+                if not self._watched:
+                    self._watcher = None
+                    return
+                watched = list(self._watched.items())
+                self._changed = False
+
+            wait = 60.0
+            for token, (probe, deadline) in watched:
+                if token.cancelled:
+                    continue
+                if deadline is not None:
+                    if deadline.expired:
+                        if token.cancel('deadline'):
+                            self._count('deadline')
+                            print("⏳ Request deadline reached, cancelling its generation")
+                        continue
+                    wait = min(wait, deadline.remaining())
+                if probe is not None:
+                    if probe() and token.cancel('disconnected'):
+                        self._count('disconnected')
+                        print("🔌 Client disconnected, cancelling its generation")
+                    wait = min(wait, self.poll_interval)
+
+            with self._cond:
+                # A request registered since the snapshot may have an earlier deadline
+                if not self._changed:
+                    self._cond.wait(max(wait, 0.001))
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['active'] = len(self._by_key)
+            stats['watched'] = len(self._watched)
+        return stats
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling a backend the breaker considers down"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with half-open trial requests"""
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, window=20, open_seconds=15.0, half_open_calls=1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # True = success
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._stats = {'opened': 0, 'rejected': 0, 'successes': 0, 'failures': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return
+            self._stats['rejected'] += 1
+            state = self._state
+            retry_after = self._seconds_until_trial(now)
+        raise CircuitOpenError(f"{self.name} circuit is {state}, failing fast", retry_after)
+
+    def seconds_until_trial(self):
+        """Whole seconds until the breaker lets a trial call through (a Retry-After hint)"""
+        with self._lock:
+            return self._seconds_until_trial(time.monotonic())
+
+    def _seconds_until_trial(self, now):
+        return max(1, int(self._opened_at + self.open_seconds - now) + 1)
+
+    def reject_if_open(self):
+        """Cheap pre-check that raises while open but does not use up a half-open trial"""
+        if self.state == OPEN:
+            self.before_call()
+
+    def record_success(self):
+        with self._lock:
+            self._stats['successes'] += 1
+            if self._state == HALF_OPEN:
+                print(f"✅ {self.name} circuit closed")
+                self._state = CLOSED
+                self._outcomes.clear()
+                self._trials = 0
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+            if self._state == HALF_OPEN:
+                self._open(time.monotonic())
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(time.monotonic())
+
+    def abandon_call(self):
+        """A call let through by before_call() ended without a verdict (e.g. it was cancelled)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def trip(self):
+        """Open the circuit right away (e.g. the health probe found the backend down)"""
+        with self._lock:
+            if self._state != OPEN:
+                self._open(time.monotonic())
+
+    def allow_trial(self):
+        """Let the next call through as a half-open trial (e.g. the health probe saw the backend recover)"""
+        with self._lock:
+            if self._state == OPEN:
+                self._state = HALF_OPEN
+                self._trials = 0
+
+    def _open(self, now):
+        print(f"🔌 {self.name} circuit opened, failing fast for {self.open_seconds:.0f}s")
+        self._state = OPEN
+        self._opened_at = now
+        self._trials = 0
+        self._outcomes.clear()
+        self._stats['opened'] += 1
+
+    def _maybe_half_open(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trials = 0
+
+    def stats(self):
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            stats = dict(self._stats)
+            stats['state'] = self._state
+            stats['window_calls'] = len(self._outcomes)
+            stats['window_failures'] = self._outcomes.count(False)
+        return stats
@@ -0,0 +1,128 @@
+import re
+from services.metrics import metrics
+
+# Columns that never help the model answer: keys, audit timestamps, coordinates
+DROP_FIELDS = {'id', 'created_at', 'updated_at', 'latitude', 'longitude', 'city_name', 'state_name'}
+
+# Which india_knowledge.json fields are worth sending for each intent
+STATE_FIELDS = {
+    'history': ['identity', 'monuments'],
+    'travel_places': ['monuments', 'identity'],
+    'food_culture': ['food'],
+    'seasonal_festival': ['festivals', 'identity'],
+    'comparison': ['identity', 'geography', 'monuments', 'food'],
+    'general_exploration': ['identity', 'capital', 'monuments', 'food', 'festivals']
+}
+DEFAULT_STATE_FIELDS = ['identity', 'monuments', 'food', 'festivals']
+
+STOPWORDS = {
+    'the', 'and', 'for', 'what', 'which', 'where', 'when', 'how', 'about', 'tell', 'me', 'some', 'best',
+    'are', 'is', 'in', 'of', 'to', 'a', 'an', 'can', 'should', 'i', 'you', 'we', 'with', 'there', 'any',
+    'kya', 'hai', 'mein', 'ke', 'ki', 'ka', 'batao'
+}
+
+
+def estimate_tokens(text):
+    """~4 characters per token for Llama-family tokenizers on English/Hinglish text"""
+    return (len(text) + 3) // 4
+
+
+class KnowledgeContextAssembler:
+    """Fill a per-intent token budget with the knowledge rows most relevant to the message"""
+
+    def __init__(self, budgets=None, default_budget=400):
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+
+    def budget_for(self, intent):
+        return self.budgets.get(intent, self.default_budget)
+
+    @staticmethod
+    def message_terms(message):
+        words = re.findall(r"[a-z0-9]+", (message or '').lower())
+        return {w for w in words if len(w) > 2 and w not in STOPWORDS}
+
+    @staticmethod
+    def clean_row(row):
+        """Drop bookkeeping columns and empty values; lists become comma-separated text"""
+        cleaned = {}
+        for key, value in row.items():
+            if key in DROP_FIELDS or value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ', '.join(str(v) for v in value if v)
+            value = str(value).strip()
+            if value:
+                cleaned[key] = value
+        return cleaned
+
+    @staticmethod
+    def render_row(row):
+        return '- ' + '; '.join(f"{key}: {value}" for key, value in row.items())
+
+    @staticmethod
+    def score_row(row, terms):
+        """Message terms found in the row, with a bonus when the row's name is in the message"""
+        text = ' '.join(row.values()).lower()
+        score = sum(1 for term in terms if term in text)
+        name = next(iter(row.values()), '').lower()
+        if name and all(word in terms for word in re.findall(r"[a-z0-9]+", name) if len(word) > 2):
+            score += 5
+        return score
+
+    def state_row(self, intent, state_info):
+        fields = STATE_FIELDS.get(intent, DEFAULT_STATE_FIELDS)
+        return {field: state_info[field] for field in fields if state_info.get(field)}
+
+    def assemble(self, intent, message, sections):
+        """Render (name, rows) sections, listed in priority order, within the intent's budget.
+
+        Returns (text, usage) where usage maps section name -> tokens spent; text is '' when nothing fits.
+        """
+        budget = self.budget_for(intent)
+        terms = self.message_terms(message)
+
+        candidates = []
+        for rank, (name, rows) in enumerate(sections):
+            weight = len(sections) - rank
+            for position, row in enumerate(rows or []):
+                cleaned = self.clean_row(row)
+                if not cleaned:
+                    continue
+                line = self.render_row(cleaned)
+                score = self.score_row(cleaned, terms) * 10 + weight
+                candidates.append((score, rank, position, name, line))
+
+        # Most relevant rows first; ties keep section priority and the database's own ordering
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        chosen = {}
+        seen = set()
+        used = 0
+        for score, rank, position, name, line in candidates:
+            if (name, line) in seen:
+                continue  # duplicate rows (e.g. sample data inserted twice)
+            header = 0 if name in chosen else estimate_tokens(f"{name.upper()}:\n")
+            cost = estimate_tokens(line) + header
+            if used + cost > budget:
+                continue
+            chosen.setdefault(name, []).append((rank, position, line))
+            seen.add((name, line))
+            used += cost
+
+        usage = {}
+        blocks = []
+        for name, _ in sections:
+            if name not in chosen:
+                continue
+            lines = [line for _, _, line in sorted(chosen[name])]
+            block = f"{name.upper()}:\n" + "\n".join(lines)
+            usage[name] = estimate_tokens(block)
+            blocks.append(block)
+
+        for name, tokens in usage.items():
+            metrics.observe(f'prompt.knowledge_tokens.{name}', tokens)
+        metrics.observe('prompt.knowledge_tokens', sum(usage.values()))
+        summary = ', '.join(f"{name} {tokens}" for name, tokens in usage.items()) or 'none'
+        print(f"📚 Knowledge context ({intent}): {summary} tokens ({sum(usage.values())}/{budget})")
+
+        return "\n".join(blocks), usage
@@ -1,21 +1,35 @@
+import glob
 import os
 
 class ContextLoader:
+    # context/*.md never changes while the server runs, so every loader shares one copy
+    _cache = {}
+
     def __init__(self):
         self.context_dir = os.path.join(os.path.dirname(__file__), '..', 'context')
-    
+
     def load_context(self, context_type):
         """Load context information from markdown files"""
+        if context_type in self._cache:
+            return self._cache[context_type]
         context_file = os.path.join(self.context_dir, f"{context_type}.md")
-        
+
         try:
             with open(context_file, 'r', encoding='utf-8') as f:
-                return f.read()
+                content = f.read()
+            self._cache[context_type] = content
+            return content
         except FileNotFoundError:
             return f"No specific context available for {context_type}"
         except Exception as e:
             return f"Error loading context: {str(e)}"
-    
+
+    def preload(self):
+        """Read every context file up front; returns the context types loaded"""
+        for path in sorted(glob.glob(os.path.join(self.context_dir, '*.md'))):
+            self.load_context(os.path.splitext(os.path.basename(path))[0])
+        return sorted(self._cache)
+
     def load_city_profile(self):
         """Load general city profile information"""
-        return self.load_context('city_profile')
\ No newline at end of file
+        return self.load_context('city_profile')
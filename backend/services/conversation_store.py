@@ -0,0 +1,98 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+class ConversationContextStore:
+    """Ollama `context` token arrays per conversation, so follow-up turns skip re-prefilling the prompt"""
+
+    def __init__(self, max_conversations=500, max_total_tokens=2000000, max_context_tokens=8192, idle_ttl=1800):
+        self.max_conversations = max_conversations
+        self.max_total_tokens = max_total_tokens
+        self.max_context_tokens = max_context_tokens
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # conversation_id -> entry, least recently used first
+        self._total_tokens = 0
+        self._stats = {'hits': 0, 'misses': 0, 'model_changed': 0, 'expired': 0, 'too_long': 0, 'evictions': 0}
+
+    def get(self, conversation_id, model):
+        """Return {'context', 'model', 'state'} or None when the turn needs a full prompt rebuild"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry['model'] != model:
+                self._remove(conversation_id)
+                self._stats['model_changed'] += 1
+                self._stats['misses'] += 1
+                return None
+            entry['last_used'] = now
+            self._entries.move_to_end(conversation_id)
+            self._stats['hits'] += 1
+            return {'context': list(entry['context']), 'model': entry['model'], 'state': entry['state']}
+
+    def holds(self, conversation_id, model):
+        """True when get() would return a context (without counting a lookup or refreshing the entry)"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            return (entry is not None and entry['model'] == model
+                    and time.monotonic() - entry['last_used'] <= self.idle_ttl)
+
+    def put(self, conversation_id, context, model, state=None):
+        """Remember the context Ollama returned for the latest turn, plus what the prompts put into it"""
+        if not conversation_id:
+            return
+        with self._lock:
+            self._remove(conversation_id)
+            if not context:
+                return
+            if len(context) > self.max_context_tokens:
+                # Too close to the model window; the next turn starts over from history
+                self._stats['too_long'] += 1
+                return
+
+            tokens = array('I', context)  # 4 bytes per token instead of a list of ints
+            self._entries[conversation_id] = {
+                'context': tokens,
+                'model': model,
+                'state': state or {},
+                'last_used': time.monotonic()
+            }
+            self._total_tokens += len(tokens)
+
+            while self._entries and (len(self._entries) > self.max_conversations or self._total_tokens > self.max_total_tokens):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def drop(self, conversation_id):
+        """Forget a conversation (its next turn rebuilds the full prompt)"""
+        with self._lock:
+            self._remove(conversation_id)
+
+    def stats(self):
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            stats = dict(self._stats)
+            stats['conversations'] = len(self._entries)
+            stats['total_tokens'] = self._total_tokens
+        stats['approx_bytes'] = stats['total_tokens'] * 4
+        return stats
+
+    def _remove(self, conversation_id):
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._total_tokens -= len(entry['context'])
+
+    def _evict_idle(self, now):
+        while self._entries:
+            oldest_id = next(iter(self._entries))
+            if now - self._entries[oldest_id]['last_used'] <= self.idle_ttl:
+                break
+            self._remove(oldest_id)
+            self._stats['expired'] += 1
@@ -1,64 +1,122 @@
-import mysql.connector
-from mysql.connector import Error
 import os
+import re
+import sqlite3
 from dotenv import load_dotenv
+from config import Config
+from services.db_pool import DATABASE_ERRORS, get_pool
+from services.sqlite_backend import get_sqlite_pool
+from services.deadline import current_deadline
+from services.metrics import metrics
+from services.reference_cache import reference_cache
 
 load_dotenv(override=True)  # Force reload environment variables
 
+def is_duplicate_entry(e):
+    """Whether e is a unique-key violation (MySQL error 1062, or SQLite's UNIQUE constraint)"""
+    if isinstance(e, sqlite3.IntegrityError):
+        return 'UNIQUE constraint failed' in str(e)
+    return getattr(e, 'errno', None) == 1062
+
+SELECT_PREFIX = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+def limit_execution_time(query, seconds):
+    """Add a MAX_EXECUTION_TIME optimizer hint so MySQL aborts the SELECT after `seconds`"""
+    ms = max(1, int(seconds * 1000))
+    return SELECT_PREFIX.sub(f"SELECT /*+ MAX_EXECUTION_TIME({ms}) */", query, count=1)
+
+def connection_settings():
+    """MySQL host, port, database, user and password from the environment"""
+    # Force the password since environment loading is problematic
+    password_from_env = os.getenv('DB_PASSWORD', '')
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'database': os.getenv('DB_NAME', 'city_guide'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': password_from_env if password_from_env else 'Qwerty00'
+    }
+
 class DatabaseService:
     def __init__(self):
-        self.host = os.getenv('DB_HOST', 'localhost')
-        self.database = os.getenv('DB_NAME', 'city_guide')
-        self.user = os.getenv('DB_USER', 'root')
-        # Force the password since environment loading is problematic
-        password_from_env = os.getenv('DB_PASSWORD', '')
-        self.password = password_from_env if password_from_env else 'Qwerty00'
-        self.port = int(os.getenv('DB_PORT', 3306))
-        self.connection = None
+        settings = connection_settings()
+        self.host = settings['host']
+        self.database = settings['database']
+        self.user = settings['user']
+        self.password = settings['password']
+        self.port = settings['port']
+        self.backend = Config.DB_BACKEND
+        if self.backend == 'sqlite':
+            self.pool = get_sqlite_pool(Config.SQLITE_PATH)
+        else:
+            self.pool = get_pool(self.host, self.port, self.database, self.user, self.password)
+        self.reference_cache = reference_cache
     
     def connect(self):
-        """Establish database connection"""
+        """Check that a pooled database connection can be obtained"""
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password,
-                port=self.port
-            )
-            return True
-        except Error as e:
+            with self.pool.connection():
+                return True
+        except DATABASE_ERRORS as e:
             print(f"Database connection error: {e}")
             return False
     
     def disconnect(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Connections go back to the pool after every query, so there is nothing to close"""
+        pass
     
     def execute_query(self, query, params=None):
-        """Execute SELECT query and return results"""
+        """Execute SELECT query and return results.
+
+        Inside a request deadline the query only gets the time left above the generation reserve,
+        and is skipped (None, like any failed query) when there is not enough of it.
+        """
+        timeout = Config.DB_QUERY_TIMEOUT
+        acquire_timeout = None
+        deadline = current_deadline()
+        if deadline is not None:
+            spare = deadline.spare()
+            if spare < Config.DB_MIN_QUERY_SECONDS:
+                metrics.incr('deadline.skipped.db_query')
+                return None
+            timeout = min(timeout, spare)
+            acquire_timeout = min(self.pool.acquire_timeout, spare)
+        if self.backend == 'mysql':
+            query = limit_execution_time(query, timeout)
         try:
-            if not self.connection or not self.connection.is_connected():
-                if not self.connect():
-                    return None
-            
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            result = cursor.fetchall()
-            cursor.close()
-            return result
-        except Error as e:
+            with self.pool.connection(acquire_timeout) as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params or ())
+                result = cursor.fetchall()
+                cursor.close()
+                return result
+        except DATABASE_ERRORS as e:
             print(f"Query execution error: {e}")
             return None
     
+    def cached_query(self, table, query, params=None):
+        """execute_query() for a near-static reference table, through the process-wide reference cache"""
+        return self.reference_cache.fetch(table, (query, params), lambda: self.execute_query(query, params))
+
+    def preload_reference_data(self):
+        """Fill the reference cache for every city up front; returns the number of cities loaded"""
+        cities = self.execute_query("SELECT city_name FROM city_overview") or []
+        for row in cities:
+            city_name = row['city_name']
+            self.get_city_overview(city_name)
+            self.get_places_to_visit(city_name)
+            self.get_restaurants_by_city(city_name)
+            self.get_transport_info(city_name)
+            self.get_accommodation_info(city_name)
+            self.get_cultural_info(city_name)
+        return len(cities)
+
     def get_city_overview(self, city_name):
         """Get city overview information"""
         query = """
         SELECT * FROM city_overview 
         WHERE city_name = %s
         """
-        return self.execute_query(query, (city_name,))
+        return self.cached_query('city_overview', query, (city_name,))
     
     def get_place_history(self, place_name, city_name):
         """Get place/monument history"""
@@ -68,6 +126,24 @@ class DatabaseService:
         """
         return self.execute_query(query, (place_name, city_name))
     
+    def get_place_histories(self, place_names, city_name):
+        """History rows for several places of a city in one round trip, in place_names order
+        (the first row per place, like get_place_history()[0])"""
+        if not place_names:
+            return []
+        placeholders = ', '.join(['%s'] * len(place_names))
+        query = f"""
+        SELECT * FROM places_history 
+        WHERE city_name = %s AND place_name IN ({placeholders})
+        """
+        rows = self.cached_query('places_history', query, (city_name, *place_names))
+        if rows is None:
+            return None
+        by_name = {}
+        for row in rows:
+            by_name.setdefault(row['place_name'].lower(), row)
+        return [by_name[name.lower()] for name in place_names if name.lower() in by_name]
+    
     def get_market_history(self, market_name, city_name):
         """Get street/market history"""
         query = """
@@ -91,7 +167,7 @@ class DatabaseService:
         WHERE city_name = %s 
         ORDER BY category, popularity DESC
         """
-        return self.execute_query(query, (city_name,))
+        return self.cached_query('restaurants_streetfood', query, (city_name,))
     
     def get_places_to_visit(self, city_name):
         """Get places to visit in the city"""
@@ -100,7 +176,7 @@ class DatabaseService:
         WHERE city_name = %s 
         ORDER BY importance DESC, category
         """
-        return self.execute_query(query, (city_name,))
+        return self.cached_query('tourist_places', query, (city_name,))
     
     def get_transport_info(self, city_name):
         """Get transport and traffic information"""
@@ -108,16 +184,16 @@ class DatabaseService:
         SELECT * FROM transport_traffic 
         WHERE city_name = %s
         """
-        return self.execute_query(query, (city_name,))
+        return self.cached_query('transport_traffic', query, (city_name,))
     
     def get_accommodation_info(self, city_name):
         """Get hotel and stay information"""
         query = """
         SELECT * FROM accommodation 
         WHERE city_name = %s 
-        ORDER BY category, area
+        ORDER BY category, area_name
         """
-        return self.execute_query(query, (city_name,))
+        return self.cached_query('accommodation', query, (city_name,))
     
     def get_cultural_info(self, city_name):
         """Get cultural traditions and festivals"""
@@ -126,7 +202,7 @@ class DatabaseService:
         WHERE city_name = %s 
         ORDER BY importance DESC
         """
-        return self.execute_query(query, (city_name,))
+        return self.cached_query('culture_traditions', query, (city_name,))
     
     def search_content(self, city_name, search_term):
         """Search across all tables for relevant content"""
@@ -0,0 +1,195 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import Error
+from config import Config
+
+# What a failed query raises on either backend
+DATABASE_ERRORS = (Error, sqlite3.Error)
+
+
+class PoolTimeoutError(Error):
+    """Raised when no pooled connection frees up within the acquire timeout"""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of mysql.connector connections"""
+
+    def __init__(self, connect_args, size=10, acquire_timeout=5.0, health_check_interval=30.0, connect=None):
+        self.connect_args = connect_args
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._connect = connect or mysql.connector.connect
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, last_used) pairs, most recently used on the right
+        self._open = 0
+        self._stats = {
+            'acquired': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_checks': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'timeouts': 0
+        }
+
+    def acquire(self, timeout=None):
+        """Borrow a healthy connection, waiting up to timeout seconds for one to free up"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn, last_used = None, None
+                    break
+
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(msg=f"No database connection available after {timeout:.1f}s (pool size {self.size})")
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+
+            if waited:
+                wait_ms = (time.monotonic() - start) * 1000
+                self._stats['wait_time_ms'] += wait_ms
+                self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+
+        # Connecting and pinging happen outside the lock so other threads are not blocked
+        if conn is not None and time.monotonic() - last_used > self.health_check_interval:
+            if not self._is_healthy(conn):
+                self._close_quietly(conn)
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect(**self.connect_args)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['created'] += 1
+
+        with self._cond:
+            self._stats['acquired'] += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection; broken ones are closed and their slot freed"""
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._close_quietly(conn)
+
+        with self._cond:
+            if discard:
+                self._open -= 1
+                self._stats['discarded'] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """with pool.connection() as conn: ... - always returns the connection to the pool"""
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except DATABASE_ERRORS:
+            discard = not self._is_healthy(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def stats(self):
+        """Pool usage counters, including how often and how long callers waited"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle)
+            })
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 2)
+        stats['max_wait_ms'] = round(stats['max_wait_ms'], 2)
+        return stats
+
+    def close_all(self):
+        """Close idle connections (used on shutdown and before forking workers)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn):
+        with self._cond:
+            self._stats['health_checks'] += 1
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}  # label ('user@host:port/database', 'sqlite:/path') -> pool
+_pools_lock = threading.Lock()
+
+def get_or_create_pool(label, create):
+    """Return the process-wide pool registered under label, building it with create() on first use"""
+    with _pools_lock:
+        pool = _pools.get(label)
+        if pool is None:
+            pool = create()
+            _pools[label] = pool
+        return pool
+
+def get_pool(host, port, database, user, password):
+    """Return the process-wide pool for these credentials, creating it on first use"""
+    return get_or_create_pool(f"{user}@{host}:{port}/{database}", lambda: ConnectionPool(
+        {'host': host, 'port': port, 'database': database, 'user': user, 'password': password},
+        size=Config.DB_POOL_SIZE,
+        acquire_timeout=Config.DB_POOL_TIMEOUT,
+        health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL
+    ))
+
+def pool_stats():
+    """Stats for every pool in the process, keyed by 'user@host:port/database' (or 'sqlite:/path')"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {label: pool.stats() for label, pool in pools.items()}
+
+def close_all_pools():
+    """Close every pool's idle connections, so a forked worker never inherits an open socket"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,58 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from services.metrics import metrics
+
+_current = ContextVar('deadline', default=None)
+
+
+class Deadline:
+    """Time budget for one chat request, handed from stage to stage.
+
+    reserve is the part kept back for generation: optional enrichment (knowledge
+    context and its DB queries) may only spend what is left above it.
+    """
+
+    def __init__(self, seconds, reserve=0.0):
+        self.seconds = seconds
+        self.reserve = min(reserve, seconds)
+        self.expires_at = time.monotonic() + seconds
+        self.skipped = []  # stages dropped to stay within budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def spare(self):
+        """Seconds optional work may use without eating into the generation reserve"""
+        return max(0.0, self.remaining() - self.reserve)
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def allows(self, stage, seconds, spare=True):
+        """True if a stage needing `seconds` fits; otherwise record it as skipped.
+
+        Optional stages only get the spare time; spare=False lets generation use the reserve.
+        """
+        if (self.spare() if spare else self.remaining()) >= seconds:
+            return True
+        if stage not in self.skipped:
+            self.skipped.append(stage)
+            metrics.incr(f'deadline.skipped.{stage}')
+            print(f"⏳ Skipping {stage}, {self.remaining():.2f}s left of {self.seconds:.0f}s")
+        return False
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make deadline the current one for code that cannot take it as an argument (DB queries)"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current_deadline():
+    return _current.get()
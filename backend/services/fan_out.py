@@ -0,0 +1,74 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.metrics import metrics
+from config import Config
+
+
+class FanOut:
+    """Runs independent pipeline stages (mostly DB round trips) side by side on a bounded pool.
+
+    The calling thread runs the first stage itself, and any stage no worker has picked up by the
+    time the caller waits for it, so a stage may fan out again without starving the pool. Stages
+    see the caller's context variables (request deadline, Flask app context).
+    """
+
+    def __init__(self, max_workers=None, enabled=None, metric_prefix='chat.stage'):
+        self.max_workers = max_workers
+        self.enabled = enabled
+        self.metric_prefix = metric_prefix
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = self.max_workers or Config.CHAT_FANOUT_WORKERS
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fan-out')
+        return self._executor
+
+    def run(self, stages):
+        """Run {name: fn} and return {name: fn()}; the first exception is raised once all stages finish"""
+        enabled = Config.CHAT_FANOUT_ENABLED if self.enabled is None else self.enabled
+        if len(stages) < 2 or not enabled:
+            return {name: self._timed(name, fn) for name, fn in stages.items()}
+
+        (first_name, first_fn), *rest = stages.items()
+        executor = self._get_executor()
+        # Each stage gets its own copy: a Context cannot be entered by two threads at once
+        futures = [
+            (name, fn, executor.submit(contextvars.copy_context().run, self._timed, name, fn))
+            for name, fn in rest
+        ]
+
+        results, error = {}, None
+        try:
+            results[first_name] = self._timed(first_name, first_fn)
+        except Exception as e:
+            error = e
+        for name, fn, future in futures:
+            try:
+                if future.cancel():
+                    # Still queued behind busy workers: cheaper to run it here than to wait
+                    metrics.incr(f'{self.metric_prefix}.inline')
+                    results[name] = self._timed(name, fn)
+                else:
+                    results[name] = future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            metrics.observe(f'{self.metric_prefix}.{name}_ms', (time.perf_counter() - start) * 1000)
+
+
+# Shared by the chat route, PromptBuilder and UserService
+fan_out = FanOut()
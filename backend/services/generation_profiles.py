@@ -0,0 +1,47 @@
+class GenerationProfiles:
+    """Per-intent Ollama settings: which model, how many tokens to generate, context size, keep_alive"""
+
+    def __init__(self, profiles, intent_profiles=None, default_profile='standard', ctx_buckets=(2048, 4096, 8192)):
+        self.profiles = profiles
+        self.intent_profiles = intent_profiles or {}
+        self.default_profile = default_profile
+        self.ctx_buckets = sorted(ctx_buckets)
+
+    def for_intent(self, intent):
+        """Return (name, profile) for an intent"""
+        name = self.intent_profiles.get(intent, self.default_profile)
+        if name not in self.profiles:
+            name = self.default_profile
+        return name, self.profiles[name]
+
+    @property
+    def default_num_ctx(self):
+        """The smallest window, which a usual prompt and reply fit; models are warmed up with it"""
+        return self.ctx_buckets[0]
+
+    def num_ctx_for(self, prompt, context=None, num_predict=0):
+        """Smallest configured window that fits the prompt, earlier turns and the reply.
+
+        Windows come in a few fixed sizes because Ollama reloads a model whenever num_ctx changes.
+        """
+        needed = (len(prompt) + 3) // 4 + len(context or []) + num_predict
+        for bucket in self.ctx_buckets:
+            if needed <= bucket:
+                return bucket
+        return self.ctx_buckets[-1]
+
+    def settings(self, intent, prompt, context=None, response_style=None):
+        """Generation settings for one request, in the shape OllamaClient expects"""
+        name, profile = self.for_intent(intent)
+        num_predict = profile['num_predict']
+        if isinstance(num_predict, dict):
+            num_predict = num_predict.get(response_style or 'concise', num_predict.get('concise'))
+        return {
+            'profile': name,
+            'model': profile['model'],
+            'keep_alive': profile.get('keep_alive'),
+            'options': {
+                'num_predict': num_predict,
+                'num_ctx': self.num_ctx_for(prompt, context, num_predict)
+            }
+        }
@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from services.cancellation import GenerationCancelled
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_BACKGROUND = 2
+
+
+class OverloadedError(Exception):
+    """A generation was shed instead of queued; retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after=1, reason='queue_full'):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class GenerationScheduler:
+    """Admission control for Ollama: a concurrency limit, a priority queue and queue-depth load shedding"""
+
+    def __init__(self, max_concurrent=2, max_queue=16, queue_timeout=30.0, shed_depths=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Queue depth at which new arrivals of each priority are turned away
+        self.shed_depths = shed_depths or {
+            PRIORITY_INTERACTIVE: max_queue,
+            PRIORITY_BATCH: max_queue // 2,
+            PRIORITY_BACKGROUND: 0
+        }
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, seq) tickets
+        self._async_waiters = {}  # ticket -> callback waking an acquire_async() on its event loop
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._avg_hold = 5.0  # seconds a generation holds a slot, smoothed
+        self._stats = {'admitted': 0, 'queued': 0, 'shed': 0, 'timeouts': 0, 'cancelled': 0, 'max_queue_depth': 0}
+
+    def retry_after(self):
+        """Seconds until the queue ahead should have drained"""
+        waves = (len(self._queue) + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(waves * self._avg_hold))
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, timeout=None, cancel=None):
+        """Take a generation slot, waiting behind higher-priority work; returns the queue wait in ms.
+
+        A cancelled CancelToken takes the request out of the queue with GenerationCancelled.
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        if cancel is None:
+            return self._acquire(priority, timeout, None, start)
+        cancel.raise_if_cancelled()
+        unregister = cancel.on_cancel(self._wake)
+        try:
+            return self._acquire(priority, timeout, cancel, start)
+        finally:
+            unregister()
+
+    def _wake(self):
+        with self._cond:
+            self._notify_all()
+
+    def _notify_all(self):
+        # Caller holds the lock
+        self._cond.notify_all()
+        for wake in self._async_waiters.values():
+            wake()
+
+    def _admit_now(self, priority):
+        # Caller holds the lock; True if a slot was free, raises OverloadedError if the queue is too deep
+        if self._in_flight < self.max_concurrent and not self._queue:
+            self._in_flight += 1
+            self._stats['admitted'] += 1
+            return True
+        if len(self._queue) >= self.shed_depths.get(priority, self.max_queue):
+            self._stats['shed'] += 1
+            raise OverloadedError(f"Generation queue full ({len(self._queue)} waiting)", self.retry_after())
+        return False
+
+    def _enqueue(self, priority):
+        # Caller holds the lock
+        ticket = (priority, next(self._seq))
+        heapq.heappush(self._queue, ticket)
+        self._stats['queued'] += 1
+        self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], len(self._queue))
+        return ticket
+
+    def _leave_queue(self, ticket, stat):
+        # Caller holds the lock
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._stats[stat] += 1
+        self._notify_all()
+
+    def _acquire(self, priority, timeout, cancel, start):
+        with self._cond:
+            if self._admit_now(priority):
+                return 0.0
+            ticket = self._enqueue(priority)
+            deadline = start + timeout
+            while not self._take_slot(ticket):
+                self._check_waiting(ticket, cancel, deadline, timeout)
+                self._cond.wait(deadline - time.monotonic())
+        return (time.monotonic() - start) * 1000
+
+    def _take_slot(self, ticket):
+        # Caller holds the lock; admit ticket if it is at the head of the queue and a slot is free
+        if not (self._queue[0] is ticket and self._in_flight < self.max_concurrent):
+            return False
+        heapq.heappop(self._queue)
+        self._in_flight += 1
+        self._stats['admitted'] += 1
+        # The next ticket may also fit if more than one slot is free
+        self._notify_all()
+        return True
+
+    def _check_waiting(self, ticket, cancel, deadline, timeout):
+        # Caller holds the lock; take ticket out of the queue if it was cancelled or waited too long
+        if cancel is not None and cancel.cancelled:
+            self._leave_queue(ticket, 'cancelled')
+            raise GenerationCancelled(cancel.reason)
+        if deadline - time.monotonic() <= 0:
+            self._leave_queue(ticket, 'timeouts')
+            raise OverloadedError(f"Waited {timeout:.0f}s for a generation slot", self.retry_after(), reason='queue_timeout')
+
+    async def acquire_async(self, priority=PRIORITY_INTERACTIVE, timeout=None, cancel=None):
+        """acquire() for asyncio callers: waits in the same queue without holding a thread.
+
+        Cancelling the awaiting task takes the request out of the queue.
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+        with self._cond:
+            if self._admit_now(priority):
+                return 0.0
+            ticket = self._enqueue(priority)
+            # Releases happen on other threads (and other loops), so hop onto this loop to wake it
+            self._async_waiters[ticket] = lambda: loop.call_soon_threadsafe(woken.set)
+        unregister = cancel.on_cancel(self._wake) if cancel is not None else None
+        deadline = start + timeout
+        try:
+            while True:
+                with self._cond:
+                    woken.clear()
+                    if self._take_slot(ticket):
+                        return (time.monotonic() - start) * 1000
+                    self._check_waiting(ticket, cancel, deadline, timeout)
+                try:
+                    await asyncio.wait_for(woken.wait(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._cond:
+                if ticket in self._queue:
+                    self._leave_queue(ticket, 'cancelled')
+            raise
+        finally:
+            if unregister:
+                unregister()
+            with self._cond:
+                self._async_waiters.pop(ticket, None)
+
+    def release(self, held_seconds=None):
+        with self._cond:
+            self._in_flight -= 1
+            if held_seconds is not None:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * held_seconds
+            self._notify_all()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_INTERACTIVE, timeout=None, cancel=None):
+        """with scheduler.slot(priority) as wait_ms: ... run one generation"""
+        wait_ms = self.acquire(priority, timeout, cancel)
+        start = time.monotonic()
+        try:
+            yield wait_ms
+        finally:
+            self.release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def slot_async(self, priority=PRIORITY_INTERACTIVE, timeout=None, cancel=None):
+        """async with scheduler.slot_async(priority) as wait_ms: ... run one generation"""
+        wait_ms = await self.acquire_async(priority, timeout, cancel)
+        start = time.monotonic()
+        try:
+            yield wait_ms
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['in_flight'] = self._in_flight
+            stats['queue_depth'] = len(self._queue)
+            stats['max_concurrent'] = self.max_concurrent
+            stats['avg_generation_s'] = round(self._avg_hold, 2)
+        return stats
@@ -0,0 +1,64 @@
+import threading
+from collections import deque
+from services.metrics import metrics
+
+
+class HedgePolicy:
+    """When to duplicate a slow generation on a second backend.
+
+    The hedge fires once the first token is later than the pct-th percentile of recent
+    time-to-first-token samples, and at most max_rate of the last `window` requests are hedged.
+    """
+
+    def __init__(self, percentile=95, min_delay_ms=250, default_delay_ms=2000, max_rate=0.1,
+                 window=200, min_samples=20, metric='ollama.ttft_ms'):
+        self.percentile = percentile
+        self.min_delay_ms = min_delay_ms
+        self.default_delay_ms = default_delay_ms
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.metric = metric
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)  # one [hedged] flag per recent request
+        self._stats = {'requests': 0, 'fired': 0, 'won': 0, 'lost': 0, 'rate_limited': 0, 'no_capacity': 0}
+
+    def delay_ms(self):
+        """How long to wait for the first token before hedging"""
+        if metrics.count(self.metric) < self.min_samples:
+            return self.default_delay_ms
+        return max(self.min_delay_ms, metrics.percentile(self.metric, self.percentile))
+
+    def begin(self):
+        """Register a request that may be hedged; pass the returned ticket to allow()"""
+        ticket = [False]
+        with self._lock:
+            self._recent.append(ticket)
+            self._stats['requests'] += 1
+        return ticket
+
+    def allow(self, ticket):
+        """Claim a hedge for this request unless that would exceed the rate cap"""
+        with self._lock:
+            hedged = sum(1 for t in self._recent if t[0])
+            if hedged + 1 > self.max_rate * len(self._recent):
+                self._stats['rate_limited'] += 1
+                metrics.incr('ollama.hedge.rate_limited')
+                return False
+            ticket[0] = True
+            self._stats['fired'] += 1
+        metrics.incr('ollama.hedge.fired')
+        return True
+
+    def record(self, outcome):
+        """Count a hedge outcome: 'won' (the hedge answered first), 'lost' or 'no_capacity'"""
+        with self._lock:
+            self._stats[outcome] += 1
+        metrics.incr(f'ollama.hedge.{outcome}')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            recent = len(self._recent)
+            stats['recent_rate'] = round(sum(1 for t in self._recent if t[0]) / recent, 3) if recent else 0.0
+        stats['delay_ms'] = round(self.delay_ms(), 1)
+        return stats
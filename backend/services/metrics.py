@@ -0,0 +1,63 @@
+import threading
+from collections import deque
+
+
+class Metrics:
+    """Thread-safe in-process counters and latency samples for the chat pipeline"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.samples = {}
+
+    def incr(self, name, value=1):
+        """Increase a named counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """Record one sample (usually milliseconds) for a named timer"""
+        with self._lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+            self.samples[name].append(value)
+
+    def percentile(self, name, pct):
+        """Return the pct-th percentile of the recent samples, or None if there are none"""
+        with self._lock:
+            values = sorted(self.samples.get(name, ()))
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+        return values[index]
+
+    def count(self, name):
+        """Return how many samples are held for a timer"""
+        with self._lock:
+            return len(self.samples.get(name, ()))
+
+    def snapshot(self):
+        """Return counters and timer summaries as plain JSON-friendly dicts"""
+        with self._lock:
+            counters = dict(self.counters)
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+
+        timers = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            timers[name] = {
+                'count': len(values),
+                'avg': round(sum(values) / len(values), 2),
+                'p50': round(values[int(0.50 * (len(values) - 1))], 2),
+                'p95': round(values[int(0.95 * (len(values) - 1))], 2),
+                'p99': round(values[int(0.99 * (len(values) - 1))], 2),
+                'max': round(values[-1], 2)
+            }
+
+        return {'counters': counters, 'timers': timers}
+
+
+# Shared by every blueprint in the process
+metrics = Metrics()
@@ -1,83 +1,484 @@
 import requests
+import hashlib
+import json
+import logging
+import queue
+import threading
 import time
+from contextlib import closing
+from config import Config
+from services.cancellation import CancelToken, GenerationCancelled
+from services.generation_scheduler import GenerationScheduler, OverloadedError, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from services.hedge_policy import HedgePolicy
+from services.metrics import metrics
+from services.ollama_pool import OllamaBackendPool
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class _Attempt:
+    """One copy of a hedged generation, streaming from its own backend on its own thread"""
+
+    def __init__(self, backend, release_slot=False):
+        self.backend = backend
+        self.release_slot = release_slot  # the hedge holds an extra scheduler slot
+        self.token = CancelToken()
+
+    def cancel(self, reason='hedge_lost'):
+        """Stop reading and drop the connection so Ollama stops generating"""
+        self.token.cancel(reason)
+
 
 class OllamaClient:
-    def __init__(self, model="llama3"):
-        self.url = "http://localhost:11434/api/generate"
+    def __init__(self, model="llama3", scheduler=None, hosts=None, hedging=None):
+        hosts = hosts or Config.OLLAMA_HOSTS
         self.model = model
         self.timeout = 180  # 3 minutes for slow responses
+        self.coalesce = Config.OLLAMA_COALESCE
+        self.single_flight = SingleFlight()
+        self.pool = OllamaBackendPool(
+            hosts,
+            breaker_settings={
+                'failure_rate': Config.OLLAMA_BREAKER_FAILURE_RATE,
+                'min_calls': Config.OLLAMA_BREAKER_MIN_CALLS,
+                'window': Config.OLLAMA_BREAKER_WINDOW,
+                'open_seconds': Config.OLLAMA_BREAKER_OPEN_SECONDS
+            },
+            health_interval=Config.OLLAMA_HEALTH_INTERVAL,
+            max_concurrent=Config.OLLAMA_MAX_CONCURRENT,
+            wait_timeout=Config.OLLAMA_QUEUE_TIMEOUT
+        )
+        # The scheduler orders and sheds work across all backends; the pool holds each to its own limit
+        self.scheduler = scheduler or GenerationScheduler(
+            max_concurrent=Config.OLLAMA_MAX_CONCURRENT * len(hosts),
+            max_queue=Config.OLLAMA_MAX_QUEUE,
+            queue_timeout=Config.OLLAMA_QUEUE_TIMEOUT
+        )
+        if hedging is None and Config.OLLAMA_HEDGE_ENABLED and len(hosts) > 1:
+            hedging = HedgePolicy(
+                percentile=Config.OLLAMA_HEDGE_PERCENTILE,
+                min_delay_ms=Config.OLLAMA_HEDGE_MIN_DELAY_MS,
+                default_delay_ms=Config.OLLAMA_HEDGE_DEFAULT_DELAY_MS,
+                max_rate=Config.OLLAMA_HEDGE_MAX_RATE
+            )
+        self.hedging = hedging
 
-    def generate_response(self, prompt):
-        """Generate response from Ollama with better error handling"""
+    @property
+    def url(self):
+        """/api/generate URL of the first configured backend"""
+        return self.pool.primary.url
+
+    def _flight_key(self, payload):
+        """Identical payloads (model, prompt, options) share one generation"""
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _payload(self, prompt, context=None, stream=False, generation=None):
+        generation = generation or {}
+        payload = {
+            "model": generation.get("model") or self.model,
+            "prompt": prompt,
+            "stream": stream
+        }
+        if context:
+            # Tokens of the earlier turns, as returned by the previous /api/generate call
+            payload["context"] = context
+        if generation.get("options"):
+            payload["options"] = generation["options"]
+        if generation.get("keep_alive"):
+            payload["keep_alive"] = generation["keep_alive"]
+        return payload
+
+    def _post(self, url, payload, stream=False):
+        """POST to /api/generate, retrying once on the default model if a profile's model is not pulled"""
+        res = requests.post(url, json=payload, timeout=self.timeout, stream=stream)
+        if res.status_code == 404 and payload["model"] != self.model:
+            print(f"⚠️  Model '{payload['model']}' not found, falling back to '{self.model}'")
+            res.close()
+            payload = dict(payload, model=self.model)
+            res = requests.post(url, json=payload, timeout=self.timeout, stream=stream)
+        return res
+
+    def _post_cancellable(self, url, payload, cancel):
+        """_post(stream=True) that stops waiting as soon as cancel fires.
+
+        Ollama sends its headers with the first token, so the wait covers the whole prefill; a reply
+        that turns up after the cancel is closed on arrival.
+        """
+        outcome = {}
+        arrived = threading.Event()
+
+        def post():
+            try:
+                outcome['res'] = self._post(url, payload, stream=True)
+                if cancel.cancelled:
+                    outcome['res'].close()
+            except Exception as e:
+                outcome['error'] = e
+            finally:
+                arrived.set()
+
+        unregister = cancel.on_cancel(arrived.set)
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False
-            }
+            threading.Thread(target=post, daemon=True).start()
+            arrived.wait()
+        finally:
+            unregister()
+        if 'error' in outcome:
+            raise outcome['error']
+        if cancel.cancelled:
+            if 'res' in outcome:
+                outcome['res'].close()
+            raise GenerationCancelled(cancel.reason)
+        return outcome['res']
+
+    def generate(self, prompt, context=None, generation=None):
+        """Return Ollama's full reply ('response', 'context', timings); identical concurrent calls share one generation.
+
+        generation carries per-request settings from GenerationProfiles (model, options, keep_alive),
+        the scheduler priority, an affinity_key (the conversation id) that keeps a conversation
+        on one backend and a 'cancel' CancelToken that aborts the generation when the caller goes away.
+        Raises OverloadedError when the request is shed and GenerationCancelled when it is cancelled.
+        """
+        generation = generation or {}
+        payload = self._payload(prompt, context, generation=generation)
+        priority = generation.get("priority", PRIORITY_INTERACTIVE)
+        affinity_key = generation.get("affinity_key")
+        cancel = generation.get("cancel")
+        if not self.coalesce:
+            return self._generate(payload, priority, affinity_key, cancel)
+        return self.single_flight.do(
+            self._flight_key(payload),
+            lambda token: self._generate(payload, priority, affinity_key, token),
+            cancel=cancel
+        )
+
+    def generate_response(self, prompt, context=None, generation=None):
+        """Generate response text from Ollama"""
+        return self.generate(prompt, context, generation)["response"]
 
-            print(f"🤖 Sending request to Ollama (model: {self.model})...")
+    def stream_generate(self, prompt, context=None, generation=None):
+        """Yield Ollama's NDJSON chunks; concurrent identical prompts share one upstream stream"""
+        generation = generation or {}
+        payload = self._payload(prompt, context, stream=True, generation=generation)
+        priority = generation.get("priority", PRIORITY_INTERACTIVE)
+        affinity_key = generation.get("affinity_key")
+        cancel = generation.get("cancel")
+        if not self.coalesce:
+            return self._stream_generate(payload, priority, affinity_key, cancel)
+        return self.single_flight.stream(
+            self._flight_key(payload),
+            lambda token: self._stream_generate(payload, priority, affinity_key, token),
+            cancel=cancel
+        )
+
+    def warm_up(self, models, num_ctx=None):
+        """Load models on every backend ahead of the first request; [(model, keep_alive)], lowest priority.
+
+        Ollama reloads a model whose num_ctx changes, so load it with the window requests will ask for.
+        """
+        payload = {"options": {"num_ctx": num_ctx}} if num_ctx else {}
+        for backend in self.pool.backends:
+            for model, keep_alive in models:
+                try:
+                    backend.breaker.reject_if_open()
+                    with self.scheduler.slot(PRIORITY_BACKGROUND):
+                        res = requests.post(backend.url, json={"model": model, "keep_alive": keep_alive, **payload},
+                                            timeout=self.timeout)
+                        res.raise_for_status()
+                    print(f"🔥 Warmed up {model} on {backend.name}")
+                except OverloadedError:
+                    print(f"⏭️  Skipped warm-up of {model} on {backend.name}, Ollama is busy")
+                except Exception as e:
+                    print(f"⚠️  Warm-up of {model} on {backend.name} failed: {e}")
+
+    def _generate(self, payload, priority=PRIORITY_INTERACTIVE, affinity_key=None, cancel=None):
+        """Run one generation once the scheduler admits it; the reply also carries 'queue_wait_ms'"""
+        self.pool.reject_if_all_open()  # fail fast instead of queueing when every backend is down
+        with self.scheduler.slot(priority, cancel=cancel) as wait_ms:
+            metrics.observe('ollama.queue_wait_ms', wait_ms)
+            response_data = self._generate_now(payload, affinity_key, cancel)
+        response_data["queue_wait_ms"] = round(wait_ms, 1)
+        return response_data
+
+    def _generate_now(self, payload, affinity_key=None, cancel=None):
+        """Generate response from Ollama with better error handling"""
+        if self.hedging is not None:
+            # Hedging watches for the first token, so stream and reassemble the full reply
+            return self._collect(self._hedged_stream(dict(payload, stream=True), affinity_key, cancel))
+        with self.pool.lease(affinity_key) as backend:
+            if cancel is not None:
+                # A streamed reply can be dropped mid-generation; a blocking one only once it is done
+                return self._collect(self._stream_generate_on(backend, dict(payload, stream=True), cancel))
+            return self._generate_on(backend, payload)
+
+    @staticmethod
+    def _collect(chunks):
+        """Fold streamed chunks into the shape of a non-streaming /api/generate reply"""
+        parts = []
+        response_data = {}
+        for chunk in chunks:
+            parts.append(chunk.get("response", ""))
+            if chunk.get("done"):
+                response_data = dict(chunk)
+        response_data["response"] = "".join(parts)
+        return response_data
+
+    def _generate_on(self, backend, payload):
+        backend.breaker.before_call()
+        try:
+            print(f"🤖 Sending request to Ollama {backend.name} (model: {payload['model']})...")
             start_time = time.time()
-            
-            res = requests.post(self.url, json=payload, timeout=self.timeout)
-            
+
+            res = self._post(backend.url, payload)
+
             elapsed = time.time() - start_time
             print(f"⏱️  Ollama responded in {elapsed:.2f} seconds")
-            
+            metrics.observe('ollama.generation_ms', elapsed * 1000)
+
             res.raise_for_status()
-            
+
             response_data = res.json()
             if "response" not in response_data:
                 raise ValueError("Invalid response from Ollama - missing 'response' field")
-            
-            return response_data["response"]
-            
-        except requests.exceptions.ConnectionError:
-            error_msg = f"""
-❌ Cannot connect to Ollama!
-
-Please ensure:
-1. Ollama is running: Open a terminal and run 'ollama serve'
-2. Ollama is accessible at: {self.url}
-
-If Ollama is not installed, download from: https://ollama.ai/download
-"""
-            print(error_msg)
-            raise ConnectionError("Ollama is not running. Please start Ollama with 'ollama serve'")
-            
-        except requests.exceptions.Timeout:
-            error_msg = f"""
-⏱️ Ollama request timed out after {self.timeout} seconds!
-
-This usually means:
-1. The model is very slow (first run can be slow)
-2. Your system is under heavy load
-3. The model might be too large for your hardware
-
-Try:
-- Wait a bit and try again
-- Use a smaller model
-- Check Ollama logs
-"""
-            print(error_msg)
-            raise TimeoutError(f"Ollama took too long to respond (>{self.timeout}s)")
-            
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                error_msg = f"""
-❌ Model '{self.model}' not found!
 
-Please pull the model first:
-    ollama pull {self.model}
+            backend.breaker.record_success()
+            return response_data
 
-Available models: ollama list
-"""
-                print(error_msg)
-                raise ValueError(f"Model '{self.model}' not found. Run: ollama pull {self.model}")
-            else:
-                print(f"❌ HTTP Error from Ollama: {e}")
-                raise
-                
         except Exception as e:
-            print(f"❌ Unexpected error calling Ollama: {e}")
+            self._record_outcome(backend, e)
+            self._handle_error(e, backend, payload['model'])
+
+    def _stream_generate(self, payload, priority=PRIORITY_INTERACTIVE, affinity_key=None, cancel=None):
+        """Yield Ollama's NDJSON chunks as they are produced (each has 'response' and 'done').
+
+        The final chunk also carries 'queue_wait_ms', the time spent waiting for a scheduler slot.
+        """
+        self.pool.reject_if_all_open()
+        with self.scheduler.slot(priority, cancel=cancel) as wait_ms:
+            metrics.observe('ollama.queue_wait_ms', wait_ms)
+            for chunk in self._stream_generate_now(payload, affinity_key, cancel):
+                if chunk.get("done"):
+                    chunk["queue_wait_ms"] = round(wait_ms, 1)
+                yield chunk
+
+    def _stream_generate_now(self, payload, affinity_key=None, cancel=None):
+        """Stream one generation from Ollama, translating failures like _generate_now"""
+        if self.hedging is not None:
+            yield from self._hedged_stream(payload, affinity_key, cancel)
+            return
+        with self.pool.lease(affinity_key) as backend:
+            yield from self._stream_generate_on(backend, payload, cancel)
+
+    def _hedged_stream(self, payload, affinity_key=None, cancel=None):
+        """Stream from one backend; if its first token is later than the hedge delay, send the same
+        request to a second backend, keep whichever produces a token first and cancel the other"""
+        events = queue.Queue()
+        ticket = self.hedging.begin()
+        primary = _Attempt(self.pool.checkout(affinity_key))
+        attempts = [primary]
+        unregister = None
+        if cancel is not None:
+            # Wake the loop below; its finally cancels every attempt
+            unregister = cancel.on_cancel(lambda: events.put((None, None, GenerationCancelled(cancel.reason))))
+        self._start_attempt(primary, payload, events)
+        hedge_at = time.monotonic() + self.hedging.delay_ms() / 1000
+        running = {primary}
+        errors = []
+        winner = None
+        try:
+            while winner is None:
+                timeout = max(0.0, hedge_at - time.monotonic()) if hedge_at is not None else None
+                try:
+                    attempt, chunk, error = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_at = None
+                    hedge = self._start_hedge(primary, payload, events, ticket)
+                    if hedge is not None:
+                        attempts.append(hedge)
+                        running.add(hedge)
+                    continue
+
+                if attempt is None:
+                    raise error
+                if chunk is not None:
+                    winner = attempt
+                    break
+                # This attempt ended before producing anything; wait for the other if there is one
+                running.discard(attempt)
+                if error is not None:
+                    errors.append(error)
+                if not running:
+                    if errors:
+                        raise errors[0]
+                    return
+
+            if len(attempts) > 1:
+                self.hedging.record('won' if winner is not primary else 'lost')
+                print(f"🏁 Hedged generation won by {winner.backend.name}")
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+
+            while chunk is not None:
+                yield chunk
+                if chunk.get("done"):
+                    return
+                attempt, chunk, error = events.get()
+                while attempt is not winner and attempt is not None:
+                    attempt, chunk, error = events.get()
+                if error is not None:
+                    raise error
+        finally:
+            if unregister:
+                unregister()
+            for attempt in attempts:
+                attempt.cancel(cancel.reason if cancel is not None and cancel.cancelled else 'hedge_lost')
+
+    def _start_hedge(self, primary, payload, events, ticket):
+        """Launch the duplicate on another backend when the rate cap and spare capacity allow"""
+        if not self.hedging.allow(ticket):
+            return None
+        backend = self.pool.checkout(exclude=[primary.backend])
+        if backend is None:
+            self.hedging.record('no_capacity')
+            return None
+        try:
+            # Hedges only use idle capacity; they never queue behind or ahead of real requests
+            self.scheduler.acquire(PRIORITY_BACKGROUND)
+        except OverloadedError:
+            self.pool.checkin(backend, time.monotonic())
+            self.hedging.record('no_capacity')
+            return None
+        print(f"🪁 First token from {primary.backend.name} is late, hedging on {backend.name}")
+        hedge = _Attempt(backend, release_slot=True)
+        self._start_attempt(hedge, payload, events)
+        return hedge
+
+    def _start_attempt(self, attempt, payload, events):
+        thread = threading.Thread(target=self._run_attempt, args=(attempt, payload, events), daemon=True)
+        thread.start()
+
+    def _run_attempt(self, attempt, payload, events):
+        """Forward one attempt's chunks to events as (attempt, chunk, None); (attempt, None, error) ends it"""
+        started = time.monotonic()
+        error = None
+        try:
+            with closing(self._stream_generate_on(attempt.backend, payload, attempt.token)) as chunks:
+                for chunk in chunks:
+                    events.put((attempt, chunk, None))
+        except Exception as e:
+            error = e
+        finally:
+            self.pool.checkin(attempt.backend, started)
+            if attempt.release_slot:
+                self.scheduler.release(time.monotonic() - started)
+            events.put((attempt, None, error))
+
+    def _stream_generate_on(self, backend, payload, cancel=None):
+        """Stream one generation from one backend. Cancelling the token closes the connection,
+        which makes Ollama stop generating, and raises GenerationCancelled here."""
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        backend.breaker.before_call()
+        res = None
+        unregister = None
+        received = 0
+        try:
+            print(f"🤖 Streaming request to Ollama {backend.name} (model: {payload['model']})...")
+            start_time = time.time()
+            first_chunk = True
+
+            if cancel is None:
+                res = self._post(backend.url, payload, stream=True)
+            else:
+                res = self._post_cancellable(backend.url, payload, cancel)
+                unregister = cancel.on_cancel(res.close)
+            res.raise_for_status()
+            backend.breaker.record_success()
+
+            # chunk_size=None hands over each chunk as Ollama flushes it instead of waiting for 512 bytes
+            for line in res.iter_lines(chunk_size=None):
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise ValueError(f"Ollama error: {chunk['error']}")
+                if first_chunk:
+                    print(f"⏱️  Ollama first token in {time.time() - start_time:.2f} seconds")
+                    metrics.observe('ollama.ttft_ms', (time.time() - start_time) * 1000)
+                    first_chunk = False
+                received += 1
+                yield chunk
+                if chunk.get("done"):
+                    break
+            if cancel is not None:
+                cancel.raise_if_cancelled()  # the connection was closed under us
+
+            print(f"⏱️  Ollama stream finished in {time.time() - start_time:.2f} seconds")
+            metrics.observe('ollama.generation_ms', (time.time() - start_time) * 1000)
+
+        except GeneratorExit:
             raise
+        except Exception as e:
+            if cancel is not None and cancel.cancelled:
+                if res is None:
+                    backend.breaker.abandon_call()  # cancelled before Ollama answered; no verdict
+                self._count_cancelled(cancel.reason, payload, received)
+                raise GenerationCancelled(cancel.reason) from None
+            if isinstance(e, ValueError):
+                raise
+            self._record_outcome(backend, e)
+            self._handle_error(e, backend, payload['model'])
+        finally:
+            if unregister:
+                unregister()
+            if res is not None:
+                res.close()
+
+    @staticmethod
+    def _count_cancelled(reason, payload, received):
+        """Count a generation dropped before it finished, and roughly how many tokens that saved"""
+        metrics.incr('ollama.cancelled')
+        metrics.incr(f'ollama.cancelled.{reason}')
+        num_predict = (payload.get("options") or {}).get("num_predict")
+        if num_predict and num_predict > received:
+            metrics.incr('ollama.cancelled.tokens_saved', num_predict - received)
+        print(f"🛑 Cancelled Ollama generation ({reason}) after {received} chunks")
+
+    def _record_outcome(self, backend, e):
+        """Count connection failures, timeouts and 5xx against the backend's breaker; any other error means it answered"""
+        if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            backend.breaker.record_failure()
+        elif isinstance(e, requests.exceptions.HTTPError) and e.response is not None and e.response.status_code >= 500:
+            backend.breaker.record_failure()
+        else:
+            backend.breaker.record_success()
+
+    def _handle_error(self, e, backend=None, model=None):
+        """Translate a requests failure into the exceptions routes/chat.py reports; model is the one requested"""
+        url = backend.url if backend else self.url
+        if isinstance(e, requests.exceptions.ConnectionError):
+            logger.error("Cannot connect to Ollama at %s; is 'ollama serve' running? (%s)", url, e)
+            raise ConnectionError("Ollama is not running. Please start Ollama with 'ollama serve'")
+
+        if isinstance(e, requests.exceptions.Timeout):
+            logger.warning("Ollama at %s did not answer within %ss; the model may still be loading, "
+                           "be too large for the host, or the host may be overloaded", url, self.timeout)
+            raise TimeoutError(f"Ollama took too long to respond (>{self.timeout}s)")
+
+        if isinstance(e, requests.exceptions.HTTPError):
+            if e.response.status_code == 404:
+                model = model or self.model
+                # _post() only gives up on a profile's model after the default one is missing too
+                pull = ' && '.join(f"ollama pull {name}" for name in dict.fromkeys([model, self.model]))
+                logger.error("Model '%s' not found on %s; run '%s'", model, url, pull)
+                raise ValueError(f"Model '{model}' not found. Run: {pull}")
+            logger.error("HTTP error from Ollama at %s: %s", url, e)
+            raise e
+
+        logger.exception("Unexpected error calling Ollama at %s", url)
+        raise e
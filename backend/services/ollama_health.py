@@ -0,0 +1,64 @@
+import threading
+import time
+import requests
+
+
+class OllamaHealthMonitor:
+    """Background probe of Ollama's /api/ps; keeps the last result and drives the circuit breaker"""
+
+    def __init__(self, host, breaker=None, interval=10.0, timeout=2.0):
+        self.host = host.rstrip('/')
+        self.breaker = breaker
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._state = {'reachable': None, 'loaded_models': [], 'checked_at': None, 'latency_ms': None, 'error': None}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ollama-health', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def check(self):
+        """Probe Ollama once and return the new state"""
+        start = time.monotonic()
+        try:
+            res = requests.get(f"{self.host}/api/ps", timeout=self.timeout)
+            res.raise_for_status()
+            models = [m.get('name') for m in res.json().get('models', [])]
+            state = {'reachable': True, 'loaded_models': models, 'error': None}
+        except Exception as e:
+            state = {'reachable': False, 'loaded_models': [], 'error': type(e).__name__}
+
+        state['checked_at'] = time.time()
+        state['latency_ms'] = round((time.monotonic() - start) * 1000, 1)
+        with self._lock:
+            was_reachable = self._state['reachable']
+            self._state = state
+
+        if self.breaker is not None:
+            if not state['reachable']:
+                self.breaker.trip()
+            elif was_reachable is False:
+                self.breaker.allow_trial()
+        if was_reachable is not None and was_reachable != state['reachable']:
+            print(f"{'✅' if state['reachable'] else '❌'} Ollama health: {'reachable' if state['reachable'] else state['error']}")
+        return state
+
+    def snapshot(self):
+        with self._lock:
+            state = dict(self._state)
+        if self.breaker is not None:
+            state['circuit'] = self.breaker.state
+        return state
@@ -0,0 +1,185 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from services.generation_scheduler import OverloadedError
+from services.metrics import metrics
+from services.ollama_health import OllamaHealthMonitor
+
+
+class OllamaBackend:
+    """One Ollama server: its URL, circuit breaker, health probe, in-flight count and concurrency limit"""
+
+    def __init__(self, host, breaker_settings=None, health_interval=10.0, max_concurrent=None):
+        self.host = host.rstrip('/')
+        self.url = f"{self.host}/api/generate"
+        self.name = self.host.split('://', 1)[-1]
+        self.breaker = CircuitBreaker(f"Ollama {self.name}", **(breaker_settings or {}))
+        self.health = OllamaHealthMonitor(self.host, breaker=self.breaker, interval=health_interval)
+        self.max_concurrent = max_concurrent  # None: no limit of its own
+        self.in_flight = 0
+        self.requests = 0
+
+    @property
+    def available(self):
+        return self.breaker.state != OPEN
+
+    @property
+    def accepting(self):
+        """Closed, or half-open with no trial request running (caller holds the pool lock)"""
+        state = self.breaker.state
+        return state == CLOSED or (state == HALF_OPEN and self.in_flight == 0)
+
+    @property
+    def has_room(self):
+        """Below its concurrency limit (caller holds the pool lock)"""
+        return self.max_concurrent is None or self.in_flight < self.max_concurrent
+
+    def stats(self):
+        latency = f'ollama.backend.{self.name}.latency_ms'
+        return {
+            'host': self.host,
+            'in_flight': self.in_flight,
+            'max_concurrent': self.max_concurrent,
+            'requests': self.requests,
+            'latency_p50_ms': metrics.percentile(latency, 50),
+            'latency_p95_ms': metrics.percentile(latency, 95),
+            'circuit': self.breaker.stats(),
+            'health': self.health.snapshot()
+        }
+
+
+class OllamaBackendPool:
+    """Least-outstanding-requests routing over several Ollama servers, sticky per conversation.
+
+    Each server runs at most max_concurrent generations; a request that finds every healthy
+    server at its limit waits up to wait_timeout seconds for one to free up.
+    """
+
+    def __init__(self, hosts, breaker_settings=None, health_interval=10.0, max_affinities=10000,
+                 max_concurrent=None, wait_timeout=30.0):
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.backends = [OllamaBackend(host, breaker_settings, health_interval, max_concurrent) for host in hosts]
+        self.max_affinities = max_affinities
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._freed = threading.Condition(self._lock)
+        self._affinity = OrderedDict()  # affinity key -> backend, least recently used first
+        self._tiebreak = itertools.count()
+        self._stats = {'sticky': 0, 'rerouted': 0, 'assigned': 0, 'waits': 0, 'wait_timeouts': 0}
+
+    @property
+    def primary(self):
+        return self.backends[0]
+
+    def start_health_checks(self):
+        for backend in self.backends:
+            backend.health.start()
+
+    def check_health(self):
+        """Probe every backend once (the background threads do this on their own interval)"""
+        return [backend.health.check() for backend in self.backends]
+
+    def reject_if_all_open(self):
+        """Fail fast when no backend can take a request"""
+        if not any(backend.available for backend in self.backends):
+            retry_after = min(backend.breaker.seconds_until_trial() for backend in self.backends)
+            raise CircuitOpenError("All Ollama backends are unavailable, failing fast", retry_after)
+
+    def _choose(self, affinity_key=None, exclude=None):
+        """Backend for the next request: the conversation's own node while it is healthy,
+        otherwise the available node with the fewest requests in flight (caller holds the lock).
+
+        With exclude (a hedge looking for a second node) only other available backends with room
+        qualify. None is returned when there are none, or when every accepting backend is at its limit.
+        """
+        if exclude:
+            candidates = [b for b in self.backends if b not in exclude and b.accepting and b.has_room]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda b: b.in_flight)
+
+        if affinity_key:
+            backend = self._affinity.get(affinity_key)
+            if backend is not None:
+                if backend.available and backend.has_room:
+                    self._affinity.move_to_end(affinity_key)
+                    self._stats['sticky'] += 1
+                    return backend
+                self._stats['rerouted'] += 1
+
+        # A half-open backend takes one request at a time as its trial, so a recovered node rejoins
+        accepting = [b for b in self.backends if b.accepting]
+        candidates = [b for b in accepting if b.has_room]
+        if accepting and not candidates:
+            return None
+        # With nothing accepting, the breakers of the chosen backend fail the request fast
+        candidates = candidates or [b for b in self.backends if b.available] or self.backends
+        # Rotate the starting point so ties spread instead of always landing on the first host
+        offset = next(self._tiebreak) % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+        backend = min(rotated, key=lambda b: b.in_flight)
+
+        if affinity_key:
+            self._affinity[affinity_key] = backend
+            self._affinity.move_to_end(affinity_key)
+            self._stats['assigned'] += 1
+            while len(self._affinity) > self.max_affinities:
+                self._affinity.popitem(last=False)
+        return backend
+
+    def checkout(self, affinity_key=None, exclude=None, wait=True):
+        """Pick a backend and count a request against it; hand it back with checkin().
+
+        When every accepting backend is at its limit, wait for a checkin (raising OverloadedError
+        after wait_timeout), or return None straight away if wait is False. Hedges (exclude) never wait.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        with self._lock:
+            backend = self._choose(affinity_key, exclude)
+            if backend is None and wait and not exclude:
+                self._stats['waits'] += 1
+                while backend is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['wait_timeouts'] += 1
+                        raise OverloadedError("Every Ollama backend is at its concurrency limit", reason='backends_full')
+                    # Breaker transitions do not notify, so look again now and then
+                    self._freed.wait(min(remaining, 0.5))
+                    backend = self._choose(affinity_key, exclude)
+            if backend is not None:
+                backend.in_flight += 1
+                backend.requests += 1
+        return backend
+
+    def checkin(self, backend, started=None):
+        """Finish a request taken with checkout() at time.monotonic() == started (None: it never ran)"""
+        with self._lock:
+            backend.in_flight -= 1
+            self._freed.notify()
+        if started is not None:
+            metrics.observe(f'ollama.backend.{backend.name}.latency_ms', (time.monotonic() - started) * 1000)
+
+    @contextmanager
+    def lease(self, affinity_key=None):
+        """Pick a backend and count the request against it while it runs, recording its latency"""
+        backend = self.checkout(affinity_key)
+        started = time.monotonic()
+        try:
+            yield backend
+        finally:
+            self.checkin(backend, started)
+
+    def health(self):
+        """Cached health of every backend, for /health"""
+        return [dict(backend.health.snapshot(), host=backend.host) for backend in self.backends]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['affinities'] = len(self._affinity)
+        stats['backends'] = [backend.stats() for backend in self.backends]
+        return stats
@@ -1,91 +1,128 @@
 from services.database_service import DatabaseService
 from services.location_service import LocationService
+from services.context_assembler import KnowledgeContextAssembler
+from services.deadline import current_deadline
+from services.fan_out import fan_out
 from location_data import LOCATION_DATA, CITY_GREETINGS
-import json
+from config import Config
 
 class PromptBuilder:
-    def __init__(self):
-        self.db_service = DatabaseService()
-        self.location_service = LocationService()
+    def __init__(self, db_service=None, location_service=None, context_assembler=None):
+        self.db_service = db_service or DatabaseService()
+        self.location_service = location_service or LocationService()
+        self.context_assembler = context_assembler or KnowledgeContextAssembler(
+            budgets=Config.KNOWLEDGE_TOKEN_BUDGETS,
+            default_budget=Config.KNOWLEDGE_TOKEN_BUDGET
+        )
+        self._prefix_cache = {}
         
     def get_database_context(self, intent, message, city_name, state_name):
-        """Fetch relevant context from Database (for Agra/specific cities) or Knowledge Base"""
-        context_data = []
-        
-        # Try Database first (for Agra)
-        if city_name and city_name.lower() == "agra":
+        """Fetch relevant context from Database (for Agra/specific cities) or Knowledge Base,
+        trimmed to the intent's token budget by the context assembler"""
+        sections = []
+        overview = []
+
+        # Try Database first (for Agra), unless the request deadline has no time to spare for it
+        deadline = current_deadline()
+        db_allowed = deadline is None or deadline.allows('knowledge_db', Config.CHAT_ENRICHMENT_MIN_SECONDS)
+        if city_name and city_name.lower() == "agra" and db_allowed:
             try:
+                # The overview does not depend on the intent's queries, so they run side by side
+                stages = {'overview': lambda: self.db_service.get_city_overview(city_name)}
                 if intent == 'history':
-                    all_places = self.db_service.get_places_to_visit(city_name)
-                    if all_places:
-                        for place in all_places:
-                            if place['place_name'].lower() in message.lower():
-                                data = self.db_service.get_place_history(place['place_name'], city_name)
-                                if data: context_data.append(data[0])
-                    if not context_data: context_data = all_places
+                    stages['intent'] = lambda: self._history_sections(message, city_name)
                 elif intent == 'food_culture':
-                    restaurants = self.db_service.get_restaurants_by_city(city_name)
-                    if restaurants: context_data.extend(restaurants)
+                    stages['intent'] = lambda: [('restaurants', self.db_service.get_restaurants_by_city(city_name))]
                 elif intent == 'travel_places':
-                    data = self.db_service.get_places_to_visit(city_name)
-                    if data: context_data.extend(data)
-                
-                overview = self.db_service.get_city_overview(city_name)
-                if overview: context_data.insert(0, overview[0])
+                    stages['intent'] = lambda: [('places', self.db_service.get_places_to_visit(city_name))]
+
+                results = fan_out.run(stages)
+                sections.extend(results.get('intent', []))
+                overview = (results['overview'] or [])[:1]
             except Exception as e:
                 print(f"Database error: {e}")
+        sections.append(('overview', overview))
 
         # Supplement with India-wide Knowledge JSON
         state_info = self.location_service.get_location_data(state_name)
         if state_info:
-            context_data.append({"info_type": "state_knowledge", "data": state_info})
-        
-        if not context_data:
+            sections.append(('state', [self.context_assembler.state_row(intent, state_info)]))
+
+        context_str, _ = self.context_assembler.assemble(intent, message, sections)
+        if not context_str:
             return "KNOWLEDGE BASE: Limited information available locally. Use general knowledge about India."
 
-        context_str = "KNOWLEDGE CONTEXT:\n"
-        for item in context_data:
-            context_str += json.dumps(item, default=str) + "\n"
-        
-        return context_str
+        return "KNOWLEDGE CONTEXT:\n" + context_str + "\n"
+
+    def _history_sections(self, message, city_name):
+        all_places = self.db_service.get_places_to_visit(city_name) or []
+        # One round trip for every place the message names, not one per place
+        mentioned = [place['place_name'] for place in all_places if place['place_name'].lower() in message.lower()]
+        histories = self.db_service.get_place_histories(mentioned, city_name) or []
+        return [('history', histories), ('places', all_places)]
+
+    def needs_knowledge(self, intent, location_context):
+        """Whether build_prompt() includes a knowledge section (and so calls get_database_context)"""
+        return bool(location_context) and intent not in ["greeting", "vague_location", "clarification_needed"]
     
     def get_master_prompt(self):
         """Standard Absolute Behavior Rules for GuideMeAI"""
-        return """You are GuideMeAI, an interactive AI assistant. 
-        Your primary responsibility is to respond ONLY to explicit user intent.
-
-        ABSOLUTE BEHAVIOR RULES (NON-NEGOTIABLE):
-        1. NEVER provide explanations, descriptions, facts, or recommendations unless the user explicitly asks for them.
-        2. NEVER assume the user wants information about any city, place, topic, or subject.
-        3. NEVER auto-start a topic, narration, or story.
-        4. Greetings (hi, hello, namaste) must receive a SHORT greeting ONLY.
-        5. Do NOT use default cities or examples unless the user names them first.
-        6. Be concise, calm, and human-like. Avoid long introductions.
-        7. If unsure about intent -> ask a clarifying question.
-        8. Maintain "Hinglish" (mixture of Hindi and English) if the context suggests a local Indian flavor, but stay professional.
-        """
+        return """You are GuideMeAI, an interactive AI assistant.
+Your primary responsibility is to respond ONLY to explicit user intent.
 
-    def build_prompt(self, message, intent, user_context=None, location_context=None, mode="text", history=None, profile_data=None):
-        """Build prompt using intent-based gating and profile personalization"""
-        
-        master = self.get_master_prompt()
-        
-        # Intent Gating Templates
-        intent_instructions = ""
-        
+ABSOLUTE BEHAVIOR RULES (NON-NEGOTIABLE):
+1. NEVER provide explanations, descriptions, facts, or recommendations unless the user explicitly asks for them.
+2. NEVER assume the user wants information about any city, place, topic, or subject.
+3. NEVER auto-start a topic, narration, or story.
+4. Greetings (hi, hello, namaste) must receive a SHORT greeting ONLY.
+5. Do NOT use default cities or examples unless the user names them first.
+6. Be concise, calm, and human-like. Avoid long introductions.
+7. If unsure about intent -> ask a clarifying question.
+8. Maintain "Hinglish" (mixture of Hindi and English) if the context suggests a local Indian flavor, but stay professional."""
+
+    def get_intent_instructions(self, intent):
+        """Intent gating instruction for the model"""
         if intent == "greeting":
-            intent_instructions = "The user has greeted you. Respond with a short greeting and ask what they would like to explore or ask about. Do NOT provide any facts."
+            return "The user has greeted you. Respond with a short greeting and ask what they would like to explore or ask about. Do NOT provide any facts."
         elif intent in ["vague_location", "clarification_needed"]:
-            intent_instructions = "The user input is vague or is just a location name. Ask a clarifying question. Do NOT guess the topic."
+            return "The user input is vague or is just a location name. Ask a clarifying question. Do NOT guess the topic."
         elif intent == "travel_places":
-            intent_instructions = "The user wants suggestions for places to visit. List top monuments and gems concisely."
+            return "The user wants suggestions for places to visit. List top monuments and gems concisely."
         elif intent == "food_culture":
-            intent_instructions = "The user asking about food. Highlight local dishes and famous eateries."
+            return "The user asking about food. Highlight local dishes and famous eateries."
         else:
-            intent_instructions = f"Answer the user's specific question about the current context concisely."
+            return f"Answer the user's specific question about the current context concisely."
+
+    def get_static_prefix(self, intent):
+        """Byte-identical opening of every prompt for an intent, so the inference server can reuse its KV cache"""
+        prefix = self._prefix_cache.get(intent)
+        if prefix is None:
+            prefix = f"{self.get_master_prompt()}\n\nTASK: {self.get_intent_instructions(intent)}\n"
+            self._prefix_cache[intent] = prefix
+        return prefix
+
+    def build_prompt(self, message, intent, user_context=None, location_context=None, mode="text", history=None, profile_data=None, knowledge=None):
+        """Build prompt using intent-based gating and profile personalization.
+
+        Layout: static prefix (rules + intent task), then the variable sections in a fixed order,
+        most to least shared between requests: location, knowledge, profile, history, user message.
+        knowledge is get_database_context()'s result when the caller already fetched it.
+        """
+        sections = []
+
+        # Location Context
+        if location_context and intent not in ["greeting", "clarification_needed"]:
+            city = location_context.get('city')
+            state = location_context.get('state')
+            if city: sections.append(f"CURRENT LOCATION CONTEXT: {city}, {state}.")
+
+        # Knowledge Context
+        if self.needs_knowledge(intent, location_context):
+            if knowledge is None:
+                knowledge = self.get_database_context(intent, message, location_context.get('city'), location_context.get('state'))
+            sections.append(knowledge.strip())
 
         # Profile Personalization (Optional/Assistive)
-        profile_instr = ""
         if profile_data and profile_data.get('isProfileActive'):
             name = profile_data.get('name')
             lang = profile_data.get('language', 'hinglish')
@@ -93,7 +130,7 @@ class PromptBuilder:
             style = profile_data.get('responseStyle', 'concise')
             home_state = profile_data.get('homeState')
 
-            profile_instr = "\nUSER PROFILE CONTEXT (Use silently for relevance):"
+            profile_instr = "USER PROFILE CONTEXT (Use silently for relevance):"
             if name: profile_instr += f"\n- User Name: {name} (Address them naturally if appropriate)"
             if lang: profile_instr += f"\n- Preferred Language: {lang}"
             if interests: profile_instr += f"\n- User Interests: {', '.join(interests)} (Focus on these aspects if relevant to the question)"
@@ -101,37 +138,53 @@ class PromptBuilder:
             if home_state: profile_instr += f"\n- Home State: {home_state} (Use to reduce back-and-forth for geographic context)"
 
             profile_instr += "\nRULES: Never say 'Because you like...' or 'Based on your profile'. User input always overrides profile."
+            sections.append(profile_instr)
 
-        # Knowledge Context
+        # History
+        if history:
+            sections.append("CONVERSATION HISTORY (Last 3 turns):\n" + "\n".join([f"{m['role'].upper()}: {m['content']}" for m in history[-3:]]))
+
+        sections.append(f"USER MESSAGE: {message}\nASSISTANT:")
+
+        return self.get_static_prefix(intent) + "\n" + "\n\n".join(sections)
+
+    def build_followup_prompt(self, message, intent, location_context=None, sent_state=None):
+        """Prompt for a turn whose earlier turns already live in Ollama's context.
+
+        sent_state records what that context already contains; returns (prompt, updated sent_state).
+        """
+        intent_instructions = self.get_intent_instructions(intent)
+        location_context = location_context or {}
+        sent_state = sent_state or {}
+        city = location_context.get('city')
+        state = location_context.get('state')
+
+        # Knowledge is only re-sent for a (city, intent) pair the model has not seen yet
         knowledge_str = ""
-        if intent not in ["greeting", "vague_location", "clarification_needed"] and location_context:
-            target_city = location_context.get('city')
-            target_state = location_context.get('state')
-            knowledge_str = "\n" + self.get_database_context(intent, message, target_city, target_state)
+        sent_knowledge = list(sent_state.get('knowledge', []))
+        knowledge_key = f"{city}|{state}|{intent}"
+        if intent not in ["greeting", "vague_location", "clarification_needed"] and location_context and knowledge_key not in sent_knowledge:
+            knowledge_str = "\n" + self.get_database_context(intent, message, city, state)
+            sent_knowledge.append(knowledge_key)
 
-        # Location Context
         loc_context_str = ""
-        if location_context and intent not in ["greeting", "clarification_needed"]:
-            city = location_context.get('city')
-            state = location_context.get('state')
-            if city: loc_context_str = f"\nCURRENT LOCATION CONTEXT: {city}, {state}."
+        if city and intent not in ["greeting", "clarification_needed"] and sent_state.get('location') != [city, state]:
+            loc_context_str = f"\nCURRENT LOCATION CONTEXT: {city}, {state}."
 
-        # History
-        history_str = ""
-        if history:
-            history_str = "\nCONVERSATION HISTORY (Last 3 turns):\n" + "\n".join([f"{m['role'].upper()}: {m['content']}" for m in history[-3:]])
-
-        prompt = f"""{master}
-        
-        {intent_instructions}
-        {profile_instr}
-        {knowledge_str}
-        {loc_context_str}
-        {history_str}
-        
-        USER MESSAGE: {message}
-        ASSISTANT:"""
-        
-        return prompt
+        prompt = f"""{intent_instructions}{knowledge_str}{loc_context_str}
 
+USER MESSAGE: {message}
+ASSISTANT:"""
+        sent_location = [city, state] if loc_context_str else sent_state.get('location')
+        return prompt, {'location': sent_location, 'knowledge': sent_knowledge}
 
+    def prompt_state(self, intent, location_context=None):
+        """What a full build_prompt() call put into the model's context, in build_followup_prompt's terms"""
+        location_context = location_context or {}
+        city = location_context.get('city')
+        state = location_context.get('state')
+        knowledge = []
+        if intent not in ["greeting", "vague_location", "clarification_needed"] and location_context:
+            knowledge.append(f"{city}|{state}|{intent}")
+        sent_location = [city, state] if city and intent not in ["greeting", "clarification_needed"] else None
+        return {'location': sent_location, 'knowledge': knowledge}
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+class ReferenceCache:
+    """Read-through cache of rows from the near-static city reference tables.
+
+    Entries are keyed by (query, params) and grouped by table, each table with its own TTL and
+    LRU entry limit. Failed or skipped queries (None) are never cached. Cached rows are shared
+    between requests, so callers must not modify them.
+
+    invalidate() drops tables in this process; mark_reference_data_changed() reaches every other
+    process on the host through the stamp file's mtime, which is checked at most once per
+    REFERENCE_CACHE_STAMP_CHECK_INTERVAL.
+    """
+
+    def __init__(self, ttls=None, default_ttl=None, max_entries=None, stamp_path=None, enabled=None):
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.stamp_path = stamp_path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._tables = {}  # table -> OrderedDict(key -> (rows, expires_at))
+        self._stats = {}  # table -> counters
+        self._invalidations = 0
+        self._stamp = None
+        self._stamp_checked_at = None
+
+    def fetch(self, table, key, loader):
+        """Return the cached rows for key, or load, cache and return them"""
+        if not (Config.REFERENCE_CACHE_ENABLED if self.enabled is None else self.enabled):
+            return loader()
+        self._check_stamp()
+        now = time.monotonic()
+        with self._lock:
+            entries = self._tables.setdefault(table, OrderedDict())
+            stats = self._table_stats(table)
+            entry = entries.get(key)
+            if entry is not None and entry[1] > now:
+                entries.move_to_end(key)
+                stats['hits'] += 1
+                return entry[0]
+            if entry is not None:
+                del entries[key]
+                stats['expired'] += 1
+            stats['misses'] += 1
+
+        rows = loader()
+        ttl = self._ttl(table)
+        if rows is None or ttl <= 0:
+            return rows
+        max_entries = self.max_entries or Config.REFERENCE_CACHE_MAX_ENTRIES
+        with self._lock:
+            entries = self._tables.setdefault(table, OrderedDict())
+            stats = self._table_stats(table)
+            entries[key] = (rows, time.monotonic() + ttl)
+            entries.move_to_end(key)
+            stats['stores'] += 1
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+                stats['evictions'] += 1
+        return rows
+
+    def invalidate(self, *tables):
+        """Drop the cached rows of the given tables, or of every table when none are named"""
+        with self._lock:
+            for table in tables or list(self._tables):
+                self._tables.pop(table, None)
+            self._invalidations += 1
+
+    def stats(self):
+        """Counters and hit rate per table, plus totals"""
+        with self._lock:
+            tables = {table: dict(stats, entries=len(self._tables.get(table, ()))) for table, stats in self._stats.items()}
+            invalidations = self._invalidations
+        totals = {'hits': 0, 'misses': 0, 'entries': 0}
+        for stats in tables.values():
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+            for name in totals:
+                totals[name] += stats[name]
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = round(totals['hits'] / lookups, 3) if lookups else 0.0
+        return {**totals, 'invalidations': invalidations, 'tables': tables}
+
+    def _ttl(self, table):
+        ttls = Config.REFERENCE_CACHE_TTLS if self.ttls is None else self.ttls
+        default_ttl = Config.REFERENCE_CACHE_DEFAULT_TTL if self.default_ttl is None else self.default_ttl
+        return ttls.get(table, default_ttl)
+
+    def _table_stats(self, table):
+        # Caller holds the lock
+        if table not in self._stats:
+            self._stats[table] = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+        return self._stats[table]
+
+    def _check_stamp(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._stamp_checked_at is not None and now - self._stamp_checked_at < Config.REFERENCE_CACHE_STAMP_CHECK_INTERVAL:
+                return
+            first_check = self._stamp_checked_at is None
+            self._stamp_checked_at = now
+        stamp = stamp_version(self.stamp_path)
+        with self._lock:
+            changed = not first_check and stamp != self._stamp
+            self._stamp = stamp
+        if changed:
+            print("🔄 Reference data changed, dropping cached rows")
+            self.invalidate()
+
+
+def stamp_version(path=None):
+    """mtime of the reference-data stamp file, or None when it does not exist"""
+    try:
+        return os.stat(path or Config.REFERENCE_CACHE_STAMP).st_mtime_ns
+    except OSError:
+        return None
+
+def mark_reference_data_changed(path=None):
+    """Touch the stamp file so running servers drop their cached reference rows (init_database.py calls this)"""
+    path = path or Config.REFERENCE_CACHE_STAMP
+    with open(path, 'a'):
+        pass
+    os.utime(path)
+    reference_cache.invalidate()
+
+
+# Shared by every DatabaseService in the process
+reference_cache = ReferenceCache()
@@ -0,0 +1,160 @@
+import threading
+from config import Config
+from flask import current_app, has_app_context
+from services.cancellation import ActiveRequests
+from services.conversation_store import ConversationContextStore
+from services.database_service import DatabaseService
+from services.generation_profiles import GenerationProfiles
+from services.location_service import LocationService
+from services.ollama_client import OllamaClient
+from services.prompt_builder import PromptBuilder
+from services.response_cache import ResponseCache
+from services.user_service import UserService
+
+
+class ServiceRegistry:
+    """Long-lived services shared by every blueprint instead of building them per request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._location_service = None
+        self._ollama_client = None
+        self._database_service = None
+        self._user_service = None
+        self._prompt_builder = None
+        self._response_cache = None
+        self._conversation_store = None
+        self._generation_profiles = None
+        self._active_requests = None
+        self._warm_up_started = False
+
+    @property
+    def location_service(self):
+        """india_knowledge.json is read-only after load, so one copy serves all threads"""
+        if self._location_service is None:
+            with self._lock:
+                if self._location_service is None:
+                    self._location_service = LocationService()
+        return self._location_service
+
+    @property
+    def ollama_client(self):
+        """OllamaClient keeps no per-request state"""
+        if self._ollama_client is None:
+            with self._lock:
+                if self._ollama_client is None:
+                    self._ollama_client = OllamaClient()
+        return self._ollama_client
+
+    @property
+    def database_service(self):
+        """Queries borrow from the shared connection pool, so one instance is thread-safe"""
+        if self._database_service is None:
+            with self._lock:
+                if self._database_service is None:
+                    self._database_service = DatabaseService()
+        return self._database_service
+
+    @property
+    def user_service(self):
+        """UserService borrows pooled connections the same way"""
+        if self._user_service is None:
+            with self._lock:
+                if self._user_service is None:
+                    self._user_service = UserService()
+        return self._user_service
+
+    @property
+    def prompt_builder(self):
+        """PromptBuilder reusing the shared DatabaseService and LocationService"""
+        if self._prompt_builder is None:
+            database_service = self.database_service
+            location_service = self.location_service
+            with self._lock:
+                if self._prompt_builder is None:
+                    self._prompt_builder = PromptBuilder(
+                        db_service=database_service,
+                        location_service=location_service
+                    )
+        return self._prompt_builder
+
+    @property
+    def response_cache(self):
+        """LRU+TTL cache of LLM responses for /api/chat"""
+        if self._response_cache is None:
+            with self._lock:
+                if self._response_cache is None:
+                    self._response_cache = ResponseCache(
+                        max_entries=Config.CHAT_CACHE_MAX_ENTRIES,
+                        ttls=Config.CHAT_CACHE_TTLS,
+                        default_ttl=Config.CHAT_CACHE_DEFAULT_TTL
+                    )
+        return self._response_cache
+
+    @property
+    def conversation_store(self):
+        """Per-conversation Ollama context tokens"""
+        if self._conversation_store is None:
+            with self._lock:
+                if self._conversation_store is None:
+                    self._conversation_store = ConversationContextStore(
+                        max_conversations=Config.CONVERSATION_MAX,
+                        max_total_tokens=Config.CONVERSATION_MAX_TOTAL_TOKENS,
+                        max_context_tokens=Config.CONVERSATION_MAX_CONTEXT_TOKENS,
+                        idle_ttl=Config.CONVERSATION_IDLE_TTL
+                    )
+        return self._conversation_store
+
+    @property
+    def generation_profiles(self):
+        """Per-intent model and generation settings from Config"""
+        if self._generation_profiles is None:
+            with self._lock:
+                if self._generation_profiles is None:
+                    self._generation_profiles = GenerationProfiles(
+                        Config.GENERATION_PROFILES,
+                        intent_profiles=Config.INTENT_PROFILES,
+                        ctx_buckets=Config.OLLAMA_NUM_CTX_BUCKETS
+                    )
+        return self._generation_profiles
+
+    @property
+    def active_requests(self):
+        """Chat generations in flight, so superseded and disconnected requests can be cancelled"""
+        if self._active_requests is None:
+            with self._lock:
+                if self._active_requests is None:
+                    self._active_requests = ActiveRequests(poll_interval=Config.CHAT_DISCONNECT_POLL_INTERVAL)
+        return self._active_requests
+
+    def start_warm_up(self):
+        """Load every profile's model in the background, once per process"""
+        with self._lock:
+            if self._warm_up_started:
+                return
+            self._warm_up_started = True
+        profiles = self.generation_profiles
+        models = {}
+        for profile in profiles.profiles.values():
+            models.setdefault(profile['model'], profile.get('keep_alive'))
+        threading.Thread(target=self.ollama_client.warm_up, args=(list(models.items()), profiles.default_num_ctx),
+                         daemon=True).start()
+
+
+# Used when blueprints are mounted on an app that did not go through create_app()
+# (start.py and run_full_server.py re-register them on their own Flask app)
+_default_registry = ServiceRegistry()
+
+def init_services(app, registry=None):
+    """Attach a service registry to the app"""
+    app.extensions['services'] = registry or _default_registry
+    return app.extensions['services']
+
+def get_services():
+    """Return the registry for the current app, falling back to the process default"""
+    if has_app_context():
+        registry = current_app.extensions.get('services')
+        if registry is not None:
+            return registry
+    return _default_registry
+
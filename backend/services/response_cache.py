@@ -0,0 +1,109 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of raw LLM responses with per-intent TTLs"""
+
+    def __init__(self, max_entries=1000, ttls=None, default_ttl=3600):
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'stores': 0, 'stale_served': 0}
+
+    @staticmethod
+    def normalize_message(message):
+        """'  Best food in AGRA?? ' and 'best food in agra' share a cache entry"""
+        msg = re.sub(r'\s+', ' ', (message or '').lower()).strip()
+        return msg.rstrip('?!.。 ')
+
+    @staticmethod
+    def profile_fingerprint(profile_data, user_id=None):
+        """Only the profile fields that reach the prompt affect the answer"""
+        fingerprint = {'user_id': user_id}
+        if profile_data and profile_data.get('isProfileActive'):
+            for field in ['name', 'language', 'interests', 'responseStyle', 'homeState']:
+                fingerprint[field] = profile_data.get(field)
+        return fingerprint
+
+    @staticmethod
+    def history_fingerprint(history, turns=3):
+        """The turns build_prompt() puts into the prompt, normalized like the message"""
+        return [
+            [turn.get('role'), ResponseCache.normalize_message(turn.get('content'))]
+            for turn in (history or [])[-turns:] if isinstance(turn, dict)
+        ]
+
+    def make_key(self, message, intent, location_context, profile_data, model, user_id=None, history=None):
+        """Stable key over the normalized prompt inputs, including the recent conversation history"""
+        location_context = location_context or {}
+        parts = [
+            self.normalize_message(message),
+            intent,
+            location_context.get('city'),
+            location_context.get('state'),
+            self.profile_fingerprint(profile_data, user_id),
+            model,
+            self.history_fingerprint(history)
+        ]
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached response or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                # Kept until evicted or replaced so get_stale() can still serve it under load
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def get_stale(self, key):
+        """Return a response even if its TTL has passed (for degraded answers under load), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._stats['stale_served'] += 1
+            return entry[0]
+
+    def set(self, key, value, intent=None):
+        """Store a response using the TTL configured for its intent (0 disables caching for it)"""
+        ttl = self.ttls.get(intent, self.default_ttl)
+        if ttl <= 0 or not value:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        return stats
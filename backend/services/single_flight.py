@@ -0,0 +1,172 @@
+import threading
+from services.cancellation import CancelToken, GenerationCancelled
+
+
+class _Call:
+    """One in-flight blocking call and the callers waiting on it"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.token = CancelToken()  # cancelled once every caller has given up
+        self.waiters = 0
+
+
+class _StreamCall:
+    """One in-flight streaming call; chunks are buffered so late joiners replay from the start"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.token = CancelToken()
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one execution that every caller shares.
+
+    fn receives a CancelToken for the shared execution. A caller passes its own token as cancel;
+    cancelling it detaches that caller, and the shared token is cancelled when nobody is left.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._stats = {'executed': 0, 'coalesced': 0, 'stream_executed': 0, 'stream_coalesced': 0, 'abandoned': 0}
+
+    def do(self, key, fn, cancel=None):
+        """Run fn(token) once for all concurrent callers with the same key and return its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            # A call everyone abandoned is on its way out; start afresh rather than inherit its cancellation
+            leader = call is None or call.token.cancelled
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['executed'] += 1
+            else:
+                self._stats['coalesced'] += 1
+            call.waiters += 1
+        detach = cancel.on_cancel(lambda: self._leave(call)) if cancel is not None else None
+
+        if not leader:
+            try:
+                while not call.event.wait(0.2):
+                    if cancel is not None and cancel.cancelled:
+                        raise GenerationCancelled(cancel.reason)
+            finally:
+                if detach:
+                    detach()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(call.token)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            if isinstance(e, GenerationCancelled) and cancel is not None and cancel.cancelled:
+                raise GenerationCancelled(cancel.reason) from None  # report why this caller left
+            raise
+        finally:
+            if detach:
+                detach()
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+
+    def _leave(self, call):
+        with self._lock:
+            call.waiters -= 1
+            abandoned = call.waiters == 0 and not call.event.is_set()
+            if abandoned:
+                self._stats['abandoned'] += 1
+        if abandoned:
+            call.token.cancel('abandoned')
+
+    def stream(self, key, fn, cancel=None):
+        """Iterate fn(token)'s chunks, sharing one producer among concurrent callers with the same key.
+
+        A caller joins on its first next(), so a stream that is never iterated does not keep the
+        shared generation alive after every reader has left.
+        """
+        with self._lock:
+            call = self._streams.get(key)
+            if call is None or call.token.cancelled:
+                call = _StreamCall()
+                self._streams[key] = call
+                self._stats['stream_executed'] += 1
+                producer = threading.Thread(target=self._produce, args=(key, call, fn), daemon=True)
+                producer.start()
+            else:
+                self._stats['stream_coalesced'] += 1
+            with call.cond:
+                call.subscribers += 1
+        yield from self._follow(call, cancel)
+
+    def _produce(self, key, call, fn):
+        try:
+            for chunk in fn(call.token):
+                with call.cond:
+                    call.chunks.append(chunk)
+                    call.cond.notify_all()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                if self._streams.get(key) is call:
+                    del self._streams[key]
+            with call.cond:
+                call.done = True
+                call.cond.notify_all()
+
+    def _follow(self, call, cancel=None):
+        index = 0
+        wake = cancel.on_cancel(lambda: self._notify(call)) if cancel is not None else None
+        try:
+            while True:
+                with call.cond:
+                    while index >= len(call.chunks) and not call.done:
+                        if cancel is not None and cancel.cancelled:
+                            raise GenerationCancelled(cancel.reason)
+                        call.cond.wait()
+                    if index < len(call.chunks):
+                        batch = call.chunks[index:]
+                        index = len(call.chunks)
+                    elif call.error is not None:
+                        raise call.error
+                    else:
+                        return
+                for chunk in batch:
+                    yield chunk
+        finally:
+            if wake:
+                wake()
+            with call.cond:
+                call.subscribers -= 1
+                abandoned = call.subscribers == 0 and not call.done
+            if abandoned:
+                # Nobody is reading any more (client gone or superseded); stop the upstream generation
+                with self._lock:
+                    self._stats['abandoned'] += 1
+                call.token.cancel('abandoned')
+
+    @staticmethod
+    def _notify(call):
+        with call.cond:
+            call.cond.notify_all()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls) + len(self._streams)
+        total = stats['executed'] + stats['coalesced'] + stats['stream_executed'] + stats['stream_coalesced']
+        coalesced = stats['coalesced'] + stats['stream_coalesced']
+        stats['coalesced_ratio'] = round(coalesced / total, 3) if total else 0.0
+        return stats
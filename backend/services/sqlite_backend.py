@@ -0,0 +1,233 @@
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+from config import Config
+from services.db_pool import ConnectionPool, get_or_create_pool
+
+# Embedded storage for DatabaseService and UserService (DB_BACKEND=sqlite): the same MySQL-dialect
+# queries and schema, translated on the fly, over a pool of WAL-mode connections to one file.
+# WAL lets readers run alongside the single writer, which is all the chat hot path needs.
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database_setup.sql')
+
+CREATE_TABLE = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.IGNORECASE)
+ENUM_COLUMN = re.compile(r'\b(\w+)\s+ENUM\s*\(([^)]*)\)', re.IGNORECASE)
+ENUM_VALUE = re.compile(r"'((?:[^']|'')*)'")
+INTERVAL_DEFAULT = re.compile(r'\(\s*CURRENT_TIMESTAMP\s*\+\s*INTERVAL\s+(\d+)\s+(SECOND|MINUTE|HOUR|DAY)\s*\)', re.IGNORECASE)
+SKIPPED_STATEMENT = re.compile(r'^\s*(CREATE\s+DATABASE|USE)\b', re.IGNORECASE)
+UPSERT = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE)
+FOREIGN_KEY = re.compile(r'\bFOREIGN\s+KEY\s*\((\w+)\)', re.IGNORECASE)
+
+def enum_collation(table, column):
+    return f"enum_{table}_{column}".lower()
+
+def translate_create_table(statement):
+    """MySQL CREATE TABLE -> SQLite. ENUM columns become TEXT with a CHECK and a collation that
+    sorts in declaration order, the way MySQL orders ENUMs"""
+    table = CREATE_TABLE.match(statement).group(1)
+
+    def enum_column(match):
+        column, values = match.group(1), match.group(2)
+        # The CHECK compares bytes; with the column's collation every write would call back into Python
+        return f"{column} TEXT COLLATE {enum_collation(table, column)} CHECK ({column} COLLATE BINARY IN ({values}))"
+
+    statement = ENUM_COLUMN.sub(enum_column, statement)
+    statement = re.sub(r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', statement, flags=re.IGNORECASE)
+    # SQLite has no ON UPDATE; updated_at keeps its insert time
+    statement = re.sub(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b', '', statement, flags=re.IGNORECASE)
+    statement = INTERVAL_DEFAULT.sub(lambda m: f"(datetime('now', '+{m.group(1)} {m.group(2).lower()}s'))", statement)
+    return re.sub(r'\bJSON\b', 'TEXT', statement)
+
+def foreign_key_indexes(statement):
+    """CREATE INDEX statements for the foreign key columns of a CREATE TABLE. MySQL indexes
+    these implicitly; SQLite does not, and the user_preferences join would scan without one"""
+    table = CREATE_TABLE.match(statement).group(1)
+    return [f"CREATE INDEX IF NOT EXISTS idx_{table}_{column}_fk ON {table} ({column})"
+            for column in FOREIGN_KEY.findall(statement)]
+
+@lru_cache(maxsize=1024)
+def translate(statement):
+    """One MySQL-dialect statement as SQLite runs it, or None for statements with no SQLite
+    counterpart (CREATE DATABASE, USE)"""
+    statement = '\n'.join(line for line in statement.splitlines() if not line.strip().startswith('--'))
+    if SKIPPED_STATEMENT.match(statement):
+        return None
+    if CREATE_TABLE.match(statement):
+        statement = translate_create_table(statement)
+    statement = re.sub(r'^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+(?!IF\b)', lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS ", statement, flags=re.IGNORECASE)
+    statement = re.sub(r'^\s*DROP\s+INDEX\s+(\w+)\s+ON\s+\w+\s*$', r'DROP INDEX IF EXISTS \1', statement, flags=re.IGNORECASE)
+    # Upserts: SQLite names the conflicting row's new values excluded.<column>
+    upsert = UPSERT.search(statement)
+    if upsert:
+        updates = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', statement[upsert.end():], flags=re.IGNORECASE)
+        statement = f"{statement[:upsert.start()]}ON CONFLICT DO UPDATE SET{updates}"
+    statement = re.sub(r'\bNOW\(\)', "datetime('now')", statement, flags=re.IGNORECASE)
+    return statement.replace("\\'", "''").replace('%s', '?')
+
+@lru_cache(maxsize=None)
+def enum_columns(schema_file=SCHEMA_FILE):
+    """{collation name: [values in declaration order]} for every ENUM column of the schema"""
+    from migrate import split_statements
+
+    with open(schema_file, 'r', encoding='utf-8') as file:
+        statements = split_statements(file.read())
+    collations = {}
+    for statement in statements:
+        match = CREATE_TABLE.match(statement)
+        if not match:
+            continue
+        for column, values in ENUM_COLUMN.findall(statement):
+            collations[enum_collation(match.group(1), column)] = [value.replace("''", "'") for value in ENUM_VALUE.findall(values)]
+    return collations
+
+def enum_comparator(values):
+    order = {value: i for i, value in enumerate(values)}
+
+    def compare(a, b):
+        a, b = order.get(a, len(order)), order.get(b, len(order))
+        return (a > b) - (a < b)
+    return compare
+
+def _parse_timestamp(raw):
+    text = raw.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+def _parse_date(raw):
+    text = raw.decode()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return text
+
+sqlite3.register_converter('TIMESTAMP', _parse_timestamp)
+sqlite3.register_converter('DATE', _parse_date)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' ', 'seconds'))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+
+
+class SQLiteCursor:
+    """The slice of mysql.connector's cursor the services use, translating each statement"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self.dictionary = dictionary
+
+    def execute(self, query, params=()):
+        statement = translate(query)
+        if statement is not None:
+            self._cursor.execute(statement, tuple(params or ()))
+
+    def executemany(self, query, rows):
+        statement = translate(query)
+        if statement is not None:
+            self._cursor.executemany(statement, (tuple(row) for row in rows))
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self.dictionary or not rows:
+            return rows
+        columns = [column[0] for column in self._cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """A WAL-mode SQLite connection that quacks like a mysql.connector connection for ConnectionPool"""
+
+    def __init__(self, path, busy_timeout=None):
+        busy_timeout = Config.SQLITE_BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+        # Pooled connections move between threads, but only one thread uses a connection at a time
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        for name, values in enum_columns().items():
+            self._conn.create_collation(name, enum_comparator(values))
+        self._closed = False
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def is_connected(self):
+        if self._closed:
+            return False
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._closed = True
+        self._conn.close()
+
+
+def connect(path=None):
+    return SQLiteConnection(path or Config.SQLITE_PATH)
+
+def ensure_schema(path=None):
+    """Create the tables from database_setup.sql and apply the migrations, if not done yet"""
+    from migrate import apply_migrations, split_statements
+
+    with open(SCHEMA_FILE, 'r', encoding='utf-8') as file:
+        statements = [statement for statement in split_statements(file.read()) if CREATE_TABLE.match(statement)]
+    connection = connect(path)
+    try:
+        cursor = connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+            for index in foreign_key_indexes(statement):
+                cursor.execute(index)
+        connection.commit()
+        cursor.close()
+        apply_migrations(connection)
+    finally:
+        connection.close()
+
+def get_sqlite_pool(path=None):
+    """Process-wide pool for the SQLite file, creating the file's schema on first use"""
+    path = os.path.abspath(path or Config.SQLITE_PATH)
+
+    def create():
+        ensure_schema(path)
+        return ConnectionPool(
+            {'path': path},
+            size=Config.DB_POOL_SIZE,
+            acquire_timeout=Config.DB_POOL_TIMEOUT,
+            health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL,
+            connect=connect
+        )
+    return get_or_create_pool(f"sqlite:{path}", create)
@@ -1,10 +1,15 @@
-import mysql.connector
-from mysql.connector import Error
 import hashlib
 import secrets
 import uuid
 from datetime import datetime, timedelta
-from services.database_service import DatabaseService
+from services.database_service import DatabaseService, DATABASE_ERRORS, is_duplicate_entry
+from services.fan_out import fan_out
+
+def top_matches(rows, field, value, limit=5):
+    """First `limit` rows whose field equals value; None when the rows could not be loaded"""
+    if rows is None:
+        return None
+    return [row for row in rows if row.get(field) == value][:limit]
 
 class UserService(DatabaseService):
     def __init__(self):
@@ -13,10 +18,6 @@ class UserService(DatabaseService):
     def create_guest_session(self, ip_address=None, user_agent=None):
         """Create a guest session"""
         try:
-            if not self.connection or not self.connection.is_connected():
-                if not self.connect():
-                    return None
-            
             session_token = str(uuid.uuid4())
             
             query = """
@@ -24,12 +25,13 @@ class UserService(DatabaseService):
             VALUES (%s, %s, %s)
             """
             
-            cursor = self.connection.cursor()
-            cursor.execute(query, (session_token, ip_address, user_agent))
-            self.connection.commit()
-            
-            guest_id = cursor.lastrowid
-            cursor.close()
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(query, (session_token, ip_address, user_agent))
+                connection.commit()
+                
+                guest_id = cursor.lastrowid
+                cursor.close()
             
             return {
                 'guest_id': guest_id,
@@ -37,7 +39,7 @@ class UserService(DatabaseService):
                 'user_type': 'guest'
             }
             
-        except Error as e:
+        except DATABASE_ERRORS as e:
             print(f"Guest session creation error: {e}")
             return None
     
@@ -60,54 +62,51 @@ class UserService(DatabaseService):
     def create_user(self, user_data):
         """Create a new user account"""
         try:
-            if not self.connection or not self.connection.is_connected():
-                if not self.connect():
-                    return None
-            
-            # Insert user data
-            user_query = """
-            INSERT INTO users (first_name, middle_name, last_name, dob, email, mobile, pin_code, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor = self.connection.cursor()
-            cursor.execute(user_query, (
-                user_data.get('first_name'),
-                user_data.get('middle_name'),
-                user_data.get('last_name'),
-                user_data.get('dob'),
-                user_data.get('email'),
-                user_data.get('mobile'),
-                user_data.get('pin_code'),
-                user_data.get('address')
-            ))
-            
-            user_id = cursor.lastrowid
-            
-            # Create auth entries
-            if user_data.get('email'):
-                auth_query = """
-                INSERT INTO user_auth (user_id, login_type, login_identifier, is_verified)
-                VALUES (%s, 'email', %s, FALSE)
+            with self.pool.connection() as connection:
+                # Insert user data
+                user_query = """
+                INSERT INTO users (first_name, middle_name, last_name, dob, email, mobile, pin_code, address)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 """
-                cursor.execute(auth_query, (user_id, user_data.get('email')))
-            
-            if user_data.get('mobile'):
-                auth_query = """
-                INSERT INTO user_auth (user_id, login_type, login_identifier, is_verified)
-                VALUES (%s, 'mobile', %s, FALSE)
+                
+                cursor = connection.cursor()
+                cursor.execute(user_query, (
+                    user_data.get('first_name'),
+                    user_data.get('middle_name'),
+                    user_data.get('last_name'),
+                    user_data.get('dob'),
+                    user_data.get('email'),
+                    user_data.get('mobile'),
+                    user_data.get('pin_code'),
+                    user_data.get('address')
+                ))
+                
+                user_id = cursor.lastrowid
+                
+                # Create auth entries
+                if user_data.get('email'):
+                    auth_query = """
+                    INSERT INTO user_auth (user_id, login_type, login_identifier, is_verified)
+                    VALUES (%s, 'email', %s, FALSE)
+                    """
+                    cursor.execute(auth_query, (user_id, user_data.get('email')))
+                
+                if user_data.get('mobile'):
+                    auth_query = """
+                    INSERT INTO user_auth (user_id, login_type, login_identifier, is_verified)
+                    VALUES (%s, 'mobile', %s, FALSE)
+                    """
+                    cursor.execute(auth_query, (user_id, user_data.get('mobile')))
+                
+                # Create default preferences
+                pref_query = """
+                INSERT INTO user_preferences (user_id, preferred_city, language_preference)
+                VALUES (%s, 'Agra', 'hinglish')
                 """
-                cursor.execute(auth_query, (user_id, user_data.get('mobile')))
-            
-            # Create default preferences
-            pref_query = """
-            INSERT INTO user_preferences (user_id, preferred_city, language_preference)
-            VALUES (%s, 'Agra', 'hinglish')
-            """
-            cursor.execute(pref_query, (user_id,))
-            
-            self.connection.commit()
-            cursor.close()
+                cursor.execute(pref_query, (user_id,))
+                
+                connection.commit()
+                cursor.close()
             
             return {
                 'user_id': user_id,
@@ -115,10 +114,10 @@ class UserService(DatabaseService):
                 'user_type': 'registered'
             }
             
-        except Error as e:
+        except DATABASE_ERRORS as e:
             print(f"User creation error: {e}")
-            # Handle MySQL duplicate entry errors specifically
-            if e.errno == 1062:  # MySQL duplicate entry error code
+            # Handle duplicate entry errors specifically
+            if is_duplicate_entry(e):
                 error_msg = str(e)
                 if 'email' in error_msg:
                     raise Exception("DUPLICATE_EMAIL")
@@ -149,13 +148,11 @@ class UserService(DatabaseService):
                 UPDATE user_auth SET last_login = NOW() 
                 WHERE auth_id = %s
                 """
-                if not self.connection or not self.connection.is_connected():
-                    self.connect()
-                
-                cursor = self.connection.cursor()
-                cursor.execute(update_query, (user_data['auth_id'],))
-                self.connection.commit()
-                cursor.close()
+                with self.pool.connection() as connection:
+                    cursor = connection.cursor()
+                    cursor.execute(update_query, (user_data['auth_id'],))
+                    connection.commit()
+                    cursor.close()
                 
                 return {
                     'user_id': user_data['user_id'],
@@ -195,61 +192,58 @@ class UserService(DatabaseService):
     def update_user_profile(self, user_id, profile_data):
         """Update user profile information"""
         try:
-            if not self.connection or not self.connection.is_connected():
-                if not self.connect():
-                    return False
-            
-            cursor = self.connection.cursor()
-            
-            # Update user basic info
-            if any(key in profile_data for key in ['first_name', 'middle_name', 'last_name', 'email', 'mobile', 'pin_code', 'address']):
-                user_fields = []
-                user_values = []
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
                 
-                for field in ['first_name', 'middle_name', 'last_name', 'email', 'mobile', 'pin_code', 'address']:
-                    if field in profile_data:
-                        user_fields.append(f"{field} = %s")
-                        user_values.append(profile_data[field])
-                
-                if user_fields:
-                    user_query = f"UPDATE users SET {', '.join(user_fields)} WHERE user_id = %s"
-                    user_values.append(user_id)
-                    cursor.execute(user_query, user_values)
-            
-            # Update preferences
-            pref_keys = ['preferred_city', 'food_preferences', 'budget_range', 'travel_style', 'language_preference', 'tone_preference', 'interests', 'ui_preferences']
-            if any(key in profile_data for key in pref_keys):
-                pref_fields = []
-                pref_values = []
-                
-                for field in pref_keys:
-                    if field in profile_data:
-                        pref_fields.append(f"{field} = %s")
-                        pref_values.append(profile_data[field])
+                # Update user basic info
+                if any(key in profile_data for key in ['first_name', 'middle_name', 'last_name', 'email', 'mobile', 'pin_code', 'address']):
+                    user_fields = []
+                    user_values = []
+                    
+                    for field in ['first_name', 'middle_name', 'last_name', 'email', 'mobile', 'pin_code', 'address']:
+                        if field in profile_data:
+                            user_fields.append(f"{field} = %s")
+                            user_values.append(profile_data[field])
+                    
+                    if user_fields:
+                        user_query = f"UPDATE users SET {', '.join(user_fields)} WHERE user_id = %s"
+                        user_values.append(user_id)
+                        cursor.execute(user_query, user_values)
                 
-                if pref_fields:
-                    # Check if preferences exist
-                    check_query = "SELECT pref_id FROM user_preferences WHERE user_id = %s"
-                    cursor.execute(check_query, (user_id,))
-                    exists = cursor.fetchone()
+                # Update preferences
+                pref_keys = ['preferred_city', 'food_preferences', 'budget_range', 'travel_style', 'language_preference', 'tone_preference', 'interests', 'ui_preferences']
+                if any(key in profile_data for key in pref_keys):
+                    pref_fields = []
+                    pref_values = []
                     
-                    if exists:
-                        pref_query = f"UPDATE user_preferences SET {', '.join(pref_fields)} WHERE user_id = %s"
-                        pref_values.append(user_id)
-                        cursor.execute(pref_query, pref_values)
-                    else:
-                        # Create new preferences record
-                        pref_fields.append("user_id")
-                        pref_values.append(user_id)
-                        placeholders = ', '.join(['%s'] * len(pref_values))
-                        pref_query = f"INSERT INTO user_preferences ({', '.join(pref_fields.replace(' = %s', ''))}) VALUES ({placeholders})"
-                        cursor.execute(pref_query, pref_values)
-            
-            self.connection.commit()
-            cursor.close()
+                    for field in pref_keys:
+                        if field in profile_data:
+                            pref_fields.append(f"{field} = %s")
+                            pref_values.append(profile_data[field])
+                    
+                    if pref_fields:
+                        # Check if preferences exist
+                        check_query = "SELECT pref_id FROM user_preferences WHERE user_id = %s"
+                        cursor.execute(check_query, (user_id,))
+                        exists = cursor.fetchone()
+                        
+                        if exists:
+                            pref_query = f"UPDATE user_preferences SET {', '.join(pref_fields)} WHERE user_id = %s"
+                            pref_values.append(user_id)
+                            cursor.execute(pref_query, pref_values)
+                        else:
+                            # Create new preferences record
+                            pref_fields.append("user_id")
+                            pref_values.append(user_id)
+                            placeholders = ', '.join(['%s'] * len(pref_values))
+                            pref_query = f"INSERT INTO user_preferences ({', '.join(field.replace(' = %s', '') for field in pref_fields)}) VALUES ({placeholders})"
+                            cursor.execute(pref_query, pref_values)
+                
+                connection.commit()
+                cursor.close()
             return True
             
-        except Error as e:
+        except DATABASE_ERRORS as e:
             print(f"Profile update error: {e}")
             return False
     
@@ -297,16 +291,6 @@ class UserService(DatabaseService):
             budget_range = profile.get('budget_range', 'mid_range')
             travel_style = profile.get('travel_style', 'solo')
             
-            # Get restaurants based on budget preference
-            restaurant_query = """
-            SELECT * FROM restaurants_streetfood 
-            WHERE city_name = %s AND category = %s
-            ORDER BY popularity DESC
-            LIMIT 5
-            """
-            
-            restaurants = self.execute_query(restaurant_query, (city_name, budget_range))
-            
             # Get places based on travel style
             if travel_style == 'family':
                 place_importance = 'must_visit'
@@ -315,14 +299,15 @@ class UserService(DatabaseService):
             else:
                 place_importance = 'must_visit'
             
-            places_query = """
-            SELECT * FROM tourist_places 
-            WHERE city_name = %s AND importance = %s
-            ORDER BY importance DESC
-            LIMIT 5
-            """
-            
-            places = self.execute_query(places_query, (city_name, place_importance))
+            # Restaurants in the user's budget and places matching their travel style, picked from
+            # the city's cached reference rows (already ordered by popularity and importance).
+            # On a cache miss both tables load side by side
+            results = fan_out.run({
+                'restaurants': lambda: self.get_restaurants_by_city(city_name),
+                'places': lambda: self.get_places_to_visit(city_name)
+            })
+            restaurants = top_matches(results['restaurants'], 'category', budget_range)
+            places = top_matches(results['places'], 'importance', place_importance)
             
             return {
                 'restaurants': restaurants,
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from config import Config
+from services.async_ollama_client import AsyncOllamaClient
+from services.generation_scheduler import GenerationScheduler
+from services.ollama_client import OllamaClient
+
+ANSWER = "Namaste! Agra mein Taj Mahal zaroor dekhiye."
+
+
+@pytest.fixture
+def asgi_app(stub_services):
+    from asgi import create_asgi_app
+    return create_asgi_app()
+
+
+def question(i=0, **extra):
+    return {'message': f"Jaipur ke bare mein kuch batao, sawaal {i}", 'force_llm': True, 'bypass_cache': True, **extra}
+
+
+def post(app, path, body):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as http:
+            return await http.post(path, json=body)
+    return asyncio.run(run())
+
+
+def test_chat_and_stream_answer_from_ollama(asgi_app):
+    body = post(asgi_app, '/api/chat/', question()).json()
+    assert body['tier'] == 'llm' and body['response'] == ANSWER
+
+    stream = post(asgi_app, '/api/chat/stream', question(1)).text
+    assert 'event: token' in stream and stream.rstrip().splitlines()[0] == 'event: token'
+    assert '"tier": "llm"' in stream.split('event: done')[1]
+
+
+def test_voice_deadline_falls_back_to_a_template(asgi_app, stub_ollama, monkeypatch):
+    stub_ollama.stall = 2.0
+    monkeypatch.setattr(Config, 'CHAT_DEADLINES', {'text': 60, 'voice': 0.5})
+    monkeypatch.setattr(Config, 'CHAT_GENERATION_RESERVES', {'text': 20, 'voice': 0.4})
+    monkeypatch.setattr(Config, 'CHAT_MIN_GENERATION_SECONDS', 0.1)
+
+    started = time.monotonic()
+    body = post(asgi_app, '/api/chat/', question(mode='voice')).json()
+
+    assert body['tier'] == 'degraded' and body['response']
+    assert time.monotonic() - started < 1.5
+
+
+def test_queued_generations_wait_without_threads(stub_ollama):
+    stub_ollama.stall = 0.3
+    client = OllamaClient(model="llama3", scheduler=GenerationScheduler(max_concurrent=2, max_queue=64), hosts=[stub_ollama.host])
+    async_client = AsyncOllamaClient(client)
+    threads_before = threading.active_count()
+    peak = {'threads': 0, 'queued': 0}
+
+    async def run():
+        tasks = [asyncio.ensure_future(async_client.generate(f"Prompt {i}")) for i in range(20)]
+        while not all(task.done() for task in tasks):
+            peak['threads'] = max(peak['threads'], threading.active_count() - threads_before)
+            peak['queued'] = max(peak['queued'], client.scheduler.stats()['queue_depth'])
+            await asyncio.sleep(0.02)
+        await async_client.aclose()
+        return [task.result()['response'] for task in tasks]
+
+    replies = asyncio.run(run())
+
+    assert replies == [ANSWER] * 20
+    assert peak['queued'] >= 10
+    # Only the stub's own handler threads; none are parked waiting for a scheduler slot
+    assert peak['threads'] <= 2 * 2
+    assert stub_ollama.stats()['max_in_flight'] == 2
+
+
+def test_each_event_loop_gets_its_own_http_client():
+    client = AsyncOllamaClient(OllamaClient(model="llama3", hosts=["http://127.0.0.1:9"]))
+
+    async def current():
+        return client._get_http()
+
+    first, second = asyncio.run(current()), asyncio.run(current())
+    assert first is not second
+    # The first loop is gone, so its client was let go rather than kept next to the new one
+    assert list(client._http.values()) == [second]
+
+    async def close():
+        http = client._get_http()
+        assert client._get_http() is http
+        await client.aclose()
+        return http
+    assert asyncio.run(close()).is_closed
+    assert not client._http
+
+
+def test_a_cancelled_wait_for_a_full_backend_hands_the_backend_back(monkeypatch):
+    monkeypatch.setattr(Config, 'OLLAMA_MAX_CONCURRENT', 1)
+    monkeypatch.setattr(Config, 'OLLAMA_HEALTH_INTERVAL', 0)
+    client = AsyncOllamaClient(OllamaClient(model="llama3", hosts=["http://127.0.0.1:9"]))
+    [backend] = client.pool.backends
+    held = client.pool.checkout()
+
+    async def run():
+        task = asyncio.ensure_future(client.generate("Prompt"))
+        while client.pool.stats()['waits'] == 0:
+            await asyncio.sleep(0.01)
+        # A disconnect or deadline cancels the request while a thread waits for the backend
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        client.pool.checkin(held)
+
+    # asyncio.run() returns once the waiting thread is done: it got the backend and handed it straight back
+    asyncio.run(run())
+    assert backend.in_flight == 0
+    assert client.pool.checkout(wait=False) is backend
@@ -0,0 +1,130 @@
+import json
+import shutil
+import sqlite3
+
+import pytest
+
+import bulk_load
+from config import Config
+from migrate import apply_migrations, discover, split_statements
+from services import sqlite_backend
+
+
+@pytest.fixture
+def connection(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_BACKEND', 'sqlite')
+    monkeypatch.setattr(Config, 'SQLITE_PATH', str(tmp_path / 'city_guide.sqlite3'))
+    monkeypatch.setattr(Config, 'REFERENCE_CACHE_STAMP', str(tmp_path / 'reference_data_version'))
+    conn = bulk_load.connect()
+    yield conn
+    conn.close()
+
+
+def query(connection, sql):
+    cursor = connection.cursor()
+    cursor.execute(sql)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def write_csv(path, lines):
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_csv_rows_are_validated_and_upserted_on_their_natural_key(connection, tmp_path):
+    path = write_csv(tmp_path / 'pois.csv', [
+        'name,category,importance,why_visit,source_id',
+        'Taj Mahal,monument,Must Visit,Symbol of love,1',
+        'Agra Fort,monument,recommended,Red sandstone fort,2',
+        'Mystery Spot,volcano,optional,,3',
+        ',park,optional,No name,4'
+    ])
+    source = bulk_load.file_source(path, 'tourist_places', mapping={'name': 'place_name'}, constants={'city_name': 'Agra'})
+    [result] = bulk_load.bulk_load(connection, [source])
+
+    assert (result['rows'], result['loaded'], result['rejected']) == (4, 2, 2)
+    assert query(connection, "SELECT place_name, importance FROM tourist_places ORDER BY place_name") == [
+        ('Agra Fort', 'recommended'), ('Taj Mahal', 'must_visit')
+    ]
+    rejects = [json.loads(line) for line in open(source.rejects_path, encoding='utf-8')]
+    assert [(r['row'], r['error'].split()[0]) for r in rejects] == [(3, 'category'), (4, 'missing')]
+
+    # The same file again is a no-op; an edited one updates rows in place
+    [again] = bulk_load.bulk_load(connection, [bulk_load.file_source(path, 'tourist_places', {'name': 'place_name'}, {'city_name': 'Agra'})])
+    assert (again['rows'], again['resumed']) == (0, 4)
+    path = write_csv(tmp_path / 'pois.csv', ['name,importance,why_visit', 'Taj Mahal,must_visit,Sunrise over the Yamuna'])
+    bulk_load.bulk_load(connection, [bulk_load.file_source(path, 'tourist_places', {'name': 'place_name'}, {'city_name': 'Agra'})])
+    assert query(connection, "SELECT place_name, category, why_visit FROM tourist_places ORDER BY place_name") == [
+        ('Agra Fort', 'monument', 'Red sandstone fort'), ('Taj Mahal', 'monument', 'Sunrise over the Yamuna')
+    ]
+
+
+def test_an_interrupted_load_resumes_after_the_last_committed_batch(connection, tmp_path):
+    path = tmp_path / 'restaurants_streetfood.jsonl'
+    path.write_text(''.join(json.dumps({'city_name': 'Agra', 'place_name': f"Dhaba {n}", 'popularity': 'high'}) + '\n'
+                            for n in range(25)), encoding='utf-8')
+    source = bulk_load.file_source(str(path))
+
+    def failing_records(skip):
+        for n, row in enumerate(source.records(skip)):
+            if n == 17:
+                raise OSError("connection to the dump server lost")
+            yield row
+
+    with pytest.raises(OSError):
+        bulk_load.bulk_load(connection, [source._replace(records=failing_records)], batch_size=5, defer_indexes=True)
+    assert query(connection, "SELECT COUNT(*) FROM restaurants_streetfood") == [(15,)]
+    # The deferred index came back even though the load failed
+    assert query(connection, "SELECT name FROM sqlite_master WHERE name = 'idx_restaurants_city_category_popularity'")
+
+    [result] = bulk_load.bulk_load(connection, [source], batch_size=5)
+    assert (result['resumed'], result['rows'], result['loaded']) == (15, 10, 10)
+    assert query(connection, "SELECT COUNT(*), COUNT(DISTINCT place_name) FROM restaurants_streetfood") == [(25, 25)]
+
+
+def test_the_load_leaves_indexes_alone_unless_told_to_defer_them(connection, tmp_path, monkeypatch):
+    dropped = []
+    monkeypatch.setattr(bulk_load, 'drop_indexes', lambda conn, table: dropped.append(table))
+    path = write_csv(tmp_path / 'accommodation.csv', ['city_name,area_name', 'Agra,Taj Ganj'])
+    bulk_load.bulk_load(connection, [bulk_load.file_source(path)])
+    assert dropped == []
+    bulk_load.bulk_load(connection, [bulk_load.file_source(path)], defer_indexes=True)
+    assert dropped == ['accommodation']
+
+
+def test_duplicates_fail_the_natural_key_migration_until_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'REFERENCE_CACHE_STAMP', str(tmp_path / 'reference_data_version'))
+    # A database from before migration 002, when setup scripts could insert a row twice
+    before = tmp_path / 'migrations'
+    before.mkdir()
+    shutil.copy(discover()[0][2], before)
+    conn = sqlite_backend.connect(str(tmp_path / 'city_guide.sqlite3'))
+    cursor = conn.cursor()
+    with open(sqlite_backend.SCHEMA_FILE, 'r', encoding='utf-8') as file:
+        for statement in split_statements(file.read()):
+            if sqlite_backend.CREATE_TABLE.match(statement):
+                cursor.execute(statement)
+    conn.commit()
+    apply_migrations(conn, str(before))
+    cursor.executemany("INSERT INTO places_history (city_name, place_name, historical_importance) VALUES (%s, %s, %s)", [
+        ('Agra', 'Taj Mahal', 'first'), ('Agra', 'Agra Fort', None), ('Agra', 'Taj Mahal', 'second')
+    ])
+    conn.commit()
+    cursor.close()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        apply_migrations(conn)
+    # Nothing was deleted, and the table kept its old index
+    assert query(conn, "SELECT COUNT(*) FROM places_history") == [(3,)]
+    assert query(conn, "SELECT name FROM sqlite_master WHERE name = 'idx_places_history_city_place'")
+
+    assert bulk_load.remove_duplicates(conn, str(tmp_path)) == {'places_history': 1}
+    [removed] = [json.loads(line) for line in open(tmp_path / 'places_history.duplicates.jsonl', encoding='utf-8')]
+    assert (removed['place_name'], removed['historical_importance']) == ('Taj Mahal', 'second')
+    assert apply_migrations(conn) == [2]
+    assert query(conn, "SELECT place_name, historical_importance FROM places_history ORDER BY id") == [
+        ('Taj Mahal', 'first'), ('Agra Fort', None)
+    ]
+    conn.close()
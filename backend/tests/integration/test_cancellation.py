@@ -0,0 +1,118 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+from config import Config
+from services.cancellation import ActiveRequests, GenerationCancelled
+from services.metrics import metrics
+from services.ollama_client import OllamaClient
+
+pytestmark = pytest.mark.stub_ollama(token_delay=0.05, stall=2.0)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_newer_message_supersedes_the_running_generation(stub_ollama):
+    client = OllamaClient(model="llama3", hosts=[stub_ollama.host])
+    active = ActiveRequests(poll_interval=0)
+    first = active.begin('conv-1')
+    errors = []
+
+    def run():
+        try:
+            client.generate("First question", generation={'cancel': first})
+        except GenerationCancelled as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    assert wait_for(lambda: stub_ollama.stats()['in_flight'] == 1)
+    started = time.monotonic()
+    second = active.begin('conv-1')
+    worker.join(timeout=5)
+
+    assert [e.reason for e in errors] == ['superseded']
+    assert time.monotonic() - started < 1.0
+    assert not second.cancelled
+    assert active.stats()['superseded'] == 1
+    # The Ollama connection was dropped rather than left generating
+    assert wait_for(lambda: stub_ollama.stats()['disconnects'] == 1)
+
+
+def test_coalesced_generation_survives_one_caller_leaving(stub_ollama):
+    client = OllamaClient(model="llama3", hosts=[stub_ollama.host])
+    stub_ollama.stall = 0.5
+    leaving = ActiveRequests(poll_interval=0).begin('conv-1')
+    results = {}
+
+    def run(name, cancel):
+        try:
+            results[name] = client.generate("Same question", generation={'cancel': cancel})['response']
+        except GenerationCancelled as e:
+            results[name] = e.reason
+
+    workers = [threading.Thread(target=run, args=('staying', None)), threading.Thread(target=run, args=('leaving', leaving))]
+    workers[0].start()
+    assert wait_for(lambda: stub_ollama.stats()['in_flight'] == 1)
+    workers[1].start()
+    assert wait_for(lambda: client.single_flight.stats()['coalesced'] == 1)
+    leaving.cancel('disconnected')
+    for worker in workers:
+        worker.join(timeout=5)
+
+    assert results['leaving'] == 'disconnected'
+    assert results['staying'] == "Namaste! Agra mein Taj Mahal zaroor dekhiye."
+    assert stub_ollama.stats()['requests'] == 1 and stub_ollama.stats()['disconnects'] == 0
+
+
+def test_client_disconnect_aborts_the_ollama_request(stub_app, stub_ollama, monkeypatch):
+    monkeypatch.setattr(Config, 'CHAT_DISCONNECT_POLL_INTERVAL', 0.1)
+    server = make_server('127.0.0.1', 0, stub_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cancelled_before = metrics.snapshot()['counters'].get('chat.cancelled.disconnected', 0)
+
+    try:
+        body = json.dumps({'message': 'Jaipur ke bare mein kuch batao please', 'force_llm': True, 'bypass_cache': True})
+        conn = socket.create_connection(('127.0.0.1', server.server_port))
+        conn.sendall((
+            "POST /api/chat/ HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n{body}"
+        ).encode('utf-8'))
+        assert wait_for(lambda: stub_ollama.stats()['in_flight'] == 1)
+        conn.close()
+
+        assert wait_for(lambda: stub_ollama.stats()['disconnects'] == 1, timeout=3.0)
+        counters = metrics.snapshot()['counters']
+        assert counters.get('chat.cancelled.disconnected', 0) == cancelled_before + 1
+    finally:
+        server.shutdown()
+
+
+def test_voice_deadline_falls_back_to_a_template(client, stub_ollama, monkeypatch):
+    monkeypatch.setattr(Config, 'CHAT_DEADLINES', {'text': 60, 'voice': 0.5})
+    monkeypatch.setattr(Config, 'CHAT_GENERATION_RESERVES', {'text': 20, 'voice': 0.4})
+    monkeypatch.setattr(Config, 'CHAT_MIN_GENERATION_SECONDS', 0.1)
+
+    started = time.monotonic()
+    response = client.post('/api/chat/', json={
+        'message': 'Jaipur ke bare mein kuch batao please', 'mode': 'voice', 'force_llm': True, 'bypass_cache': True
+    })
+    elapsed = time.monotonic() - started
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['tier'] == 'degraded' and body['response']
+    assert body['metrics']['deadline_ms'] == 500
+    assert elapsed < 1.5
+    assert wait_for(lambda: stub_ollama.stats()['disconnects'] == 1)
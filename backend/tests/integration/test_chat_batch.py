@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+ANSWER = "Namaste! Agra mein Taj Mahal zaroor dekhiye."
+
+pytestmark = pytest.mark.stub_ollama(token_delay=0.01)
+
+
+def run_batch(client, body):
+    res = client.post('/api/chat/batch', json=body)
+    assert res.status_code == 200 and res.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    return lines[:-1], lines[-1]
+
+
+def test_identical_questions_are_answered_once(client, stub_ollama):
+    items, summary = run_batch(client, {
+        'defaults': {'force_llm': True, 'bypass_cache': True},
+        'items': [
+            {'id': 'a', 'message': "Jaipur ke bare mein kuch batao"},
+            {'id': 'b', 'message': "Udaipur ke bare mein kuch batao"},
+            {'id': 'c', 'message': "  Jaipur ke bare   mein kuch batao"},
+            {'id': 'd', 'message': ""}
+        ]
+    })
+
+    by_id = {item['id']: item for item in items}
+    assert sorted(by_id) == ['a', 'b', 'c', 'd']
+    assert by_id['d']['status'] == 'error' and by_id['d']['code'] == 400
+    for item_id in 'abc':
+        assert by_id[item_id]['status'] == 'ok'
+        assert by_id[item_id]['result']['tier'] == 'llm' and by_id[item_id]['result']['response'] == ANSWER
+    assert by_id['b']['result']['location_context']['city'] == 'Udaipur'
+    assert summary == {**summary, 'done': True, 'items': 4, 'unique': 2, 'errors': 1}
+    assert stub_ollama.stats()['requests'] == 2
+
+
+def test_generations_stay_within_the_concurrency_limit(client, stub_ollama):
+    stub_ollama.stall = 0.2
+    items, summary = run_batch(client, {
+        'concurrency': 2,
+        'defaults': {'force_llm': True, 'bypass_cache': True},
+        'items': [{'id': i, 'message': f"Jaipur ke bare mein kuch batao, sawaal {i}"} for i in range(6)]
+    })
+
+    assert sorted(item['index'] for item in items) == list(range(6))
+    assert all(item['status'] == 'ok' for item in items)
+    assert summary['unique'] == 6 and summary['errors'] == 0
+    assert stub_ollama.stats()['max_in_flight'] == 2
@@ -0,0 +1,35 @@
+import pytest
+
+
+QUESTION = "Wahan ka best time kya hai?"
+TAJ_HISTORY = [{'role': 'user', 'content': "Taj Mahal ke baare mein batao"}, {'role': 'assistant', 'content': "Taj Mahal Agra mein hai."}]
+FORT_HISTORY = [{'role': 'user', 'content': "Agra Fort ke baare mein batao"}, {'role': 'assistant', 'content': "Agra Fort lal patthar ka hai."}]
+
+pytestmark = pytest.mark.stub_ollama(token_delay=0.001, reply=["Subah ", "jaldi jaiye."])
+
+
+def ask(client, conversation_id, history):
+    res = client.post('/api/chat/', json={
+        'message': QUESTION, 'conversation_id': conversation_id, 'history': history,
+        'location_context': {'city': 'Agra'}, 'force_llm': True
+    })
+    assert res.status_code == 200
+    return res.get_json()['tier']
+
+
+def test_conversations_with_different_history_do_not_share_cached_answers(client, stub_ollama):
+    assert ask(client, 'taj', TAJ_HISTORY) == 'llm'
+    assert ask(client, 'fort', FORT_HISTORY) == 'llm'
+    assert stub_ollama.stats()['requests'] == 2
+
+    # A new conversation that got here through the same turns can reuse the answer
+    assert ask(client, 'taj-again', TAJ_HISTORY) == 'cache'
+    assert stub_ollama.stats()['requests'] == 2
+
+
+def test_a_conversation_with_a_stored_context_skips_the_cache(client, stub_ollama):
+    assert ask(client, 'first', TAJ_HISTORY) == 'llm'
+    # 'second' asks the same thing after the same turns, but its stored Ollama context must survive
+    assert ask(client, 'second', []) == 'llm'
+    assert ask(client, 'second', TAJ_HISTORY) == 'llm'
+    assert stub_ollama.stats()['requests'] == 3
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from routes.chat import MapDataFilter
+
+# The map block starts mid-token and its marker and JSON arrive in separate chunks
+REPLY = ["Taj Mahal ", "subah dekhiye. [MA", "P_DAT", 'A: {"name": "Taj Mahal", ', '"lat": 27.17, "lng": 78.04}]']
+MAP_DATA = {'name': 'Taj Mahal', 'lat': 27.17, 'lng': 78.04}
+
+pytestmark = pytest.mark.stub_ollama(token_delay=0.01, reply=REPLY)
+
+
+def sse_events(body):
+    """[(event, data)] of an SSE body"""
+    events = []
+    for frame in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in frame.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_map_filter_holds_back_a_marker_split_across_tokens():
+    text = "Agra Fort dekhiye. [MAP_DATA: {}]"
+    for size in range(1, len(text) + 1):
+        map_filter = MapDataFilter()
+        shown = ''.join(map_filter.feed(text[i:i + size]) for i in range(0, len(text), size)) + map_filter.flush()
+        assert shown == "Agra Fort dekhiye. ", size
+
+    # A '[' that never becomes the marker is released when the stream ends
+    map_filter = MapDataFilter()
+    assert map_filter.feed("Entry fee [M") == "Entry fee "
+    assert map_filter.flush() == "[M"
+
+
+def test_stream_hides_the_map_block_and_ends_with_the_final_payload(client):
+    res = client.post('/api/chat/stream', json={'message': "Jaipur mein kya dekhein?", 'force_llm': True, 'bypass_cache': True})
+    assert res.status_code == 200 and res.mimetype == 'text/event-stream'
+    events = sse_events(res.get_data(as_text=True))
+
+    assert [event for event, _ in events[:-1]] == ['token'] * (len(events) - 1)
+    shown = ''.join(data['token'] for _, data in events[:-1])
+    assert shown == "Taj Mahal subah dekhiye. "
+
+    event, payload = events[-1]
+    assert event == 'done'
+    assert payload['tier'] == 'llm' and payload['status'] == 'success'
+    assert payload['response'] == "Taj Mahal subah dekhiye."
+    assert payload['map_data'] == MAP_DATA
+    assert payload['metrics']['ttft_ms'] <= payload['metrics']['total_ms']
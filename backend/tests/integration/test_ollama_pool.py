@@ -0,0 +1,194 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.stub_ollama import StubOllama
+from config import Config
+from services.async_ollama_client import AsyncOllamaClient
+from services.circuit_breaker import CircuitOpenError
+from services.generation_scheduler import GenerationScheduler
+from services.hedge_policy import HedgePolicy
+from services.ollama_client import OllamaClient
+
+
+@pytest.fixture
+def stubs():
+    servers = [StubOllama(token_delay=0.05).start() for _ in range(3)]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def make_client(stubs):
+    scheduler = GenerationScheduler(max_concurrent=2 * len(stubs), max_queue=32)
+    return OllamaClient(model="llama3", scheduler=scheduler, hosts=[stub.host for stub in stubs])
+
+
+def requests_per_stub(stubs):
+    return [stub.stats()['requests'] for stub in stubs]
+
+
+def test_concurrent_requests_spread_over_least_busy_backends(stubs):
+    client = make_client(stubs)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        # Distinct prompts so single-flight coalescing does not merge them
+        list(executor.map(lambda i: client.generate(f"Prompt {i}"), range(6)))
+
+    assert requests_per_stub(stubs) == [2, 2, 2]
+    assert all(stub.stats()['max_in_flight'] <= 2 for stub in stubs)
+
+
+def test_each_backend_is_held_to_its_own_concurrency_limit(stubs, monkeypatch):
+    monkeypatch.setattr(Config, 'OLLAMA_MAX_CONCURRENT', 2)
+    client = make_client(stubs)
+
+    # One busy conversation cannot pile more than the limit onto its home backend
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda i: client.generate(f"Prompt {i}", generation={'affinity_key': 'conv-1'}), range(6)))
+    assert all(stub.stats()['max_in_flight'] <= 2 for stub in stubs)
+    assert sum(requests_per_stub(stubs)) == 6
+
+    # With one backend down the scheduler still admits 6, and the pool makes the rest wait
+    for stub in stubs:
+        stub.reset_stats()
+    stubs[0].healthy = False
+    client.pool.check_health()
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda i: client.generate(f"Prompt {i}"), range(6)))
+    assert requests_per_stub(stubs)[0] == 0 and sum(requests_per_stub(stubs)) == 6
+    assert all(stub.stats()['max_in_flight'] <= 2 for stub in stubs)
+    assert client.pool.stats()['waits'] >= 2
+
+
+def test_conversation_sticks_to_one_backend(stubs):
+    client = make_client(stubs)
+
+    for turn in range(4):
+        client.generate(f"Turn {turn}", generation={'affinity_key': 'conv-1'})
+
+    assert sorted(requests_per_stub(stubs)) == [0, 0, 4]
+    assert client.pool.stats()['sticky'] == 3
+
+
+def test_unhealthy_backend_is_ejected_and_conversation_moves(stubs):
+    client = make_client(stubs)
+    client.generate("First turn", generation={'affinity_key': 'conv-1'})
+    home = next(stub for stub in stubs if stub.stats()['requests'])
+
+    home.healthy = False
+    client.pool.check_health()
+    for stub in stubs:
+        stub.reset_stats()
+
+    for turn in range(3):
+        client.generate(f"Turn {turn}", generation={'affinity_key': 'conv-1'})
+    for i in range(4):
+        client.generate(f"Other {i}")
+
+    assert home.stats()['requests'] == 0
+    assert sum(requests_per_stub(stubs)) == 7
+    assert client.pool.stats()['rerouted'] == 1
+
+
+def test_recovered_backend_rejoins_the_pool(stubs):
+    client = make_client(stubs)
+    stubs[0].healthy = False
+    client.pool.check_health()
+    assert not client.pool.backends[0].available
+
+    stubs[0].healthy = True
+    client.pool.check_health()
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda i: client.generate(f"Prompt {i}"), range(6)))
+
+    assert stubs[0].stats()['requests'] > 0
+
+
+def test_all_backends_down_fails_fast(stubs):
+    client = make_client(stubs)
+    for stub in stubs:
+        stub.healthy = False
+    client.pool.check_health()
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        client.generate("Anyone there?")
+    assert excinfo.value.retry_after >= 1
+    assert sum(requests_per_stub(stubs)) == 0
+
+
+def make_hedging_client(stubs, max_rate=1.0):
+    scheduler = GenerationScheduler(max_concurrent=2 * len(stubs), max_queue=32)
+    hedging = HedgePolicy(default_delay_ms=200, min_delay_ms=200, max_rate=max_rate)
+    return OllamaClient(model="llama3", scheduler=scheduler, hosts=[stub.host for stub in stubs], hedging=hedging)
+
+
+def test_hedge_on_second_backend_wins_when_first_token_is_late(stubs):
+    slow, fast = stubs[0], stubs[1]
+    slow.stall = 2.0
+    client = make_hedging_client([slow, fast])
+
+    started = time.monotonic()
+    replies = [client.generate(f"Question {i}", generation={'affinity_key': f"conv-{i}"}) for i in range(4)]
+    elapsed = time.monotonic() - started
+
+    assert all(reply['response'] == "Namaste! Agra mein Taj Mahal zaroor dekhiye." for reply in replies)
+    assert elapsed < 4 * 2.0
+    stats = client.hedging.stats()
+    assert stats['won'] >= 1
+    assert stats['won'] + stats['lost'] == stats['fired']
+    # The losing request was cancelled rather than left running on the slow backend
+    time.sleep(2.5)
+    assert slow.stats()['in_flight'] == 0
+    assert slow.stats()['disconnects'] >= 1
+    assert client.pool.stats()['backends'][0]['in_flight'] == 0
+
+
+def test_hedged_stream_yields_only_the_winners_chunks(stubs):
+    slow, fast = stubs[0], stubs[1]
+    slow.stall = 2.0
+    client = make_hedging_client([slow, fast])
+
+    for i in range(2):
+        chunks = list(client.stream_generate(f"Stream {i}"))
+        assert "".join(chunk['response'] for chunk in chunks) == "Namaste! Agra mein Taj Mahal zaroor dekhiye."
+        assert chunks[-1]['done'] and 'queue_wait_ms' in chunks[-1]
+
+
+def test_hedge_rate_cap(stubs):
+    slow, fast = stubs[0], stubs[1]
+    slow.stall = 0.5
+    client = make_hedging_client([slow, fast], max_rate=0.0)
+
+    for i in range(4):
+        client.generate(f"Question {i}")
+
+    stats = client.hedging.stats()
+    assert stats['fired'] == 0
+    assert stats['rate_limited'] == 2
+
+
+@pytest.mark.stub_ollama(models=('llama2',))
+def test_a_missing_model_is_reported_by_the_name_requested(stub_ollama):
+    client = OllamaClient(model="llama3", hosts=[stub_ollama.host])
+    # A profile's model is retried on the default one, which is missing too
+    with pytest.raises(ValueError) as excinfo:
+        client.generate("Namaste", generation={'model': 'llama3.2:3b'})
+    assert str(excinfo.value) == "Model 'llama3.2:3b' not found. Run: ollama pull llama3.2:3b && ollama pull llama3"
+
+    with pytest.raises(ValueError) as excinfo:
+        client.generate("Namaste")
+    assert str(excinfo.value) == "Model 'llama3' not found. Run: ollama pull llama3"
+    assert client.generate("Namaste", generation={'model': 'llama2'})['response']
+
+    async def generate_async():
+        async_client = AsyncOllamaClient(client)
+        try:
+            await async_client.generate("Namaste", generation={'model': 'llama3.2:3b'})
+        finally:
+            await async_client.aclose()
+    with pytest.raises(ValueError) as excinfo:
+        asyncio.run(generate_async())
+    assert str(excinfo.value).startswith("Model 'llama3.2:3b' not found.")
@@ -0,0 +1,159 @@
+import os
+
+import mysql.connector
+import pytest
+from mysql.connector import Error
+
+from migrate import apply_migrations, split_statements
+from services import sqlite_backend
+from services.database_service import DatabaseService, connection_settings
+from services.reference_cache import ReferenceCache
+from services.user_service import UserService
+
+SCHEMA = os.path.join(os.path.dirname(__file__), '..', '..', 'database_setup.sql')
+TEST_DATABASE = 'city_guide_explain_test'
+CITIES = 300
+ROWS_PER_CITY = 25
+USERS = 20000
+
+
+@pytest.fixture(scope='module')
+def connection():
+    settings = dict(connection_settings())
+    del settings['database']
+    try:
+        conn = mysql.connector.connect(**settings, connection_timeout=2)
+    except Error as e:
+        pytest.skip(f"MySQL is not available: {e}")
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DATABASE}")
+    cursor.execute(f"CREATE DATABASE {TEST_DATABASE}")
+    cursor.execute(f"USE {TEST_DATABASE}")
+    with open(SCHEMA, 'r', encoding='utf-8') as file:
+        for statement in split_statements(file.read()):
+            if statement.upper().startswith('CREATE TABLE'):
+                cursor.execute(statement)
+    apply_migrations(conn)
+    fill_synthetic_data(conn)
+    cursor.close()
+    yield conn
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DATABASE}")
+    cursor.close()
+    conn.close()
+
+
+def fill_synthetic_data(conn):
+    """Enough rows that the optimizer prefers an index to a scan whenever one can serve the query"""
+    cursor = conn.cursor()
+    cities = [f"City {c}" for c in range(CITIES)]
+    per_city = [(city, n) for city in cities for n in range(ROWS_PER_CITY)]
+    inserts = {
+        "INSERT INTO city_overview (city_name, state_name) VALUES (%s, %s)":
+            [(city, 'State') for city in cities],
+        "INSERT INTO places_history (city_name, place_name) VALUES (%s, %s)":
+            [(city, f"Place {n}") for city, n in per_city],
+        "INSERT INTO tourist_places (city_name, place_name, category, importance) VALUES (%s, %s, %s, %s)":
+            [(city, f"Place {n}", ['monument', 'museum', 'park'][n % 3], ['must_visit', 'recommended', 'optional'][n % 3]) for city, n in per_city],
+        "INSERT INTO restaurants_streetfood (city_name, place_name, category, popularity) VALUES (%s, %s, %s, %s)":
+            [(city, f"Dhaba {n}", ['street_food', 'budget_restaurant', 'mid_range', 'fine_dining'][n % 4], ['low', 'medium', 'high', 'very_high'][n % 4]) for city, n in per_city],
+        "INSERT INTO transport_traffic (city_name, transport_type) VALUES (%s, %s)":
+            [(city, f"Mode {n}") for city, n in per_city],
+        "INSERT INTO accommodation (city_name, area_name, category) VALUES (%s, %s, %s)":
+            [(city, f"Area {n}", ['budget', 'mid_range', 'luxury'][n % 3]) for city, n in per_city],
+        "INSERT INTO culture_traditions (city_name, tradition_name, importance) VALUES (%s, %s, %s)":
+            [(city, f"Festival {n}", ['low', 'medium', 'high'][n % 3]) for city, n in per_city],
+        "INSERT INTO users (first_name, last_name, email) VALUES (%s, %s, %s)":
+            [('Asha', f"User{u}", f"user{u}@example.com") for u in range(USERS)],
+        "INSERT INTO user_auth (user_id, login_type, login_identifier) VALUES (%s, 'email', %s)":
+            [(u + 1, f"user{u}@example.com") for u in range(USERS)],
+        "INSERT INTO guest_sessions (session_token, expires_at) VALUES (%s, NOW() + INTERVAL %s HOUR)":
+            [(f"token-{u}", u % 48 - 24) for u in range(USERS)]
+    }
+    for statement, rows in inserts.items():
+        cursor.executemany(statement, rows)
+    conn.commit()
+    for table in ['city_overview', 'places_history', 'tourist_places', 'restaurants_streetfood', 'transport_traffic',
+                  'accommodation', 'culture_traditions', 'users', 'user_auth', 'guest_sessions']:
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    cursor.close()
+
+
+class CapturingQueries:
+    """Records the queries a service would run instead of running them"""
+
+    def __init__(self):
+        super().__init__()
+        self.reference_cache = ReferenceCache(enabled=False)
+        self.captured = []
+
+    def execute_query(self, query, params=None):
+        self.captured.append((query, params or ()))
+        return []
+
+
+class CapturingDatabaseService(CapturingQueries, DatabaseService):
+    pass
+
+
+class CapturingUserService(CapturingQueries, UserService):
+    pass
+
+
+def hot_queries():
+    db = CapturingDatabaseService()
+    for lookup in [db.get_city_overview, db.get_places_to_visit, db.get_restaurants_by_city, db.get_transport_info,
+                   db.get_accommodation_info, db.get_cultural_info]:
+        lookup('City 42')
+    db.get_place_history('Place 7', 'City 42')
+    db.get_place_histories(['Place 3', 'Place 7', 'Place 11'], 'City 42')
+
+    users = CapturingUserService()
+    users.authenticate_user('user4242@example.com', 'email')
+    users.validate_guest_session('token-4270')  # still valid for 22 hours
+    return [pytest.param(query, params, id=f"{n}-{query.split('FROM')[1].split()[0]}")
+            for n, (query, params) in enumerate(db.captured + users.captured)]
+
+
+@pytest.mark.parametrize('query, params', hot_queries())
+def test_hot_queries_use_an_index(connection, query, params):
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(f"EXPLAIN {query}", params)
+    plan = cursor.fetchall()
+    cursor.close()
+
+    for row in plan:
+        assert row['type'] != 'ALL', f"full scan of {row['table']}: {plan}"
+        assert row['key'], f"no index used on {row['table']}: {plan}"
+        assert 'filesort' not in (row['Extra'] or ''), f"sort not served by an index on {row['table']}: {plan}"
+
+
+@pytest.fixture(scope='module')
+def sqlite_connection(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('explain') / 'city_guide.sqlite3')
+    sqlite_backend.ensure_schema(path)
+    conn = sqlite_backend.connect(path)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('query, params', hot_queries())
+def test_hot_queries_use_an_index_on_sqlite(sqlite_connection, query, params):
+    cursor = sqlite_connection.cursor()
+    cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+    plan = [row[-1] for row in cursor.fetchall()]
+    cursor.close()
+
+    for step in plan:
+        # SEARCH reads a range of an index; SCAN reads the whole table
+        assert step.startswith('SEARCH'), f"full scan: {plan}"
+        assert 'TEMP B-TREE' not in step, f"sort not served by an index: {plan}"
+
+
+def test_migrations_apply_once(connection):
+    assert apply_migrations(connection) == []
+    cursor = connection.cursor()
+    cursor.execute("SELECT version FROM schema_migrations")
+    assert [version for (version,) in cursor.fetchall()] == [1, 2]
+    cursor.close()
@@ -0,0 +1,85 @@
+import gc
+
+import pytest
+
+import serve
+from config import Config
+from services.registry import ServiceRegistry
+
+SMAPS_ROLLUP = """55d0c0a00000-7ffd3b9f1000 ---p 00000000 00:00 0                          [rollup]
+Rss:              204800 kB
+Pss:              102400 kB
+Shared_Clean:     143360 kB
+Shared_Dirty:      10240 kB
+Private_Clean:     20480 kB
+Private_Dirty:     30720 kB
+Swap:                  0 kB
+"""
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_BACKEND', 'sqlite')
+    monkeypatch.setattr(Config, 'SQLITE_PATH', str(tmp_path / 'city_guide.sqlite3'))
+    monkeypatch.setattr('services.registry._default_registry', ServiceRegistry())
+    services = ServiceRegistry()
+    with services.database_service.pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.executemany("INSERT INTO city_overview (city_name, state_name) VALUES (%s, %s)",
+                           [('Preload Pur', 'Uttar Pradesh'), ('Preload Nagar', 'Rajasthan')])
+        connection.commit()
+        cursor.close()
+    return services
+
+
+def test_memory_is_read_from_smaps_rollup(tmp_path):
+    path = tmp_path / 'smaps_rollup'
+    path.write_text(SMAPS_ROLLUP)
+    assert serve.memory_mb(str(path)) == {'rss': 200.0, 'pss': 100.0, 'shared': 150.0, 'private': 50.0}
+    # Not Linux: nothing to report rather than an error
+    assert serve.memory_mb(str(tmp_path / 'missing')) == {}
+
+
+def test_workers_split_the_generation_limit():
+    assert serve.worker_concurrency(8, 4) == 2
+    # Rounded up, and never below one per worker
+    assert serve.worker_concurrency(5, 2) == 3
+    assert serve.worker_concurrency(2, 4) == 1
+
+
+def test_preload_loads_the_reference_data(sqlite_backend):
+    loaded = serve.preload(sqlite_backend)
+
+    assert loaded['reference_cities'] == 2
+    assert loaded['cities'] > 0 and loaded['context_files'] > 0
+    # Lookups after the fork are answered from what the master loaded
+    stats = sqlite_backend.database_service.reference_cache.stats()
+    assert serve.preload(sqlite_backend)['reference_cities'] == 2
+    assert sqlite_backend.database_service.reference_cache.stats()['hits'] > stats['hits']
+
+
+def test_the_master_preloads_and_freezes_then_workers_start_their_own_threads(sqlite_backend, monkeypatch):
+    monkeypatch.setattr(Config, 'OLLAMA_MAX_CONCURRENT', 5)
+    started = []
+    monkeypatch.setattr('app.start_background_tasks', started.append)
+    closed = []
+    monkeypatch.setattr('services.db_pool.close_all_pools', lambda: closed.append(True))
+    server = serve.PreforkServer(workers=2, threads=2, bind='127.0.0.1:0')
+    assert server.cfg.preload_app and server.cfg.worker_class_str == 'gthread'
+
+    try:
+        app = server.load()
+        assert Config.OLLAMA_MAX_CONCURRENT == 3
+        assert closed == [True]
+        assert gc.get_freeze_count() > 0 and not gc.isenabled()
+        # The master never started warm-up or health checks
+        assert started == []
+
+        server.post_fork(None, None)
+        assert gc.isenabled()
+        assert len(started) == 1
+        server.post_worker_init(None)
+        assert app.view_functions
+    finally:
+        gc.unfreeze()
+        gc.enable()
@@ -0,0 +1,75 @@
+import pytest
+
+from config import Config
+from services.database_service import DatabaseService
+from services.user_service import UserService
+
+
+@pytest.fixture(autouse=True)
+def sqlite_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_BACKEND', 'sqlite')
+    monkeypatch.setattr(Config, 'SQLITE_PATH', str(tmp_path / 'city_guide.sqlite3'))
+    # Cached rows are keyed by query, not by database, so keep other tests' rows out
+    monkeypatch.setattr(Config, 'REFERENCE_CACHE_ENABLED', False)
+
+
+def insert(db, query, rows):
+    with db.pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.executemany(query, rows)
+        connection.commit()
+        cursor.close()
+
+
+def test_schema_is_created_in_wal_mode_with_the_migrations():
+    db = DatabaseService()
+    with db.pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode")
+        assert cursor.fetchone() == ('wal',)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'uq_places_history_city_place'")
+        assert cursor.fetchall()
+        cursor.close()
+    assert db.execute_query("SELECT version FROM schema_migrations") == [{'version': 1}, {'version': 2}]
+
+
+def test_reference_lookups_sort_enums_in_declaration_order():
+    db = DatabaseService()
+    insert(db, "INSERT INTO restaurants_streetfood (city_name, place_name, category, popularity) VALUES (%s, %s, %s, %s)", [
+        ('Agra', 'Sheroes Hangout', 'mid_range', 'medium'),
+        ('Agra', 'Deviram Sweets', 'street_food', 'very_high'),
+        ('Agra', 'Dasaprakash', 'mid_range', 'high'),
+        ('Agra', "Joney's Place", 'budget_restaurant', 'high'),
+        ('Jaipur', 'LMB', 'mid_range', 'high')
+    ])
+    insert(db, "INSERT INTO places_history (city_name, place_name, built_by) VALUES (%s, %s, %s)", [
+        ('Agra', 'Taj Mahal', 'Shah Jahan'), ('Agra', 'Agra Fort', 'Akbar'), ('Agra', 'Mehtab Bagh', 'Babur')
+    ])
+
+    # MySQL orders ENUMs by declaration, not alphabetically
+    restaurants = db.get_restaurants_by_city('Agra')
+    assert [r['place_name'] for r in restaurants] == ['Deviram Sweets', "Joney's Place", 'Dasaprakash', 'Sheroes Hangout']
+    histories = db.get_place_histories(['Mehtab Bagh', 'Taj Mahal'], 'Agra')
+    assert [(h['place_name'], h['built_by']) for h in histories] == [('Mehtab Bagh', 'Babur'), ('Taj Mahal', 'Shah Jahan')]
+    assert db.get_city_overview('Nowhere') == []
+
+
+def test_user_accounts_and_guest_sessions():
+    users = UserService()
+    created = users.create_user({'first_name': 'Asha', 'last_name': 'Verma', 'email': 'asha@example.com', 'mobile': '9876543210'})
+    assert created['status'] == 'created'
+    with pytest.raises(Exception, match='DUPLICATE_EMAIL'):
+        users.create_user({'first_name': 'Asha', 'last_name': 'Again', 'email': 'asha@example.com'})
+
+    user = users.authenticate_user('9876543210', 'mobile')
+    assert user['user_id'] == created['user_id'] and user['email'] == 'asha@example.com'
+
+    assert users.update_user_profile(created['user_id'], {'pin_code': '282001', 'budget_range': 'luxury', 'travel_style': 'family'})
+    profile = users.get_user_profile(created['user_id'])
+    assert profile['pin_code'] == '282001' and profile['budget_range'] == 'luxury' and profile['preferred_city'] == 'Agra'
+    assert users.update_user_profile(created['user_id'], {'budget_range': 'not-a-budget'}) is False
+
+    session = users.create_guest_session('127.0.0.1', 'pytest')
+    valid = users.validate_guest_session(session['session_token'])
+    assert valid['guest_id'] == session['guest_id'] and valid['expires_at'] > valid['created_at']
+    assert users.validate_guest_session('no-such-token') is None
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+from routes import chat
+from utils.intent import detect_intent
+
+PLACES = [{'place_name': 'Taj Mahal', 'why_visit': 'Symbol of love', 'best_visit_time': 'Sunrise'}]
+
+
+class FakeDatabaseService:
+    def __init__(self, places):
+        self.places = places
+
+    def get_places_to_visit(self, city_name):
+        return self.places
+
+
+@pytest.fixture
+def services(monkeypatch):
+    services = SimpleNamespace(database_service=FakeDatabaseService(PLACES), user_service=None)
+    monkeypatch.setattr(chat, 'get_services', lambda: services)
+    return services
+
+
+def route(message, city='Agra'):
+    chat_ctx = {
+        'message': message, 'user_id': None, 'conversation_id': None, 'intent': detect_intent(message),
+        'location_context': {'city': city}, 'profile': {}, 'mode': 'text', 'history': []
+    }
+    tier, _, response_text = chat.route_chat({'bypass_cache': True}, chat_ctx, 'llama3')
+    return tier, response_text
+
+
+@pytest.mark.parametrize('message', [
+    "show me places to visit in Agra",
+    "Agra places for holidays",
+    "Taj Mahal ki explanation wali history",
+    "Agra mein planetarium hai kya",
+])
+def test_markers_inside_other_words_do_not_make_a_question_open_ended(message):
+    assert not chat.is_open_ended(message)
+
+
+@pytest.mark.parametrize('message', [
+    "How do I visit the Taj Mahal?",
+    "Taj Mahal vs Agra Fort",
+    "Taj Mahal kyu famous hai",
+    "planning 3 days in Agra",
+    "places to visit  with   kids",
+    "places to visit in Agra that are open early and not too crowded at all",
+])
+def test_open_ended_questions_are_recognised(message):
+    assert chat.is_open_ended(message)
+
+
+def test_lookups_in_agra_are_answered_from_a_template(services):
+    tier, response_text = route("show me places to visit in Agra")
+    assert tier == 'template'
+    assert "Taj Mahal" in response_text
+
+
+def test_open_ended_or_unsupported_questions_go_to_the_llm(services):
+    assert route("how should I plan places to visit in Agra")[0] == 'llm'
+    # The database templates only cover Agra
+    assert route("show me places to visit in Jaipur", city='Jaipur')[0] == 'llm'
+    # A template with nothing from the database would only be canned text
+    services.database_service.places = []
+    assert route("show me places to visit in Agra") == ('llm', None)
@@ -0,0 +1,97 @@
+import pytest
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('services.circuit_breaker.time.monotonic', clock)
+    return clock
+
+
+def make_breaker(half_open_calls=1):
+    return CircuitBreaker("Ollama test", failure_rate=0.5, min_calls=4, window=10, open_seconds=15.0,
+                          half_open_calls=half_open_calls)
+
+
+def call(breaker, ok):
+    breaker.before_call()
+    if ok:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+
+def test_closed_open_half_open_closed(clock):
+    breaker = make_breaker()
+    for ok in [False, True, True]:
+        call(breaker, ok)
+    assert breaker.state == CLOSED
+
+    # Half of the last four calls failed
+    call(breaker, False)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 16
+
+    clock.now += 15
+    assert breaker.state == HALF_OPEN
+    call(breaker, True)
+    assert breaker.state == CLOSED
+    stats = breaker.stats()
+    assert (stats['opened'], stats['rejected'], stats['window_calls']) == (1, 1, 1)
+
+
+def test_a_failed_trial_opens_the_circuit_again(clock):
+    breaker = make_breaker()
+    breaker.trip()
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 6
+
+    clock.now += 5
+    call(breaker, False)
+    assert breaker.state == OPEN
+    # The open period starts over from the failed trial
+    clock.now += 14
+    assert breaker.state == OPEN
+    assert breaker.stats()['opened'] == 2
+
+
+def test_half_open_lets_only_its_trial_calls_through(clock):
+    breaker = make_breaker(half_open_calls=2)
+    breaker.trip()
+    clock.now += 15
+
+    breaker.before_call()
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # reject_if_open() does not use up a trial, and a cancelled trial hands its place back
+    breaker.reject_if_open()
+    breaker.abandon_call()
+    breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()  # closed: no trial limit any more
+
+
+def test_the_health_probe_can_allow_a_trial_early(clock):
+    breaker = make_breaker()
+    breaker.trip()
+    breaker.allow_trial()
+    assert breaker.state == HALF_OPEN
+    call(breaker, True)
+    assert breaker.state == CLOSED
@@ -0,0 +1,50 @@
+from services.context_assembler import KnowledgeContextAssembler, estimate_tokens
+
+TAJ = {'place_name': 'Taj Mahal', 'description': 'white marble tomb'}
+# Mentions the Taj as often as the Taj's own row does, but is not the place asked about
+FORT = {'place_name': 'Agra Fort', 'description': 'view of taj mahal'}
+
+
+def test_rows_stop_once_the_budget_is_spent():
+    # Section header 2 tokens, each row 5
+    assembler = KnowledgeContextAssembler(budgets={'history': 12})
+    rows = [{'place_name': f"Fort {n}"} for n in range(1, 5)]
+    text, usage = assembler.assemble('history', '', [('places', rows)])
+
+    assert text == "PLACES:\n- place_name: Fort 1\n- place_name: Fort 2"
+    assert list(usage) == ['places']
+    # Other intents get the default budget
+    assert assembler.budget_for('food_culture') == 400
+
+
+def test_bookkeeping_columns_and_empty_values_are_dropped():
+    row = {'id': 7, 'city_name': 'Agra', 'created_at': '2024-01-01', 'latitude': 27.17, 'place_name': 'Taj Mahal',
+           'built_by': None, 'notes': '  ', 'highlights': ['Dome', '', 'Gardens']}
+    assert KnowledgeContextAssembler.clean_row(row) == {'place_name': 'Taj Mahal', 'highlights': 'Dome, Gardens'}
+
+    # A row with nothing left is not sent at all
+    text, usage = KnowledgeContextAssembler().assemble('history', '', [('places', [{'id': 1, 'city_name': 'Agra'}])])
+    assert (text, usage) == ('', {})
+
+
+def test_the_row_named_in_the_message_wins_the_budget():
+    terms = KnowledgeContextAssembler.message_terms("Taj Mahal ki history batao")
+    assert KnowledgeContextAssembler.score_row(TAJ, terms) == 2 + 5
+    assert KnowledgeContextAssembler.score_row(FORT, terms) == 2
+
+    # Room for one row: without a match the database's order decides, with one the named place goes first
+    assembler = KnowledgeContextAssembler(budgets={'history': 16})
+    text, _ = assembler.assemble('history', '', [('places', [FORT, TAJ])])
+    assert 'Agra Fort' in text and 'Taj Mahal;' not in text
+    text, _ = assembler.assemble('history', "Taj Mahal ki history batao", [('places', [FORT, TAJ])])
+    assert 'place_name: Taj Mahal' in text and 'Agra Fort' not in text
+
+
+def test_usage_reports_the_tokens_of_each_section():
+    sections = [('overview', [{'description': 'City of the Taj'}]), ('food', []), ('places', [FORT, TAJ])]
+    text, usage = KnowledgeContextAssembler().assemble('general_exploration', '', sections)
+
+    overview = "OVERVIEW:\n- description: City of the Taj"
+    assert text.startswith(overview + "\nPLACES:\n")
+    # Sections with no rows are left out
+    assert usage == {'overview': estimate_tokens(overview), 'places': estimate_tokens(text[len(overview) + 1:])}
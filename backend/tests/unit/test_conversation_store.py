@@ -0,0 +1,78 @@
+import pytest
+
+from services.conversation_store import ConversationContextStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('services.conversation_store.time.monotonic', clock)
+    return clock
+
+
+def test_a_stored_context_is_reused_by_the_same_model_only():
+    store = ConversationContextStore()
+    store.put('c1', [1, 2, 3], 'llama3', {'city': 'Agra'})
+
+    stored = store.get('c1', 'llama3')
+    assert stored == {'context': [1, 2, 3], 'model': 'llama3', 'state': {'city': 'Agra'}}
+    stored['context'].append(4)  # callers get a copy
+    assert store.get('c1', 'llama3')['context'] == [1, 2, 3]
+
+    # A new turn replaces the context; an empty one forgets the conversation
+    store.put('c1', [1, 2, 3, 4, 5], 'llama3')
+    assert store.get('c1', 'llama3')['context'] == [1, 2, 3, 4, 5]
+    store.put('c1', [], 'llama3')
+    assert store.get('c1', 'llama3') is None
+
+    # Another model cannot continue the context, so the entry goes
+    store.put('c2', [7, 8], 'llama3')
+    assert store.get('c2', 'llama2') is None
+    assert store.get('c2', 'llama3') is None
+    stats = store.stats()
+    assert (stats['hits'], stats['model_changed'], stats['conversations'], stats['total_tokens']) == (3, 1, 0, 0)
+
+
+def test_idle_conversations_expire(clock):
+    store = ConversationContextStore(idle_ttl=60)
+    store.put('old', [1, 2], 'llama3')
+    clock.now += 30
+    store.put('recent', [3, 4], 'llama3')
+
+    clock.now += 40
+    assert not store.holds('old', 'llama3') and store.holds('recent', 'llama3')
+    assert store.get('old', 'llama3') is None
+    assert store.get('recent', 'llama3')['context'] == [3, 4]
+
+    # Using a conversation keeps it alive
+    clock.now += 50
+    assert store.get('recent', 'llama3') is not None
+    stats = store.stats()
+    assert (stats['expired'], stats['conversations'], stats['total_tokens']) == (1, 1, 2)
+
+
+def test_least_recently_used_conversations_are_evicted_by_count_and_tokens():
+    store = ConversationContextStore(max_conversations=2, max_total_tokens=10, max_context_tokens=8)
+    store.put('a', [1, 2, 3], 'llama3')
+    store.put('b', [1, 2, 3], 'llama3')
+    store.get('a', 'llama3')
+    store.put('c', [1, 2, 3], 'llama3')
+    assert store.get('b', 'llama3') is None  # 'a' was used more recently than 'b'
+
+    # Over the token budget: the oldest conversations go until the new one fits
+    store.put('d', list(range(8)), 'llama3')
+    assert [cid for cid in 'acd' if store.holds(cid, 'llama3')] == ['d']
+
+    # A context too close to the model window is not kept at all
+    store.put('e', list(range(9)), 'llama3')
+    assert store.get('e', 'llama3') is None
+    stats = store.stats()
+    assert (stats['evictions'], stats['too_long'], stats['total_tokens']) == (3, 1, 8)
@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from mysql.connector import Error
+
+from services.db_pool import ConnectionPool, PoolTimeoutError
+from services.sqlite_backend import SQLiteConnection
+
+
+class FakeConnection:
+    def __init__(self, n):
+        self.n = n
+        self.connected = True
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+        self.connected = False
+
+
+def make_pool(size=2, **kwargs):
+    made = []
+
+    def connect(**connect_args):
+        made.append(FakeConnection(len(made)))
+        return made[-1]
+    return ConnectionPool({'host': 'db'}, size=size, connect=connect, **kwargs), made
+
+
+def test_returned_connections_are_reused_and_open_transactions_rolled_back():
+    pool, made = make_pool()
+    with pool.connection() as conn:
+        conn.in_transaction = True
+    with pool.connection() as again:
+        assert again is conn
+    assert conn.rollbacks == 1 and len(made) == 1
+    stats = pool.stats()
+    assert (stats['acquired'], stats['created'], stats['open'], stats['idle'], stats['in_use']) == (2, 1, 1, 1, 0)
+
+
+def test_an_exhausted_pool_waits_for_a_release_then_times_out():
+    pool, made = make_pool(size=2)
+    first, second = pool.acquire(), pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+
+    threading.Timer(0.05, pool.release, [first]).start()
+    started = time.monotonic()
+    assert pool.acquire(timeout=2) is first
+    assert time.monotonic() - started >= 0.04
+    stats = pool.stats()
+    assert len(made) == 2 and stats['timeouts'] == 1 and stats['waits'] == 2 and stats['in_use'] == 2
+    pool.release(second)
+
+
+def test_dead_connections_are_replaced():
+    pool, made = make_pool(size=1, health_check_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    # The server dropped the idle connection; the next borrower gets a fresh one
+    conn.connected = False
+    fresh = pool.acquire()
+    assert fresh is not conn and conn.closed
+    pool.release(fresh)
+
+    # A query error on a connection that no longer answers frees its slot instead of pooling it
+    with pytest.raises(Error):
+        with pool.connection() as borrowed:
+            borrowed.connected = False
+            raise Error(msg="Lost connection to MySQL server during query")
+    stats = pool.stats()
+    assert (stats['discarded'], stats['open'], stats['created']) == (1, 0, 2)
+    with pool.connection() as replacement:
+        assert replacement is made[2]
+
+
+def test_a_broken_sqlite_connection_is_not_pooled_again(tmp_path):
+    pool, made = make_pool(size=1, health_check_interval=60)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as borrowed:
+            borrowed.connected = False
+            raise sqlite3.OperationalError("disk I/O error")
+    assert pool.stats()['discarded'] == 1
+    with pool.connection() as replacement:
+        assert replacement is made[1]
+
+    # A SQLite connection reports itself broken once queries on it fail
+    conn = SQLiteConnection(str(tmp_path / 'city_guide.sqlite3'))
+    assert conn.is_connected()
+    conn._conn.close()
+    assert not conn.is_connected()
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from services.deadline import Deadline, current_deadline, deadline_scope
+from services.fan_out import FanOut
+
+
+def slow(value, seconds=0.2):
+    def stage():
+        time.sleep(seconds)
+        return value
+    return stage
+
+
+def test_stages_run_concurrently():
+    fan_out = FanOut(max_workers=4, enabled=True)
+
+    started = time.monotonic()
+    results = fan_out.run({'overview': slow(1), 'places': slow(2), 'personalization': slow(3)})
+
+    assert results == {'overview': 1, 'places': 2, 'personalization': 3}
+    assert time.monotonic() - started < 0.45
+
+
+def test_nested_fan_out_does_not_starve_a_small_pool():
+    fan_out = FanOut(max_workers=1, enabled=True)
+
+    def nested():
+        return fan_out.run({'restaurants': slow('r', 0.05), 'places': slow('p', 0.05)})
+
+    results = fan_out.run({'knowledge': nested, 'personalization': nested})
+
+    assert results['knowledge'] == {'restaurants': 'r', 'places': 'p'}
+    assert results['personalization'] == {'restaurants': 'r', 'places': 'p'}
+
+
+def test_stages_see_the_request_deadline():
+    fan_out = FanOut(max_workers=2, enabled=True)
+    deadline = Deadline(10)
+    threads = set()
+
+    def stage():
+        threads.add(threading.get_ident())
+        time.sleep(0.05)
+        return current_deadline()
+
+    with deadline_scope(deadline):
+        results = fan_out.run({'a': stage, 'b': stage})
+
+    assert results == {'a': deadline, 'b': deadline}
+    assert len(threads) == 2
+
+
+def test_stage_error_is_raised_after_the_others_finish():
+    fan_out = FanOut(max_workers=2, enabled=True)
+    finished = []
+
+    def failing():
+        raise ValueError("boom")
+
+    def ok():
+        time.sleep(0.05)
+        finished.append(True)
+
+    with pytest.raises(ValueError):
+        fan_out.run({'failing': failing, 'ok': ok})
+    assert finished == [True]
+
+
+def test_disabled_runs_stages_in_order():
+    order = []
+    fan_out = FanOut(enabled=False)
+
+    fan_out.run({'a': lambda: order.append('a'), 'b': lambda: order.append('b')})
+
+    assert order == ['a', 'b']
@@ -0,0 +1,74 @@
+import time
+
+from config import Config
+from services.generation_profiles import GenerationProfiles
+from services.registry import ServiceRegistry
+
+PROFILES = {
+    'quick': {'model': 'llama3.2:3b', 'num_predict': {'concise': 60, 'detailed': 120}, 'keep_alive': '30m'},
+    'standard': {'model': 'llama3', 'num_predict': {'concise': 256, 'detailed': 512}},
+    'fixed': {'model': 'llama3', 'num_predict': 100}
+}
+
+
+def make_profiles():
+    return GenerationProfiles(PROFILES, intent_profiles={'greeting': 'quick', 'history': 'retired'})
+
+
+def test_num_ctx_is_the_smallest_bucket_that_fits():
+    profiles = make_profiles()
+    # ~4 characters per prompt token, one token per context entry, plus the reply
+    assert profiles.num_ctx_for('x' * 4000, num_predict=256) == 2048
+    assert profiles.num_ctx_for('x' * 4000, context=[1] * 1000, num_predict=256) == 4096
+    assert profiles.num_ctx_for('x' * 4 * (8192 - 256), num_predict=256) == 8192
+    # Too big for every bucket: the largest, and Ollama truncates the prompt
+    assert profiles.num_ctx_for('x' * 100000) == 8192
+    assert profiles.default_num_ctx == 2048
+
+
+def test_response_style_picks_num_predict():
+    profiles = make_profiles()
+    assert profiles.settings('greeting', "Namaste", response_style='detailed')['options']['num_predict'] == 120
+    # No style, or one the profile does not know, is concise
+    assert profiles.settings('greeting', "Namaste")['options']['num_predict'] == 60
+    assert profiles.settings('greeting', "Namaste", response_style='poetic')['options']['num_predict'] == 60
+
+    profiles.intent_profiles['greeting'] = 'fixed'
+    assert profiles.settings('greeting', "Namaste", response_style='detailed')['options']['num_predict'] == 100
+
+
+def test_unknown_intents_and_profiles_fall_back_to_the_default():
+    profiles = make_profiles()
+    assert profiles.for_intent('greeting')[0] == 'quick'
+    assert profiles.for_intent('food_culture')[0] == 'standard'
+    # 'history' names a profile that is not configured
+    settings = profiles.settings('history', "Taj Mahal kisne banwaya?")
+    assert (settings['profile'], settings['model'], settings['keep_alive']) == ('standard', 'llama3', None)
+    assert settings['options'] == {'num_predict': 256, 'num_ctx': 2048}
+
+
+def test_warm_up_loads_models_with_the_default_num_ctx(monkeypatch):
+    monkeypatch.setattr(Config, 'OLLAMA_HOSTS', ['http://127.0.0.1:9'])
+    monkeypatch.setattr(Config, 'OLLAMA_HEALTH_INTERVAL', 0)
+    monkeypatch.setattr(Config, 'GENERATION_PROFILES', PROFILES)
+    monkeypatch.setattr(Config, 'OLLAMA_NUM_CTX_BUCKETS', [4096, 8192])
+    posted = []
+
+    class Loaded:
+        def raise_for_status(self):
+            pass
+
+    def post(url, json, timeout):
+        posted.append(json)
+        return Loaded()
+
+    monkeypatch.setattr('services.ollama_client.requests.post', post)
+    ServiceRegistry().start_warm_up()
+    deadline = time.monotonic() + 2
+    while len(posted) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert posted == [
+        {'model': 'llama3.2:3b', 'keep_alive': '30m', 'options': {'num_ctx': 4096}},
+        {'model': 'llama3', 'keep_alive': None, 'options': {'num_ctx': 4096}}
+    ]
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from routes.chat import chat_error_payload
+from services.generation_scheduler import GenerationScheduler, OverloadedError, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for the scheduler"
+        time.sleep(0.005)
+
+
+def queue_in_thread(scheduler, priority, admitted):
+    """Wait for a slot on another thread, note the admission and hand the slot back"""
+    def run():
+        with scheduler.slot(priority):
+            admitted.append(priority)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_higher_priority_work_is_admitted_first():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=8)
+    scheduler.acquire()
+    admitted = []
+
+    threads = []
+    for priority in [PRIORITY_BATCH, PRIORITY_BATCH, PRIORITY_INTERACTIVE]:
+        threads.append(queue_in_thread(scheduler, priority, admitted))
+        wait_for(lambda: scheduler.stats()['queue_depth'] == len(threads))
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(2)
+
+    # The interactive request arrived last but went first; the batch ones kept their order
+    assert admitted == [PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BATCH]
+    stats = scheduler.stats()
+    assert (stats['admitted'], stats['queued'], stats['in_flight'], stats['max_queue_depth']) == (4, 3, 0, 3)
+
+
+def test_arrivals_past_their_shed_depth_are_turned_away_with_a_retry_hint():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=2)
+    scheduler.acquire()
+    admitted = []
+    waiting = queue_in_thread(scheduler, PRIORITY_INTERACTIVE, admitted)
+    wait_for(lambda: scheduler.stats()['queue_depth'] == 1)
+
+    # Batch work is shed at half the queue depth that interactive work is
+    with pytest.raises(OverloadedError) as excinfo:
+        scheduler.acquire(PRIORITY_BATCH)
+    assert excinfo.value.reason == 'queue_full'
+    # Two waves (the one queued request, then this one) of the 5 s average generation
+    assert excinfo.value.retry_after == 10
+    body, status = chat_error_payload(excinfo.value)
+    assert status == 503 and body['retry_after'] == 10
+
+    second = queue_in_thread(scheduler, PRIORITY_INTERACTIVE, admitted)
+    wait_for(lambda: scheduler.stats()['queue_depth'] == 2)
+    with pytest.raises(OverloadedError):
+        scheduler.acquire(PRIORITY_INTERACTIVE)
+
+    scheduler.release()
+    for thread in [waiting, second]:
+        thread.join(2)
+    assert admitted == [PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE]
+    assert scheduler.stats()['shed'] == 2
+
+
+def test_a_request_that_waits_too_long_leaves_the_queue():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=8, queue_timeout=0.05)
+    scheduler.acquire()
+
+    started = time.monotonic()
+    with pytest.raises(OverloadedError) as excinfo:
+        scheduler.acquire()
+    assert excinfo.value.reason == 'queue_timeout'
+    assert time.monotonic() - started >= 0.05
+
+    stats = scheduler.stats()
+    assert (stats['timeouts'], stats['queue_depth'], stats['in_flight']) == (1, 0, 1)
+    # The slot frees up and the next request gets it straight away
+    scheduler.release()
+    assert scheduler.acquire(timeout=0) == 0.0
@@ -0,0 +1,108 @@
+from services.database_service import DatabaseService
+from services.prompt_builder import PromptBuilder
+from services.reference_cache import ReferenceCache
+
+
+class FakeDatabaseService:
+    """Agra rows without a MySQL server"""
+
+    def get_city_overview(self, city_name):
+        return [{'city_name': city_name, 'description': 'City of the Taj'}]
+
+    def get_places_to_visit(self, city_name):
+        return [{'place_name': 'Taj Mahal'}, {'place_name': 'Agra Fort'}]
+
+    def get_place_histories(self, place_names, city_name):
+        return [{'place_name': name, 'history': 'Built by Shah Jahan'} for name in place_names]
+
+    def get_restaurants_by_city(self, city_name):
+        return [{'name': 'Pinch of Spice'}]
+
+
+class QueryCountingDatabaseService(DatabaseService):
+    """The real DatabaseService queries, answered from canned rows and counted (reference cache off)"""
+    PLACES = ['Taj Mahal', 'Agra Fort', 'Fatehpur Sikri', 'Mehtab Bagh', 'Itmad-ud-Daulah']
+
+    def __init__(self):
+        super().__init__()
+        self.reference_cache = ReferenceCache(enabled=False)
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        table = query.split('FROM')[1].split()[0]
+        self.queries.append(table)
+        if table == 'tourist_places':
+            return [{'place_name': name} for name in self.PLACES]
+        if table == 'places_history':
+            return [{'place_name': name, 'history': f'{name} history'} for name in params[1:]]
+        return [{'city_name': params[0], 'description': 'City of the Taj'}]
+
+
+class FakeLocationService:
+    def get_location_data(self, state_name):
+        return {'capital': 'Lucknow'} if state_name else None
+
+
+def make_builder():
+    return PromptBuilder(db_service=FakeDatabaseService(), location_service=FakeLocationService())
+
+
+AGRA = {'city': 'Agra', 'state': 'Uttar Pradesh'}
+JAIPUR = {'city': 'Jaipur', 'state': 'Rajasthan'}
+PROFILE = {'isProfileActive': True, 'name': 'Asha', 'interests': ['food'], 'responseStyle': 'detailed'}
+HISTORY = [{'role': 'user', 'content': 'hi'}, {'role': 'assistant', 'content': 'Namaste!'}]
+
+
+def test_prompt_starts_with_static_prefix():
+    builder = make_builder()
+    for intent in ['greeting', 'history', 'food_culture', 'travel_places', 'general_exploration']:
+        prompt = builder.build_prompt('tell me more', intent, location_context=AGRA, history=HISTORY, profile_data=PROFILE)
+        assert prompt.startswith(builder.get_static_prefix(intent))
+
+
+def test_prefix_is_byte_identical_across_variable_inputs():
+    builder = make_builder()
+    variants = [
+        dict(message='best food in agra'),
+        dict(message='what about jaipur', location_context=JAIPUR),
+        dict(message='and dessert?', location_context=AGRA, history=HISTORY),
+        dict(message='something local', location_context=AGRA, profile_data=PROFILE),
+    ]
+    prefix = builder.get_static_prefix('food_culture').encode('utf-8')
+    for kwargs in variants:
+        prompt = builder.build_prompt(intent='food_culture', **kwargs).encode('utf-8')
+        assert prompt[:len(prefix)] == prefix
+
+
+def test_prefix_is_shared_across_builder_instances():
+    assert make_builder().get_static_prefix('history') == make_builder().get_static_prefix('history')
+
+
+def test_variable_sections_follow_prefix_in_fixed_order():
+    builder = make_builder()
+    prompt = builder.build_prompt('history of taj mahal', 'history', location_context=AGRA, history=HISTORY, profile_data=PROFILE)
+    tail = prompt[len(builder.get_static_prefix('history')):]
+    positions = [tail.index(marker) for marker in [
+        'CURRENT LOCATION CONTEXT', 'KNOWLEDGE CONTEXT', 'USER PROFILE CONTEXT', 'CONVERSATION HISTORY', 'USER MESSAGE: history of taj mahal'
+    ]]
+    assert positions == sorted(positions)
+    assert prompt.endswith('USER MESSAGE: history of taj mahal\nASSISTANT:')
+
+
+def test_empty_sections_are_omitted():
+    builder = make_builder()
+    prompt = builder.build_prompt('hello', 'greeting')
+    assert prompt == builder.get_static_prefix('greeting') + '\nUSER MESSAGE: hello\nASSISTANT:'
+
+
+def test_history_context_fetches_every_named_place_in_one_query():
+    db = QueryCountingDatabaseService()
+    builder = PromptBuilder(db_service=db, location_service=FakeLocationService())
+
+    context = builder.get_database_context(
+        'history', 'Taj Mahal, Agra Fort, Mehtab Bagh aur Fatehpur Sikri ki history batao', 'Agra', 'Uttar Pradesh'
+    )
+
+    assert sorted(db.queries) == ['city_overview', 'places_history', 'tourist_places']
+    for name in ['Taj Mahal', 'Agra Fort', 'Mehtab Bagh', 'Fatehpur Sikri']:
+        assert f'{name} history' in context
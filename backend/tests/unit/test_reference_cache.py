@@ -0,0 +1,96 @@
+import time
+
+from config import Config
+from services.database_service import DatabaseService
+from services.location_service import LocationService
+from services.prompt_builder import PromptBuilder
+from services.reference_cache import ReferenceCache, mark_reference_data_changed
+
+ROWS = {
+    'city_overview': [{'city_name': 'Agra', 'historical_background': 'City of the Taj'}],
+    'tourist_places': [{'place_name': 'Taj Mahal', 'importance': 'must_visit'}, {'place_name': 'Agra Fort', 'importance': 'recommended'}],
+    'restaurants_streetfood': [{'name': 'Pinch of Spice', 'category': 'mid_range'}]
+}
+
+
+class CountingDatabaseService(DatabaseService):
+    """DatabaseService whose queries are answered from ROWS and counted, without a MySQL server"""
+
+    def __init__(self, cache):
+        super().__init__()
+        self.reference_cache = cache
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        table = next(name for name in ROWS if f"FROM {name}" in query)
+        self.queries.append(table)
+        return ROWS[table]
+
+
+def make_service(**kwargs):
+    return CountingDatabaseService(ReferenceCache(enabled=True, stamp_path='/nonexistent', **kwargs))
+
+
+def test_repeated_chats_make_no_reference_round_trips():
+    db = make_service()
+    builder = PromptBuilder(db_service=db, location_service=LocationService())
+
+    for intent in ['travel_places', 'food_culture', 'travel_places']:
+        builder.get_database_context(intent, "Agra mein kya dekhein?", 'Agra', 'Uttar Pradesh')
+    assert sorted(db.queries) == ['city_overview', 'restaurants_streetfood', 'tourist_places']
+
+    db.queries.clear()
+    for intent in ['travel_places', 'food_culture', 'general_exploration']:
+        builder.get_database_context(intent, "Agra mein kya dekhein?", 'Agra', 'Uttar Pradesh')
+    assert db.queries == []
+
+    stats = db.reference_cache.stats()
+    assert stats['tables']['city_overview'] == {**stats['tables']['city_overview'], 'hits': 5, 'misses': 1, 'entries': 1}
+    assert stats['hits'] == 8 and stats['misses'] == 3 and stats['hit_rate'] == round(8 / 11, 3)
+
+
+def test_entries_expire_per_table_and_failures_are_not_cached():
+    db = make_service(ttls={'city_overview': 0.05, 'tourist_places': 60})
+    db.get_city_overview('Agra')
+    db.get_places_to_visit('Agra')
+    time.sleep(0.1)
+    db.get_city_overview('Agra')
+    db.get_places_to_visit('Agra')
+    assert db.queries == ['city_overview', 'tourist_places', 'city_overview']
+
+    cache = ReferenceCache(enabled=True, stamp_path='/nonexistent')
+    calls = []
+    for _ in range(2):
+        cache.fetch('city_overview', 'Agra', lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_least_recently_used_rows_are_evicted_past_the_limit():
+    cache = ReferenceCache(enabled=True, max_entries=2, stamp_path='/nonexistent')
+    for city in ['Agra', 'Jaipur', 'Agra', 'Udaipur']:
+        cache.fetch('city_overview', city, lambda: [city])
+
+    calls = []
+    cache.fetch('city_overview', 'Agra', lambda: calls.append('Agra') or ['Agra'])
+    cache.fetch('city_overview', 'Jaipur', lambda: calls.append('Jaipur') or ['Jaipur'])
+    assert calls == ['Jaipur']
+    assert cache.stats()['tables']['city_overview']['evictions'] == 2
+
+
+def test_reload_stamp_and_invalidate_drop_cached_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'REFERENCE_CACHE_STAMP_CHECK_INTERVAL', 0)
+    stamp = str(tmp_path / 'reference_data_version')
+    db = CountingDatabaseService(ReferenceCache(enabled=True, stamp_path=stamp))
+
+    db.get_city_overview('Agra')
+    db.get_city_overview('Agra')
+    # What init_database.py does after reloading the tables, possibly from another process
+    mark_reference_data_changed(stamp)
+    db.get_city_overview('Agra')
+    assert db.queries == ['city_overview', 'city_overview']
+
+    db.get_places_to_visit('Agra')
+    db.reference_cache.invalidate('tourist_places')
+    db.get_places_to_visit('Agra')
+    db.get_city_overview('Agra')
+    assert db.queries == ['city_overview', 'city_overview', 'tourist_places', 'tourist_places']
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for the callers to join"
+        time.sleep(0.005)
+
+
+def run_callers(call):
+    """Run call() in CALLERS threads; returns their results or exceptions, in thread order"""
+    outcomes = [None] * CALLERS
+
+    def run(n):
+        try:
+            outcomes[n] = call()
+        except Exception as e:
+            outcomes[n] = e
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def joined(flight, executed='executed', coalesced='coalesced'):
+    stats = flight.stats()
+    return stats[executed] + stats[coalesced] == CALLERS
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    upstream = []
+
+    def generate(token):
+        upstream.append(token)
+        release.wait(2)
+        return {'response': "Taj Mahal"}
+
+    threads, outcomes = run_callers(lambda: flight.do('agra', generate))
+    wait_for(lambda: joined(flight))
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(upstream) == 1
+    assert outcomes == [{'response': "Taj Mahal"}] * CALLERS
+    stats = flight.stats()
+    assert (stats['executed'], stats['coalesced'], stats['in_flight']) == (1, CALLERS - 1, 0)
+
+    # Once the call has finished, the next one runs afresh
+    assert flight.do('agra', lambda token: {'response': "Agra Fort"}) == {'response': "Agra Fort"}
+
+
+def test_an_upstream_error_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def generate(token):
+        calls.append(token)
+        release.wait(2)
+        raise TimeoutError("Ollama did not answer")
+
+    threads, outcomes = run_callers(lambda: flight.do('agra', generate))
+    wait_for(lambda: joined(flight))
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(calls) == 1
+    assert all(isinstance(outcome, TimeoutError) for outcome in outcomes)
+
+    # The failed call is not remembered either
+    def missing_model(token):
+        raise ValueError("model not found")
+    with pytest.raises(ValueError):
+        flight.do('agra', missing_model)
+
+
+def test_streams_share_one_producer_and_its_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    producers = []
+
+    def chunks(token):
+        producers.append(token)
+        yield {'response': "Taj "}
+        release.wait(2)
+        yield {'response': "Mahal"}
+        raise ConnectionError("Ollama went away")
+
+    def read():
+        received = []
+        try:
+            for chunk in flight.stream('agra', chunks):
+                received.append(chunk['response'])
+        except ConnectionError as e:
+            return received, e
+        return received, None
+
+    threads, outcomes = run_callers(read)
+    wait_for(lambda: joined(flight, 'stream_executed', 'stream_coalesced'))
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(producers) == 1
+    for received, error in outcomes:
+        assert received == ["Taj ", "Mahal"] and isinstance(error, ConnectionError)
+
+
+def test_a_stream_that_is_never_iterated_does_not_keep_the_generation_alive():
+    flight = SingleFlight()
+    upstream = []
+
+    def chunks(token):
+        upstream.append(token)
+        yield {'response': "Taj "}
+        while not token.cancelled:
+            time.sleep(0.005)
+
+    unused = flight.stream('agra', chunks)
+    assert upstream == [] and flight.stats()['stream_executed'] == 0
+
+    reader = flight.stream('agra', chunks)
+    assert next(reader) == {'response': "Taj "}
+    # The only caller that was reading goes away
+    reader.close()
+    wait_for(lambda: not flight.stats()['in_flight'])
+    assert upstream[0].reason == 'abandoned'
+    assert flight.stats()['abandoned'] == 1
+    unused.close()
@@ -0,0 +1,34 @@
+import datetime
+import decimal
+import json
+import uuid
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse as _JSONResponse
+from werkzeug.http import http_date
+from services.deadline import deadline_scope
+
+
+def _json_default(o):
+    """Encode what MySQL rows hold the way Flask's jsonify does"""
+    if isinstance(o, (datetime.date, datetime.datetime)):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class JSONResponse(_JSONResponse):
+    """Starlette JSONResponse that encodes DB rows like the Flask routes do"""
+
+    def render(self, content):
+        return json.dumps(content, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+def _call_in_scope(deadline, fn, args):
+    with deadline_scope(deadline):
+        return fn(*args)
+
+
+async def run_in_deadline(deadline, fn, *args):
+    """Run blocking fn(*args) on a worker thread with deadline as the current request deadline"""
+    return await run_in_threadpool(_call_in_scope, deadline, fn, args)
@@ -3,6 +3,8 @@ class ChatApp {
         this.cacheSelectors();
         this.locationContext = { city: "Agra", state: "Uttar Pradesh", country: "India" };
         this.conversationHistory = [];
+        // Lets the backend reuse the model's context between turns of this chat
+        this.conversationId = window.crypto?.randomUUID ? window.crypto.randomUUID() : `conv-${Date.now()}-${Math.random().toString(16).slice(2)}`;
     }
 
     cacheSelectors() {
@@ -167,6 +169,7 @@ class ChatApp {
                 profile: profileContext,
                 location_context: this.locationContext,
                 mode: isVoice ? 'voice' : 'text',
+                conversation_id: this.conversationId,
                 history: this.conversationHistory.slice(-6)
             });
 